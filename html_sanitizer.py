@@ -0,0 +1,136 @@
+"""
+# HTML サニタイザ (HTML sanitizer)
+
+投稿の Markdown から変換した HTML 断片を、サーバー側でページに埋め込む前に
+許可リスト方式で無害化する。Markdown は生の HTML をそのまま通すため、
+`<script src=...>` や `<iframe ...>` などがそのまま残る。
+
+クライアント側レンダリング（post.html の applySecurityFilter）は属性の無い
+`<script>` などの決まったタグだけを文字列にするのに対し、こちらは許可リストに
+無いものすべてを対象にする。そのため生の HTML を含む投稿は、ssr_sections の
+有無で見え方が異なることがある（PDF 出力には使わない）。
+
+- 許可リストに無いタグは、タグ自体を文字列として表示する（中身のテキストは残す）
+- 許可リストに無い属性（on* のイベントハンドラなど）は落とす
+- href / src は http(s)・mailto・相対 URL だけを通す
+- コメント・宣言・処理命令は落とす
+- 閉じられていないタグは末尾で閉じ、対応の無い閉じタグは落とす
+  （断片が周囲のレイアウトを壊さないように）
+
+標準ライブラリだけで動き、Flask に依存しないため単体でテストできる。
+"""
+import html
+import re
+from html.parser import HTMLParser
+
+ALLOWED_TAGS = frozenset((
+    'a', 'abbr', 'b', 'blockquote', 'br', 'caption', 'cite', 'code', 'col', 'colgroup',
+    'dd', 'del', 'details', 'div', 'dl', 'dt', 'em', 'figcaption', 'figure',
+    'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'hr', 'i', 'img', 'ins', 'kbd', 'li', 'mark',
+    'ol', 'p', 'pre', 'q', 's', 'samp', 'small', 'span', 'strong', 'sub', 'summary', 'sup',
+    'table', 'tbody', 'td', 'tfoot', 'th', 'thead', 'tr', 'u', 'ul', 'var', 'wbr',
+))
+VOID_TAGS = frozenset(('br', 'col', 'hr', 'img', 'wbr'))
+GLOBAL_ATTRS = frozenset(('class', 'title'))
+ALLOWED_ATTRS = {
+    'a': frozenset(('href',)),
+    'img': frozenset(('src', 'alt', 'width', 'height')),
+    'ol': frozenset(('start', 'type')),
+    'li': frozenset(('value',)),
+    'td': frozenset(('align', 'colspan', 'rowspan', 'style')),
+    'th': frozenset(('align', 'colspan', 'rowspan', 'style')),
+    'col': frozenset(('span',)),
+    'colgroup': frozenset(('span',)),
+    'details': frozenset(('open',)),
+}
+URL_ATTRS = frozenset(('href', 'src'))
+ALLOWED_SCHEMES = frozenset(('http', 'https', 'mailto'))
+# markdown の tables 拡張が出力する列の揃え（style="text-align: left;"）だけを通す
+ALLOWED_STYLE = re.compile(r'^\s*text-align:\s*(left|right|center);?\s*$', re.I)
+_SCHEME = re.compile(r'^([a-zA-Z][a-zA-Z0-9+.\-]*):')
+# ブラウザが URL の解釈時に無視する制御文字・空白（"java\tscript:" 対策）
+_URL_IGNORED = re.compile(r'[\x00-\x20\x7f]+')
+
+
+def _safe_url(value):
+    m = _SCHEME.match(_URL_IGNORED.sub('', value))
+    return m is None or m.group(1).lower() in ALLOWED_SCHEMES
+
+
+class _Sanitizer(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=False)
+        self.out = []
+        self.stack = []
+
+    def _attrs(self, tag, attrs):
+        allowed = ALLOWED_ATTRS.get(tag, frozenset())
+        kept = []
+        for name, value in attrs:
+            if name not in GLOBAL_ATTRS and name not in allowed:
+                continue
+            if value is None:
+                kept.append(f' {name}')
+                continue
+            if name in URL_ATTRS and not _safe_url(value):
+                continue
+            if name == 'style' and not ALLOWED_STYLE.match(value):
+                continue
+            kept.append(f' {name}="{html.escape(value, quote=True)}"')
+        return ''.join(kept)
+
+    def _start(self, tag, attrs, self_closing):
+        if tag not in ALLOWED_TAGS:
+            self.out.append(html.escape(self.get_starttag_text() or f'<{tag}>'))
+            return
+        if tag in VOID_TAGS:
+            self.out.append(f'<{tag}{self._attrs(tag, attrs)}{" /" if self_closing else ""}>')
+            return
+        self.out.append(f'<{tag}{self._attrs(tag, attrs)}>')
+        if self_closing:
+            self.out.append(f'</{tag}>')
+        else:
+            self.stack.append(tag)
+
+    def handle_starttag(self, tag, attrs):
+        self._start(tag, attrs, False)
+
+    def handle_startendtag(self, tag, attrs):
+        self._start(tag, attrs, True)
+
+    def handle_endtag(self, tag):
+        if tag not in ALLOWED_TAGS:
+            self.out.append(f'&lt;/{html.escape(tag)}&gt;')
+            return
+        if tag not in self.stack:
+            return
+        while self.stack:
+            opened = self.stack.pop()
+            self.out.append(f'</{opened}>')
+            if opened == tag:
+                break
+
+    def handle_data(self, data):
+        self.out.append(html.escape(data, quote=False))
+
+    def handle_entityref(self, name):
+        self.out.append(f'&{name};')
+
+    def handle_charref(self, name):
+        self.out.append(f'&#{name};')
+
+    def unknown_decl(self, data):
+        pass
+
+    def result(self):
+        self.close()
+        self.out.extend(f'</{tag}>' for tag in reversed(self.stack))
+        self.stack = []
+        return ''.join(self.out)
+
+
+def sanitize_html(fragment):
+    """HTML 断片を許可リストで無害化した文字列を返す"""
+    parser = _Sanitizer()
+    parser.feed(fragment or '')
+    return parser.result()
@@ -12,7 +12,7 @@ from subprocess import Popen, PIPE
 from werkzeug.exceptions import BadRequest
 from werkzeug.utils import secure_filename
 from pdfminer.high_level import extract_text
-from urllib.parse import urlparse
+from urllib.parse import urlparse, unquote
 from pathlib import Path
 from pdf2image import convert_from_path
 from PIL import Image, ExifTags
@@ -21,16 +21,26 @@ import string
 import hashlib
 import base64
 import zipfile
+import tarfile
+import zlib
+import gzip
+import heapq
+import bisect
 
 # HEIFフォーマット（HEIC）のサポートを有効化
 register_heif_opener()
 import threading
+import sqlite3
+import queue
+import collections
+import concurrent.futures
 import datetime
 from flask_login import LoginManager, UserMixin, login_user, login_required, logout_user, current_user
 from werkzeug.security import generate_password_hash, check_password_hash
-from flask import abort
+from flask import abort, session, Response, stream_with_context
 from pdfminer.pdfparser import PDFSyntaxError
 import mimetypes
+import stat
 import random
 import datetime as dt
 import html
@@ -53,6 +63,8 @@ import yt_dlp
 from bs4 import BeautifulSoup
 from markdownify import markdownify as md
 import xml.etree.ElementTree as ET
+from search_index import TextSearchIndex
+from html_sanitizer import sanitize_html
 
 def sanitize_svg(file_content: bytes) -> bytes:
     """SVGをバリデーション＋サニタイズして安全なバイト列を返す。
@@ -256,14 +268,9 @@ def login():
                     with open('./access_log.txt', 'a') as log_file:
                         log_file.write(f"{dt.datetime.now().strftime('%Y-%m-%d %H:%M:%S')} - User {username} logged in successfully - {get_client_info()}\n")
 
-                    # ログイン時にキャッシュを削除（全件キャッシュ＋旧キャッシュ）
-                    cache_file_old = './post/.cache/post_files_info.json'
-                    cache_file_all = './post/.cache/post_files_info_all.json'
-                    filelist_cache = './post/.cache/filelist.json'
-                    for cf in [cache_file_old, cache_file_all, filelist_cache]:
-                        if os.path.exists(cf):
-                            os.remove(cf)
-                            print(f"Removed cache file: {cf}")
+                    # ログイン直後の一覧に直接編集分も反映されるよう、投稿インデックスをスイープする
+                    # （キャッシュを消して全件読み直させる必要はない）
+                    post_metadata_index.refresh(force=True)
 
                     # ログイン前にアクセスしようとしていたURLを取得
                     # GETパラメータとPOSTパラメータの両方をチェック
@@ -372,7 +379,16 @@ def index():
 
     if search_query:
         search_terms = re.split(r'\s+', search_query)  # 半角・全角スペースで分割
-        pdf_files = [f for f in pdf_files if is_text_matched(f, search_terms)]
+        if _sync_paper_search_index():
+            # clean_text にすべて含まれる、または memo にすべて含まれる論文
+            terms = [term.lower() for term in search_terms]
+            matched = set()
+            for fields in (('fulltext',), ('title', 'category', 'memo')):
+                keys = paper_search_index.match_all(terms, fields)
+                matched |= keys if keys is not None else {f[:-len('.pdf')] for f in pdf_files}
+            pdf_files = [f for f in pdf_files if f[:-len('.pdf')] in matched]
+        else:
+            pdf_files = [f for f in pdf_files if is_text_matched(f, search_terms)]
 
     pdf_files_info = []
     for file in pdf_files:
@@ -493,6 +509,98 @@ def is_text_matched(pdf_filename, search_terms):
                     return True
     return False
 
+# 論文の全文検索インデックス（pdf_id ごとに、どのファイルのどの部分かをフィールドとして保持）
+#   title / category / memo : memo/<pdf_id>.txt の1行目 / 2行目 / 3行目以降
+#   summary / summary2      : summary/, summary2/ の各ファイル
+#   fulltext                : clean_text/<pdf_id>.txt
+paper_search_index = TextSearchIndex(
+    './post/.cache/paper_search.db', ('title', 'category', 'memo', 'summary', 'summary2', 'fulltext'))
+PAPER_SEARCH_SOURCES = (('memo', './memo'), ('summary', './summary'),
+                        ('summary2', './summary2'), ('fulltext', './clean_text'))
+_paper_search_state = {'last_sweep': 0.0}
+_paper_search_lock = threading.Lock()
+
+def _paper_search_version(pdf_id):
+    """元ファイル群の mtime / size から作る版文字列（どれかが変われば再索引）"""
+    parts = []
+    for _, directory in PAPER_SEARCH_SOURCES:
+        try:
+            st = os.stat(os.path.join(directory, pdf_id + '.txt'))
+            parts.append(f"{st.st_mtime_ns}:{st.st_size}")
+        except OSError:
+            parts.append('-')
+    return '|'.join(parts)
+
+def _paper_journal_version(pdf_id):
+    """変更ジャーナルの重複判定に使う版（PDF が無ければ None）"""
+    if not os.path.exists(os.path.join('./pdfs', pdf_id + '.pdf')):
+        return None
+    return _paper_search_version(pdf_id)
+
+def _read_paper_for_search(pdf_id):
+    values = {}
+    for field, directory in PAPER_SEARCH_SOURCES:
+        try:
+            with open(os.path.join(directory, pdf_id + '.txt'), 'r', encoding='utf-8', errors='ignore') as f:
+                values[field] = f.read()
+        except OSError:
+            values[field] = ''
+    memo_lines = values.pop('memo').split('\n')
+    values['title'] = memo_lines[0]
+    values['category'] = memo_lines[1] if len(memo_lines) > 1 else ''
+    values['memo'] = '\n'.join(memo_lines[2:])
+    return values
+
+def _on_paper_changed(pdf_id, created=False):
+    """論文の memo / summary / summary2 / clean_text を書き換えた直後に呼ぶ共通フック。
+    新規取り込み時は created=True を渡す（変更ジャーナルの種別に使う）。"""
+    if os.path.exists(os.path.join('./pdfs', pdf_id + '.pdf')):
+        change_journal.record('paper', 'created' if created else 'updated', pdf_id)
+    else:
+        change_journal.record('paper', 'deleted', pdf_id)
+    if not paper_search_index.available:
+        return
+    if not os.path.exists(os.path.join('./pdfs', pdf_id + '.pdf')):
+        paper_search_index.delete(pdf_id)
+        return
+    paper_search_index.upsert(pdf_id, _paper_search_version(pdf_id), _read_paper_for_search(pdf_id))
+
+def _sync_paper_search_index():
+    """./pdfs と版を突き合わせ、変化した論文だけ検索インデックスへ反映する
+    （stat のみ、PostMetadataIndex.SWEEP_INTERVAL 秒に1回まで）。
+    書き込みルートを通らない変化（pdf_to_papernote.py や直接編集）は変更ジャーナルにも記録する。
+    インデックスが使えない場合は False を返す。"""
+    if not paper_search_index.available:
+        return False
+    with _paper_search_lock:
+        now = time.monotonic()
+        if now - _paper_search_state['last_sweep'] < PostMetadataIndex.SWEEP_INTERVAL:
+            return paper_search_index.available
+        indexed = paper_search_index.versions()
+        # 初回（インデックスが空）は全件が新規になるのでジャーナルには記録しない
+        notify = bool(indexed)
+        stale = []
+        events = {}
+        for name in os.listdir('./pdfs'):
+            if not name.endswith('.pdf') or not os.path.isfile(os.path.join('./pdfs', name)):
+                continue
+            pdf_id = name[:-len('.pdf')]
+            version = _paper_search_version(pdf_id)
+            old = indexed.pop(pdf_id, None)
+            if old != version:
+                stale.append((pdf_id, version))
+                events[pdf_id] = 'updated' if old is not None else 'created'
+        paper_search_index.upsert_many(
+            (pdf_id, version, _read_paper_for_search(pdf_id)) for pdf_id, version in stale)
+        for pdf_id in indexed:
+            paper_search_index.delete(pdf_id)
+            events[pdf_id] = 'deleted'
+        _paper_search_state['last_sweep'] = now
+        if notify and events:
+            change_journal.append(
+                [('paper', event, pdf_id, None) for pdf_id, event in events.items()], only_changed=True)
+    return paper_search_index.available
+
 
 def calculate_sha256(file_stream):
     sha256_hash = hashlib.sha256()
@@ -504,6 +612,153 @@ def allowed_file(filename):
     # return '.' in filename and filename.rsplit('.', 1)[1].lower() in {'pdf'}
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
+class AttachmentCatalog:
+    """添付ファイル（./attach）のメタデータカタログ。
+
+    ファイル名（<sha256>.<ext>、サムネイルは s_ 付き）→ {width, height, format, size, thumbnails}
+    を post/.cache/attachments.jsonl に追記形式で保存する（後の行が優先）。添付は内容アドレスで
+    書き換わらないため、一度記録すれば画像を開かずに寸法や存在を引ける。
+    アップロード系の処理が record() を呼び、カタログに無いファイルは初回参照時に調べて追記する。
+    記録済みと同じ内容は追記しない。他プロセスの追記は REFRESH_INTERVAL 秒に1回まで読み込み、
+    ファイルが作り直された（inode が変わった）場合は最初から読み直す。行数が存在する添付の数の
+    COMPACT_RATIO 倍を超えたら最新の内容だけに畳み込む。"""
+
+    REFRESH_INTERVAL = 2.0  # 秒
+    COMPACT_MIN_LINES = 1000
+    COMPACT_RATIO = 2
+
+    def __init__(self, attach_dir=UPLOAD_FOLDER, catalog_file='./post/.cache/attachments.jsonl'):
+        self.attach_dir = attach_dir
+        self.catalog_file = catalog_file
+        self._entries = {}
+        self._ino = None  # 読み込み中の catalog_file の inode
+        self._offset = 0  # catalog_file の読み込み済みバイト数
+        self._lines = 0   # catalog_file の読み込み済み行数
+        self._last_refresh = None
+        self._lock = threading.RLock()
+
+    def _probe(self, name):
+        """ファイルを調べてエントリを作る（存在しなければ None）。画像はヘッダだけ読む"""
+        path = os.path.join(self.attach_dir, name)
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        width = height = None
+        fmt = os.path.splitext(name)[1].lstrip('.').upper() or None
+        try:
+            with Image.open(path) as im:
+                width, height = im.width, im.height
+                fmt = im.format or fmt
+        except Exception:
+            pass  # SVG・PDF など PIL で開けないファイル
+        thumbnails = []
+        if not name.startswith('s_') and os.path.isfile(os.path.join(self.attach_dir, 's_' + name)):
+            thumbnails.append('s_' + name)
+        return {'width': width, 'height': height, 'format': fmt, 'size': st.st_size, 'thumbnails': thumbnails}
+
+    def _refresh(self, force=False):
+        now = time.monotonic()
+        if not force and self._last_refresh is not None and now - self._last_refresh < self.REFRESH_INTERVAL:
+            return
+        self._last_refresh = now
+        try:
+            with open(self.catalog_file, 'rb') as f:
+                st = os.fstat(f.fileno())
+                if st.st_ino != self._ino or st.st_size < self._offset:
+                    # backfill・畳み込みで作り直された
+                    self._entries, self._ino, self._offset, self._lines = {}, st.st_ino, 0, 0
+                f.seek(self._offset)
+                for line in f:
+                    if not line.endswith(b'\n'):
+                        break
+                    self._offset += len(line)
+                    self._lines += 1
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue
+                    name = record.pop('name', None)
+                    if name:
+                        self._entries[name] = record if record.get('size') is not None else None
+        except FileNotFoundError:
+            return
+        except Exception as e:
+            print(f"Error reading attachment catalog: {e}")
+            return
+        if self._lines > self.COMPACT_MIN_LINES:
+            live = {name: entry for name, entry in self._entries.items() if entry is not None}
+            if self._lines > len(live) * self.COMPACT_RATIO and self._rewrite(live):
+                self._refresh(force=True)
+
+    def _rewrite(self, entries):
+        """カタログを entries だけの内容に置き換える（他プロセスは inode の変化で読み直す）"""
+        try:
+            os.makedirs(os.path.dirname(self.catalog_file), exist_ok=True)
+            tmp_path = f"{self.catalog_file}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                for name in sorted(entries):
+                    f.write(json.dumps({'name': name, **entries[name]}, ensure_ascii=False) + '\n')
+            os.replace(tmp_path, self.catalog_file)
+            return True
+        except Exception as e:
+            print(f"Error writing attachment catalog: {e}")
+            return False
+
+    def _append(self, records):
+        if not records:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.catalog_file), exist_ok=True)
+            with open(self.catalog_file, 'a', encoding='utf-8') as f:
+                f.write(''.join(json.dumps(r, ensure_ascii=False) + '\n' for r in records))
+        except Exception as e:
+            print(f"Error writing attachment catalog: {e}")
+
+    def record(self, *names):
+        """書き込んだ添付を記録する（元画像を渡せば s_ サムネイルも合わせて記録）"""
+        with self._lock:
+            self._refresh()
+            records = []
+            for name in names:
+                base = name[2:] if name.startswith('s_') else name
+                for n in (base, 's_' + base):
+                    entry = self._probe(n)
+                    if self._entries.get(n, False) == entry or (entry is None and n not in self._entries):
+                        continue  # 記録済みと同じ（再アップロードなど）
+                    self._entries[n] = entry
+                    records.append({'name': n, **(entry or {'size': None})})
+            self._append(records)
+
+    def get(self, name):
+        """エントリを返す（ファイルが無ければ None）。未記録のファイルはここで調べて記録する"""
+        with self._lock:
+            self._refresh()
+            if name in self._entries:
+                return self._entries[name]
+            entry = self._probe(name)
+            if entry is not None:
+                self._entries[name] = entry
+                self._append([{'name': name, **entry}])
+            return entry
+
+    def backfill(self):
+        """./attach を全走査してカタログを作り直す（既存ファイルの初期登録用）。記録件数を返す"""
+        with self._lock:
+            entries = {}
+            with os.scandir(self.attach_dir) as it:
+                for de in it:
+                    if de.name.startswith('.') or not de.is_file():
+                        continue
+                    entry = self._probe(de.name)
+                    if entry is not None:
+                        entries[de.name] = entry
+            self._rewrite(entries)
+            self._refresh(force=True)
+            return len(entries)
+
+attachment_catalog = AttachmentCatalog()
+
 @login_required
 @app.route('/attach_upload', methods=['POST'])
 def attach_upload():
@@ -603,6 +858,7 @@ def attach_upload():
             small_file_path = os.path.join(UPLOAD_FOLDER, small_filename)
             shutil.copy(file_path, small_file_path)
 
+        attachment_catalog.record(new_filename)
         return jsonify({'filename': original_filename, 'url': file_url, 'isImage': is_image})
 
     return jsonify({'error': 'File type not allowed'}), 400
@@ -644,6 +900,7 @@ def attach_save_svg():
     small_filename = f"s_{new_filename}"
     small_file_path = os.path.join(UPLOAD_FOLDER, small_filename)
     shutil.copy(file_path, small_file_path)
+    attachment_catalog.record(new_filename)
 
     file_url = f"/attach/{new_filename}"
     return jsonify({'url': file_url, 'filename': new_filename})
@@ -695,6 +952,7 @@ def attach_save_image():
         small.save(os.path.join(UPLOAD_FOLDER, small_filename))
     except Exception as e:
         print(f"サムネイル生成エラー: {str(e)}")
+    attachment_catalog.record(new_filename)
 
     file_url = f"/attach/{new_filename}"
     return jsonify({'url': file_url, 'filename': new_filename})
@@ -752,22 +1010,15 @@ def post_replace_image():
     with open(post_path, 'w', encoding='utf-8', errors='replace') as f:
         f.write(new_content)
 
-    # キャッシュ削除（/edit_post と同じ3ファイル）
-    for cf in ['./post/.cache/post_files_info.json',
-               './post/.cache/post_files_info_all.json',
-               './post/.cache/filelist.json']:
-        if os.path.exists(cf):
-            try:
-                os.remove(cf)
-            except Exception:
-                pass
+    # 投稿インデックスを差分更新
+    _on_post_changed(filename)
 
     return jsonify({'ok': True})
 
 
 @app.route('/attach/<filename>')
 def uploaded_file(filename):
-    return send_from_directory(UPLOAD_FOLDER, secure_filename(filename))
+    return _send_stored_file(UPLOAD_FOLDER, filename)
 
 
 @login_required
@@ -813,6 +1064,7 @@ def file_upload():
                 if not os.path.exists(memo_path):
                     with open(memo_path, 'w') as memo_file:
                         memo_file.write(original_filename + '\n')  # 1行目に元のファイル名を記載
+                    _on_paper_changed(file_hash, created=True)
                 
                 return jsonify({'message': 'ファイルがアップロードされました'}), 200
             except Exception as e:
@@ -913,6 +1165,7 @@ def pdf_to_cleantext(pdf_path, clean_text_dir):
         
         with open(clean_text_path, 'w', encoding='utf-8') as file:
             file.write(clean_text)
+        _on_paper_changed(clean_text_filename[:-len('.txt')])
         print(f"Created clean text file for: {os.path.basename(pdf_path)}")
         return True
     except Exception as e:
@@ -945,7 +1198,7 @@ def pdf_file(filename):
     # else:
     #     abort(403)  # Forbiddenアクセス拒否
 
-    return send_from_directory('./pdfs', secure_filename(filename))
+    return _send_stored_file('./pdfs', filename)
 
 @app.route('/tw/<path:filename>')
 def tw(filename):
@@ -980,6 +1233,7 @@ def edit_memo(filename):
         content = request.form['content']
         with open(txt_path, 'w') as f:
             f.write(content)
+        _on_paper_changed(os.path.splitext(txt_filename)[0])
         # return redirect(url_for('index'))
         return redirect(url_for('permalink', filename=filename.replace('.pdf', '')))
 
@@ -1046,6 +1300,8 @@ def delete_file():
             else:
                 print(f"{file_type} at {path} does not exist.")
 
+        _on_paper_changed(secure_filename(filename).replace('.pdf', ''))
+
         if deleted_files:
             return jsonify({'message': f'{filename} の以下のファイルが削除されました: {", ".join(deleted_files)}'}), 200
         else:
@@ -1055,11 +1311,214 @@ def delete_file():
         print(f"Error in delete_file: {str(e)}")
         return jsonify({'error': f'ファイルの削除中にエラーが発生しました: {str(e)}'}), 500
 
+# ============================================
+# 条件付き GET（ETag / Last-Modified）
+# ============================================
+
+def _template_validator_salt():
+    """main.py とテンプレートの更新時刻。HTML の ETag に含め、デプロイ時に無効化する"""
+    base_dir = os.path.dirname(os.path.abspath(__file__))
+    mtimes = [os.stat(os.path.abspath(__file__)).st_mtime_ns]
+    try:
+        with os.scandir(os.path.join(base_dir, 'templates')) as it:
+            mtimes.extend(de.stat().st_mtime_ns for de in it if de.is_file())
+    except OSError:
+        pass
+    return f"{max(mtimes):x}"
+
+_TEMPLATE_VALIDATOR_SALT = _template_validator_salt()
+
+def _stat_or_none(path):
+    try:
+        return os.stat(path)
+    except OSError:
+        return None
+
+def _file_validators(stats, *extra):
+    """ファイルの stat（inode・サイズ・mtime_ns）と追加要素から強い ETag と Last-Modified を作る。
+    存在しないファイルは None を渡す。返却: (etag, 最終更新の epoch 秒 or None)"""
+    parts = [f"{st.st_ino:x}-{st.st_size:x}-{st.st_mtime_ns:x}" if st else '-' for st in stats]
+    parts.extend(str(x) for x in extra)
+    etag = hashlib.sha1('|'.join(parts).encode('utf-8')).hexdigest()[:32]
+    mtimes = [st.st_mtime for st in stats if st]
+    return etag, (int(max(mtimes)) if mtimes else None)
+
+def _with_validators(resp, etag, last_modified=None):
+    """応答に ETag / Last-Modified を付け、毎回の再検証（no-cache）を指示する"""
+    resp.set_etag(etag)
+    if last_modified is not None:
+        resp.last_modified = last_modified
+    resp.headers['Cache-Control'] = 'no-cache'
+    return resp
+
+def _not_modified(etag, last_modified=None, mimetype=None):
+    """If-None-Match（優先）/ If-Modified-Since を評価し、未変更なら 304 応答を返す。変更ありなら None。
+    本文に認証状態など時刻以外の要素が効く応答は last_modified=None として ETag だけで判定する。
+    mimetype は 200 で返す表現の種類で、_compress_response の圧縮対象なら 304 にも同じ Vary を付ける"""
+    if request.if_none_match:
+        if not request.if_none_match.contains_weak(etag):
+            return None
+    else:
+        since = request.if_modified_since
+        if since is None or last_modified is None:
+            return None
+        if last_modified > since.replace(tzinfo=datetime.timezone.utc).timestamp():
+            return None
+    resp = _with_validators(make_response('', 304), etag, last_modified)
+    if mimetype in COMPRESSIBLE_MIMETYPES:
+        resp.vary.add('Accept-Encoding')
+    return resp
+
+def _csrf_validator_part():
+    """ページに埋め込む CSRF トークンの元（セッション毎）と1時間単位の時刻。
+    トークン入りのページを期限切れ（WTF_CSRF_TIME_LIMIT）まで 304 で使い回さないために ETag に含める"""
+    return f"{session.get('csrf_token', '')}:{int(time.time()) // 3600}"
+
+# SHA-256 をファイル名にして保存するファイル（/attach/<hash>.<ext>、/pdfs/<hash>.pdf）。名前が同じなら中身も同じ
+CONTENT_ADDRESSED_FILENAME = re.compile(r'^(?:s_)?[a-f0-9]{64}\.[A-Za-z0-9]+$')
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600  # 1年
+
+def _file_offload_response(directory, filename):
+    """config の file_offload に従い、本体の送信をフロントのプロキシに任せる応答を作る（未設定なら None）"""
+    offload = config.get('file_offload') or {}
+    mode = (offload.get('mode') or '').lower()
+    if mode == 'x-accel-redirect':
+        prefix = (offload.get('x_accel_prefix') or {}).get(os.path.basename(os.path.normpath(directory)))
+        if not prefix:
+            return None
+        header, value = 'X-Accel-Redirect', prefix.rstrip('/') + '/' + filename
+    elif mode == 'x-sendfile':
+        header, value = 'X-Sendfile', os.path.abspath(os.path.join(directory, filename))
+    else:
+        return None
+    resp = make_response('')
+    resp.headers[header] = value
+    resp.headers['Content-Type'] = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    return resp
+
+def _send_stored_file(directory, filename):
+    """/attach・/pdfs の配信。SHA-256 名のファイルは内容が不変なので、ファイル名を ETag にして
+    immutable で長期キャッシュさせ、可能なら本体の送信をプロキシ（X-Accel-Redirect / X-Sendfile）に任せる。
+    Range リクエストは send_from_directory（Werkzeug）が 206 で応答する"""
+    filename = secure_filename(filename)
+    st = _stat_or_none(os.path.join(directory, filename))
+    if st is None or not stat.S_ISREG(st.st_mode):
+        abort(404)
+
+    if not CONTENT_ADDRESSED_FILENAME.match(filename):
+        etag, last_modified = _file_validators([st])
+        not_modified = _not_modified(etag, last_modified)
+        if not_modified:
+            return not_modified
+        resp = send_from_directory(directory, filename, etag=etag, last_modified=last_modified)
+        return _with_validators(resp, etag, last_modified)
+
+    etag = filename
+    if request.if_none_match.contains_weak(etag) or (not request.if_none_match and request.if_modified_since):
+        resp = make_response('', 304)
+    else:
+        resp = _file_offload_response(directory, filename) or \
+            send_from_directory(directory, filename, etag=etag, max_age=IMMUTABLE_MAX_AGE)
+    resp.set_etag(etag)
+    resp.headers['Cache-Control'] = f'public, max-age={IMMUTABLE_MAX_AGE}, immutable'
+    return resp
+
+def _post_is_public_at(filename, st):
+    """メタデータ上、この版（mtime / size）の投稿が非認証ユーザーに見せてよいものか。不明なら False"""
+    entry = post_metadata_index.get(filename)
+    return (entry is not None and entry['timestamp'] == st.st_mtime
+            and entry['size'] == st.st_size and not entry['private'])
+
+# ============================================
+# レスポンス圧縮（gzip / brotli）
+# ============================================
+
+COMPRESS_MIN_SIZE = 1024  # これ未満の応答は圧縮しない（バイト）
+COMPRESSIBLE_MIMETYPES = {'application/json', 'text/plain', 'text/markdown'}
+_brotli = None  # brotli モジュール（遅延 import。未インストールなら False）
+_precompressed_artifacts = {}  # 名前 → (version, {符号化: バイト列})
+_precompressed_lock = threading.Lock()
+
+def _brotli_module():
+    global _brotli
+    if _brotli is None:
+        try:
+            import brotli
+            _brotli = brotli
+        except ImportError:
+            _brotli = False
+    return _brotli or None
+
+def _negotiate_encoding():
+    """Accept-Encoding から応答の符号化を選ぶ（br > gzip。どちらも不可なら None）"""
+    accepted = request.accept_encodings
+    if accepted['br'] and _brotli_module():
+        return 'br'
+    if accepted['gzip']:
+        return 'gzip'
+    return None
+
+def _compress(data, encoding):
+    if encoding == 'br':
+        return _brotli_module().compress(data, quality=5)
+    return gzip.compress(data, compresslevel=6)
+
+@app.after_request
+def _compress_response(resp):
+    """JSON / テキストの応答を、閾値以上の大きさならクライアントが受け付ける形式で圧縮する。
+    HTML はフォームの CSRF トークンを含むため（BREACH 対策）対象外"""
+    if (resp.status_code != 200 or resp.direct_passthrough or resp.is_streamed
+            or 'Content-Encoding' in resp.headers or resp.mimetype not in COMPRESSIBLE_MIMETYPES):
+        return resp
+    resp.vary.add('Accept-Encoding')
+    data = resp.get_data()
+    if len(data) < COMPRESS_MIN_SIZE:
+        return resp
+    encoding = _negotiate_encoding()
+    if encoding is None:
+        return resp
+    resp.set_data(_compress(data, encoding))
+    resp.headers['Content-Encoding'] = encoding
+    # 圧縮後は別表現なので弱い ETag にする（If-None-Match は弱い比較なので 304 判定はそのまま効く）
+    etag, _ = resp.get_etag()
+    if etag:
+        resp.set_etag(etag, weak=True)
+    return resp
+
+def _precompressed_json_response(name, version, build):
+    """version（generation など）が変わったときだけ build() の結果を JSON 化し、
+    圧縮済みのバイト列も符号化ごとに1回だけ作って保持する。以降の要求は保持済みのバイト列をそのまま返す"""
+    encoding = _negotiate_encoding()
+    with _precompressed_lock:
+        cached = _precompressed_artifacts.get(name)
+        if cached is None or cached[0] != version:
+            cached = (version, {'identity': jsonify(build()).get_data()})
+            _precompressed_artifacts[name] = cached
+        bodies = cached[1]
+        if encoding and len(bodies['identity']) < COMPRESS_MIN_SIZE:
+            encoding = None
+        if encoding and encoding not in bodies:
+            bodies[encoding] = _compress(bodies['identity'], encoding)
+        body = bodies[encoding or 'identity']
+    resp = app.response_class(body, mimetype='application/json')
+    if encoding:
+        resp.headers['Content-Encoding'] = encoding
+    resp.vary.add('Accept-Encoding')
+    return resp
+
 @app.route('/clean_text/<filename>')
 def clean_text_file(filename):
     txt_filename = secure_filename(filename.replace('.pdf', '.txt'))
     print(txt_filename)
-    return send_from_directory('./clean_text', txt_filename)
+    st = _stat_or_none(os.path.join('./clean_text', txt_filename))
+    if st is None:
+        abort(404)
+    etag, last_modified = _file_validators([st])
+    not_modified = _not_modified(etag, last_modified)
+    if not_modified:
+        return not_modified
+    resp = send_from_directory('./clean_text', txt_filename, etag=etag, last_modified=last_modified)
+    return _with_validators(resp, etag, last_modified)
     
 @app.route('/move_to_top/<filename>', methods=['GET'])
 def move_to_top(filename):
@@ -1072,140 +1531,653 @@ def move_to_top(filename):
     else:
         return jsonify({'message': 'エラー'})
 
-def get_file_metadata(file_path):
-    print(f"Reading metadata from: {file_path}")
-    """ファイルから必要な情報のみを取得"""
-    try:
-        with open(file_path, 'r', encoding='utf-8', errors='ignore') as file:
-            first_line = file.readline().strip()  # タイトル
-            second_line = file.readline().strip() # タグ
-            return {
-                'title': first_line,
-                'tags': second_line,
-                'timestamp': os.path.getmtime(file_path)
-            }
-    except Exception as e:
-        print(f"Error reading file {file_path}: {e}")
+class SnapshotDeltaStore:
+    """filename → レコード の dict を、スナップショット（JSON）と追記専用の差分ログ（JSON Lines）の
+    2段構成で保存する。変更は変化したファイルの行を差分ログに追記するだけで、
+    COMPACT_THRESHOLD 行を超えたらスナップショットへ畳み込む。
+
+    ファイル形式は _decode_* / _encode_* で決まり、既定はスナップショットが dict そのまま、
+    差分ログの1行が {filename, record}（削除時は record が null）。"""
+
+    COMPACT_THRESHOLD = 200  # 差分ログの行数上限
+    SNAPSHOT_INDENT = None
+
+    def __init__(self, snapshot_file, delta_file, label):
+        self.snapshot_file = snapshot_file
+        self.delta_file = delta_file
+        self.label = label  # エラーメッセージ用の名前
+        self.snapshot_found = False  # 直前の load() でスナップショットがあったか
+        self._delta_lines = 0
+
+    def _decode_snapshot(self, data):
+        return data
+
+    def _encode_snapshot(self, records):
+        """書き出す (パス, 内容) の列"""
+        return [(self.snapshot_file, records)]
+
+    def _decode_delta(self, rec):
+        """差分ログの1行から (filename, レコード) を返す（削除ならレコードは None）"""
+        return rec['filename'], rec.get('record')
+
+    def _encode_delta(self, name, record):
+        return {'filename': name, 'record': record}
+
+    def load(self):
+        """スナップショット + 差分ログ を読み込んだ dict を返す"""
+        records = {}
+        self.snapshot_found = False
+        try:
+            with open(self.snapshot_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            self.snapshot_found = True
+            records = self._decode_snapshot(data)
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            print(f"Error reading {self.label}: {e}")
+
+        self._delta_lines = 0
+        try:
+            with open(self.delta_file, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        name, record = self._decode_delta(json.loads(line))
+                    except ValueError:
+                        continue  # 書き込み途中の行は無視（mtime / size の突き合わせで補正される）
+                    self._delta_lines += 1
+                    if record is None:
+                        records.pop(name, None)
+                    else:
+                        records[name] = record
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            print(f"Error reading {self.label} delta: {e}")
+        return records
+
+    def save(self, records):
+        """records 全体をスナップショットに書き出し、差分ログを消す"""
+        try:
+            os.makedirs(os.path.dirname(self.snapshot_file), exist_ok=True)
+            # 他プロセスが読みかけのファイルを壊さないよう一時ファイル経由で置き換える
+            for path, data in self._encode_snapshot(records):
+                tmp_path = f"{path}.{os.getpid()}.tmp"
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump(data, f, ensure_ascii=False, indent=self.SNAPSHOT_INDENT)
+                os.replace(tmp_path, path)
+            if os.path.exists(self.delta_file):
+                os.remove(self.delta_file)
+            self._delta_lines = 0
+        except Exception as e:
+            print(f"Error writing {self.label}: {e}")
+
+    def append(self, records, names):
+        """records のうち names（削除されたものは records に無い）の行を差分ログに追記する"""
+        names = list(names)
+        if not names:
+            return
+        if self._delta_lines + len(names) > self.COMPACT_THRESHOLD:
+            self.save(records)
+            return
+        lines = [json.dumps(self._encode_delta(name, records.get(name)), ensure_ascii=False)
+                 for name in names]
+        try:
+            os.makedirs(os.path.dirname(self.delta_file), exist_ok=True)
+            with open(self.delta_file, 'a', encoding='utf-8') as f:
+                f.write('\n'.join(lines) + '\n')
+            self._delta_lines += len(lines)
+        except Exception as e:
+            print(f"Error writing {self.label} delta: {e}")
+
+class PostMetadataStore(SnapshotDeltaStore):
+    """PostMetadataIndex の永続化。スナップショットは従来どおりトピック別の
+    post_files_info_all.json とファイル名一覧 filelist.json、差分ログの1行は
+    {filename, title, tags, timestamp, size}（削除時は {filename, deleted: true}）。
+    読み込んだレコードはこの5項目だけを持つ。"""
+
+    SNAPSHOT_INDENT = 2
+    FIELDS = ('filename', 'title', 'tags', 'timestamp', 'size')
+
+    def __init__(self, snapshot_file, filelist_file, delta_file):
+        super().__init__(snapshot_file, delta_file, 'cache')
+        self.filelist_file = filelist_file
+
+    @staticmethod
+    def _record(fi):
+        return {'filename': fi['filename'], 'title': fi.get('title', ''), 'tags': fi.get('tags', ''),
+                'timestamp': fi.get('timestamp', 0), 'size': fi.get('size')}
+
+    def _decode_snapshot(self, data):
+        return {fi['filename']: self._record(fi) for files in data.values() for fi in files}
+
+    def _encode_snapshot(self, records):
+        topic_files = {}
+        for record in records.values():
+            topic_match = re.match(r'\[(.*?)\]', record['filename'])
+            topic = topic_match.group(1) if topic_match else '_トピック未設定'
+            topic_files.setdefault(topic, []).append({f: record[f] for f in self.FIELDS})
+        for files in topic_files.values():
+            files.sort(key=lambda x: x['filename'])
+        return [(self.snapshot_file, dict(sorted(topic_files.items()))),
+                (self.filelist_file, sorted(records))]
+
+    def _decode_delta(self, rec):
+        return rec['filename'], None if rec.get('deleted') else self._record(rec)
+
+    def _encode_delta(self, name, record):
+        if record is None:
+            return {'filename': name, 'deleted': True}
+        return {f: record[f] for f in self.FIELDS}
+
+class PostMetadataIndex:
+    """./post 直下の投稿メタデータをプロセス内で共有するインデックス。
+
+    filename → {title, tags, category, timestamp(mtime), size, hidden, private}
+    を保持する。初回のみ全ファイルを読み込み、以降はディレクトリの stat スイープ
+    （SWEEP_INTERVAL 秒に1回まで）で mtime / size が変わったファイルだけを
+    読み直す。書き込み系ルートは update() で該当ファイルのエントリだけを差し替える。
+
+    永続化は従来の post_files_info_all.json / filelist.json（スナップショット）と
+    追記専用の差分ログ post_files_info_delta.jsonl の2段構成（PostMetadataStore）。
+    プロセス再起動時は スナップショット + 差分ログ を初期値にして変更分だけを読み込む。
+
+    スイープで見つけた変化（直接編集や他プロセスの書き込み）は on_sweep に
+    filename → 'created' / 'updated' / 'deleted' の dict で通知する。
+
+    generation ごとに変化したファイル名を直近 CHANGE_LOG_SIZE 世代分だけ覚えておき、
+    派生インデックスは changes_since() で前回同期した世代以降の変化だけを反映できる。"""
+
+    SWEEP_INTERVAL = 2.0      # 秒
+    CHANGE_LOG_SIZE = 1000    # 覚えておく世代数
+
+    def __init__(self, post_dir='./post',
+                 cache_file='./post/.cache/post_files_info_all.json',
+                 filelist_cache='./post/.cache/filelist.json',
+                 delta_file='./post/.cache/post_files_info_delta.jsonl'):
+        self.post_dir = post_dir
+        self._store = PostMetadataStore(cache_file, filelist_cache, delta_file)
+        self.generation = 0  # エントリが変化するたびに加算（派生キャッシュの無効化判定用）
+        self._changes = collections.deque(maxlen=self.CHANGE_LOG_SIZE)  # (generation, 変化したファイル名)
+        self._entries = {}
+        self._loaded = False
+        self._last_sweep = 0.0
+        self.on_sweep = None  # スイープで見つけた変化の通知先
+        self._lock = threading.RLock()
+
+    @staticmethod
+    def _make_entry(filename, title, tags, mtime, size):
+        topic_match = re.match(r'\[(.*?)\]', filename)
         return {
-            'title': '',
-            'tags': '',
-            'timestamp': 0
+            'filename': filename,
+            'title': title,
+            'tags': tags,
+            'category': topic_match.group(1) if topic_match else None,
+            'timestamp': mtime,
+            'size': size,
+            'hidden': title.startswith('#'),    # 一覧で非認証ユーザーに見せない
+            'private': title.startswith('##'),  # 本文を非認証ユーザーに見せない
         }
 
-def get_sorted_post_files_info():
-    """投稿ファイルの情報を取得（常に全件をキャッシュし、返却時に認証でフィルタ）"""
-    CACHE_FILE = './post/.cache/post_files_info_all.json'
-    FILELIST_CACHE = './post/.cache/filelist.json'
-    search_query = request.args.get('search')
-    authenticated = current_user.is_authenticated
-    
-    # 検索なしのときはキャッシュ（全件）を利用
-    if not search_query:
-        if os.path.exists(CACHE_FILE) and os.path.exists(FILELIST_CACHE):
+    def _read_entry(self, filename, st):
+        path = os.path.join(self.post_dir, filename)
+        try:
+            with open(path, 'r', encoding='utf-8', errors='ignore') as f:
+                title = f.readline().strip()
+                tags = f.readline().strip()
+        except Exception as e:
+            print(f"Error reading file {path}: {e}")
+            title, tags = '', ''
+        return self._make_entry(filename, title, tags, st.st_mtime, st.st_size)
+
+    def _load_snapshot(self):
+        """保存済みキャッシュ（スナップショット + 差分ログ）をエントリの初期値として読み込む。
+        スナップショットがあったかを返す"""
+        self._entries = {
+            name: self._make_entry(name, rec['title'], rec['tags'], rec['timestamp'], rec['size'])
+            for name, rec in self._store.load().items()}
+        return self._store.snapshot_found
+
+    def _sweep(self):
+        """stat のみでディレクトリを走査し、変化したファイルだけ読み直す。
+        filename → 変化の種類（'created' / 'updated' / 'deleted'）の dict を返す"""
+        changed = {}
+        seen = set()
+        with os.scandir(self.post_dir) as it:
+            for de in it:
+                if de.name.endswith('.gitkeep'):
+                    continue
+                try:
+                    if not de.is_file():
+                        continue
+                    st = de.stat()
+                except OSError:
+                    continue
+                seen.add(de.name)
+                old = self._entries.get(de.name)
+                if old and old['timestamp'] == st.st_mtime and old['size'] in (None, st.st_size):
+                    old['size'] = st.st_size
+                    continue
+                self._entries[de.name] = self._read_entry(de.name, st)
+                changed[de.name] = 'updated' if old else 'created'
+        for name in [n for n in self._entries if n not in seen]:
+            del self._entries[name]
+            changed[name] = 'deleted'
+        return changed
+
+    def refresh(self, force=False):
+        with self._lock:
+            now = time.monotonic()
+            if not force and self._loaded and now - self._last_sweep < self.SWEEP_INTERVAL:
+                return
+            # 初回でスナップショットも無い場合は全件が新規になるので通知しない
+            notify = self._loaded or self._load_snapshot()
+            changed = self._sweep()
+            if not self._loaded:
+                self.generation += 1
+                self._store.save(self._entries)
+            elif changed:
+                self._advance(changed)
+                self._store.append(self._entries, changed)
+            self._loaded = True
+            self._last_sweep = now
+            if changed and notify and self.on_sweep:
+                self.on_sweep(changed)
+
+    def update(self, filename):
+        """1ファイル分のエントリを現在のファイル内容で差し替える（存在しなければ削除）"""
+        self.update_many([filename])
+
+    def update_many(self, filenames):
+        """複数ファイルのエントリをまとめて差し替える（generation の加算と差分ログ追記は1回）"""
+        with self._lock:
+            if not self._loaded:
+                self.refresh(force=True)
+                return
+            changed = {}
+            for filename in dict.fromkeys(filenames):
+                path = os.path.join(self.post_dir, filename)
+                try:
+                    st = os.stat(path)
+                    is_file = os.path.isfile(path) and not filename.endswith('.gitkeep')
+                except OSError:
+                    is_file = False
+                if is_file:
+                    existed = filename in self._entries
+                    self._entries[filename] = self._read_entry(filename, st)
+                    changed[filename] = 'updated' if existed else 'created'
+                elif self._entries.pop(filename, None) is not None:
+                    changed[filename] = 'deleted'
+            if changed:
+                self._advance(changed)
+                self._store.append(self._entries, changed)
+
+    def _advance(self, names):
+        self.generation += 1
+        self._changes.append((self.generation, tuple(names)))
+
+    def changes_since(self, generation):
+        """(現在の generation, generation より後に変化したファイル名の set) を返す。
+        記録が残っていない（初回・古すぎる）場合は set の代わりに None（全件を突き合わせること）"""
+        self.refresh()
+        with self._lock:
+            if generation == self.generation:
+                return self.generation, set()
+            if generation is None or not self._changes or self._changes[0][0] > generation + 1:
+                return self.generation, None
+            names = set()
+            for gen, changed in self._changes:
+                if gen > generation:
+                    names.update(changed)
+            return self.generation, names
+
+    def entries(self):
+        """全エントリのリストを返す（dict は読み取り専用として扱うこと）"""
+        self.refresh()
+        with self._lock:
+            return list(self._entries.values())
+
+    def get(self, filename):
+        self.refresh()
+        with self._lock:
+            return self._entries.get(filename)
+
+post_metadata_index = PostMetadataIndex()
+
+class ChangeJournal:
+    """投稿・論文の作成 / 更新 / リネーム / 削除を記録する追記専用ジャーナル（JSON Lines）。
+
+    1行1イベント {time, kind: post|paper, event: created|updated|renamed|deleted, id, old_id}。
+    カーソルは "<inode>-<バイトオフセット>" で、追記しかしないため複数プロセスから書き込んでも
+    既存行の位置は変わらない。MAX_BYTES を超えたら新しい側の半分だけ残して作り直す
+    （inode が変わるので、それ以前のカーソルは reset 扱いになる）。
+
+    記録した id ごとの版（versioners[kind](id) の戻り値）を state_path の SQLite に残し、
+    スイープで見つけた変化は版が前回の記録と異なるものだけを追記する。各ワーカーが同じ
+    直接編集をスイープで見つけても、照合から追記までを1トランザクションで行うため1回だけ記録される。"""
+
+    MAX_BYTES = 8 * 1024 * 1024
+
+    def __init__(self, path='./post/.cache/changes.jsonl', state_path='./post/.cache/changes_state.db'):
+        self.path = path
+        self.state_path = state_path
+        self.versioners = {}  # kind → id から現在の版（存在しなければ None）を返す関数
+        self._lock = threading.Lock()
+        self._conn = None
+        self._state_available = True
+
+    def _state_conn(self):
+        if self._conn is not None or not self._state_available:
+            return self._conn
+        try:
+            os.makedirs(os.path.dirname(self.state_path), exist_ok=True)
+            conn = sqlite3.connect(self.state_path, timeout=30, check_same_thread=False, isolation_level=None)
+            conn.execute('CREATE TABLE IF NOT EXISTS journaled ('
+                         'kind TEXT NOT NULL, id TEXT NOT NULL, version TEXT, PRIMARY KEY (kind, id))')
+            self._conn = conn
+        except sqlite3.Error as e:
+            # 状態が使えなくても記録は続ける（スイープ分が重複しうるだけ）
+            print(f"Change journal state unavailable ({self.state_path}): {e}")
+            self._state_available = False
+        return self._conn
+
+    def _track(self, conn, events, only_changed):
+        """記録する id の版を状態に反映し、追記するイベントだけを返す"""
+        kept = []
+        for kind, event, item_id, old_id in events:
+            versioner = self.versioners.get(kind)
+            if versioner is None:
+                kept.append((kind, event, item_id, old_id))
+                continue
+            version = versioner(item_id)
+            if only_changed:
+                row = conn.execute('SELECT version FROM journaled WHERE kind = ? AND id = ?',
+                                   (kind, item_id)).fetchone()
+                if row is not None and row[0] == version:
+                    continue
+            conn.execute('INSERT OR REPLACE INTO journaled(kind, id, version) VALUES(?, ?, ?)',
+                         (kind, item_id, version))
+            if old_id is not None:
+                conn.execute('INSERT OR REPLACE INTO journaled(kind, id, version) VALUES(?, ?, ?)',
+                             (kind, old_id, versioner(old_id)))
+            kept.append((kind, event, item_id, old_id))
+        return kept
+
+    def append(self, events, only_changed=False):
+        """(kind, event, id, old_id) の列を1回の書き込みで追記する。
+        only_changed=True（スイープで見つけた変化）の場合は、版が前回の記録と同じイベントを落とす。"""
+        events = list(events)
+        if not events:
+            return
+        with self._lock:
             try:
-                current_files = set(
-                    f for f in os.listdir('./post')
-                    if os.path.isfile(os.path.join('./post', f)) and not f.endswith('.gitkeep')
-                )
-                with open(FILELIST_CACHE, 'r') as f:
-                    cached_files = set(json.load(f))
-                if current_files == cached_files:
-                    with open(CACHE_FILE, 'r') as f:
-                        all_cached = json.load(f)  # 全件
-                    if not authenticated:
-                        filtered = {}
-                        for topic, files in all_cached.items():
-                            visible = [it for it in files if not it.get('title', '').startswith('#')]
-                            if visible:
-                                filtered[topic] = visible
-                        return filtered
-                    return all_cached
+                conn = self._state_conn()
+                if conn is None:
+                    self._write(events)
+                    return
+                conn.execute('BEGIN IMMEDIATE')
+                try:
+                    self._write(self._track(conn, events, only_changed))
+                    conn.execute('COMMIT')
+                except BaseException:
+                    conn.execute('ROLLBACK')
+                    raise
             except Exception as e:
-                print(f"Error reading cache: {e}")
+                print(f"Error writing change journal: {e}")
+
+    def _write(self, events):
+        now = dt.datetime.now().isoformat(timespec='seconds')
+        lines = []
+        for kind, event, item_id, old_id in events:
+            record = {'time': now, 'kind': kind, 'event': event, 'id': item_id}
+            if old_id is not None:
+                record['old_id'] = old_id
+            lines.append(json.dumps(record, ensure_ascii=False) + '\n')
+        if not lines:
+            return
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, ''.join(lines).encode('utf-8'))
+            size = os.fstat(fd).st_size
+        finally:
+            os.close(fd)
+        if size > self.MAX_BYTES:
+            self._compact()
+
+    def record(self, kind, event, item_id, old_id=None):
+        self.append([(kind, event, item_id, old_id)])
+
+    def _compact(self):
+        with open(self.path, 'rb') as f:
+            f.seek(-(self.MAX_BYTES // 2), os.SEEK_END)
+            f.readline()  # 行の途中から始まらないよう読み捨てる
+            tail = f.read()
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(tail)
+        os.replace(tmp_path, self.path)
+
+    def _open(self):
+        """ジャーナルを開く（無ければ空で作る。inode をカーソルの基準にするため）"""
+        try:
+            return open(self.path, 'rb')
+        except FileNotFoundError:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            os.close(os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644))
+            return open(self.path, 'rb')
+
+    def read(self, cursor=None, limit=1000):
+        """cursor 以降のイベントを最大 limit 件返す: (events, next_cursor, has_more, reset)。
+        cursor が無い・ジャーナルが作り直された場合は events を空にして reset=True と
+        現在の末尾カーソルを返す（呼び出し側は全件取得し直してからそのカーソルを使う）。
+        不正な形式の cursor は ValueError。"""
+        with self._open() as f:
+            st = os.fstat(f.fileno())
+            if cursor is None:
+                return [], f"{st.st_ino}-{st.st_size}", False, True
+            ino, _, offset = cursor.partition('-')
+            ino, offset = int(ino), int(offset)
+            if offset < 0:
+                raise ValueError(cursor)
+            if ino != st.st_ino or offset > st.st_size:
+                return [], f"{st.st_ino}-{st.st_size}", False, True
+
+            f.seek(offset)
+            events = []
+            while len(events) < limit:
+                line = f.readline()
+                if not line.endswith(b'\n'):
+                    break  # 書き込み途中の行は次回に回す
+                offset += len(line)
+                try:
+                    events.append(json.loads(line))
+                except ValueError:
+                    continue
+            has_more = f.readline().endswith(b'\n')
+        return events, f"{st.st_ino}-{offset}", has_more, False
 
-    print("Generating new cache")
-    topic_files = {}
-    post_dir = './post'
-    post_files = [
-        f for f in os.listdir(post_dir)
-        if os.path.isfile(os.path.join(post_dir, f)) and not f.endswith('.gitkeep')
-    ]
+def _post_journal_version(filename):
+    """変更ジャーナルの重複判定に使う投稿ファイルの版（無ければ None）"""
+    try:
+        st = os.stat(os.path.join('./post', filename))
+    except OSError:
+        return None
+    return f"{st.st_mtime_ns}:{st.st_size}"
+
+change_journal = ChangeJournal()
+change_journal.versioners = {'post': _post_journal_version, 'paper': _paper_journal_version}
+
+# 書き込みルートを通らない変化（直接編集・他プロセスの書き込み）もスイープで見つけて記録する。
+# 書き込みルートや他のワーカーが記録済みの版は only_changed で落とす
+post_metadata_index.on_sweep = lambda events: change_journal.append(
+    [('post', event, name, None) for name, event in events.items()], only_changed=True)
+
+def _on_post_changed(filename, event='updated', old_filename=None):
+    """投稿ファイルを作成・更新・削除・リネームした直後に呼ぶ共通フック。
+    キャッシュを捨てて全件再構築させる代わりに、該当ファイルのエントリだけを更新する。
+    event は書き込んだ側が知っている変化の種類（'created' / 'updated' / 'deleted'）で、
+    そのままジャーナルに記録する。リネーム時は old_filename に旧ファイル名を渡す。"""
+    renamed = bool(old_filename) and old_filename != filename
+    if renamed:
+        post_metadata_index.update(old_filename)
+        _index_post_for_search(old_filename)
+        post_fragment_cache.discard(os.path.join('./post', old_filename))
+    post_metadata_index.update(filename)
+    _index_post_for_search(filename)
+    if not os.path.exists(os.path.join('./post', filename)):
+        post_fragment_cache.discard(os.path.join('./post', filename))
+    if renamed:
+        change_journal.record('post', 'renamed', filename, old_filename)
+    else:
+        change_journal.record('post', event, filename)
+
+def _on_posts_changed(events):
+    """複数の投稿ファイルをまとめて書き換えた後に呼ぶ（一括 API 用）。events は filename → 変化の種類。
+    メタデータは1回の差分反映、検索インデックスは1トランザクションで更新する。"""
+    filenames = list(events)
+    post_metadata_index.update_many(filenames)
+    change_journal.append([('post', events[name], name, None) for name in filenames])
+    docs = []
+    for filename in filenames:
+        path = os.path.join('./post', filename)
+        entry = post_metadata_index.get(filename)
+        if entry is None:
+            post_fragment_cache.discard(path)
+            if post_search_index.available:
+                post_search_index.delete(filename)
+            continue
+        if not post_search_index.available:
+            continue
+        try:
+            docs.append((filename, _post_search_version(entry), _read_post_for_search(filename)))
+        except Exception as e:
+            print(f"Error reading file for search index {filename}: {e}")
+    if docs:
+        post_search_index.upsert_many(docs)
 
-    for filename in post_files:
-        file_path = os.path.join(post_dir, filename)
-        
-        if search_query:
-            try:
-                with open(file_path, 'r', encoding='utf-8', errors='ignore') as file:
-                    content = file.read().lower()
-                first_line = content.split('\n')[0].strip()
-                second_line = content.split('\n')[1].strip() if len(content.split('\n')) > 1 else ""
-            except Exception as e:
-                print(f"Error reading file for search {file_path}: {e}")
-                continue
-        else:
-            metadata = get_file_metadata(file_path)
-            first_line = metadata['title']
-            second_line = metadata['tags']
-            content = ""
+# 投稿本文の全文検索インデックス（title = 1行目 / body = 2行目以降）
+post_search_index = TextSearchIndex('./post/.cache/search.db', ('title', 'body'))
+_post_search_state = {'generation': None}
+_post_search_lock = threading.Lock()
 
-        # トピックを抽出
-        topic_match = re.match(r'\[(.*?)\]', filename)
-        topic = topic_match.group(1) if topic_match else '_トピック未設定'
+def _post_search_version(entry):
+    return f"{entry['timestamp']!r}:{entry['size']}"
 
-        if topic not in topic_files:
-            topic_files[topic] = []
+def _read_post_for_search(filename):
+    with open(os.path.join('./post', filename), 'r', encoding='utf-8', errors='ignore') as f:
+        content = f.read()
+    title, _, body = content.partition('\n')
+    return {'title': title, 'body': body}
 
-        file_info = {
-            'filename': filename,
-            'title': first_line,
-            'tags': second_line,
-            'timestamp': os.path.getmtime(file_path)
-        }
+def _index_post_for_search(filename):
+    """1ファイル分だけ検索インデックスを更新（存在しなければ削除）"""
+    if not post_search_index.available:
+        return
+    entry = post_metadata_index.get(filename)
+    if entry is None:
+        post_search_index.delete(filename)
+        return
+    try:
+        values = _read_post_for_search(filename)
+    except Exception as e:
+        print(f"Error reading file for search index {filename}: {e}")
+        return
+    post_search_index.upsert(filename, _post_search_version(entry), values)
 
-        if search_query:
-            file_info['content'] = content
+def _sync_post_search_index():
+    """メタデータインデックスと版（mtime / size）を突き合わせ、変化した投稿だけを
+    検索インデックスへ反映する。インデックスが使えない場合は False を返す。"""
+    if not post_search_index.available:
+        return False
+    with _post_search_lock:
+        generation, changed = post_metadata_index.changes_since(_post_search_state['generation'])
+        if changed is None:
+            indexed = post_search_index.versions()
+            entries = post_metadata_index.entries()
+        elif changed:
+            # 前回の同期以降に変化した投稿だけを突き合わせる
+            indexed = post_search_index.versions(changed)
+            entries = [e for e in map(post_metadata_index.get, changed) if e is not None]
+        else:
+            return post_search_index.available
+        stale = []
+        for entry in entries:
+            version = _post_search_version(entry)
+            if indexed.pop(entry['filename'], None) != version:
+                stale.append((entry['filename'], version))
+
+        def load(items):
+            for filename, version in items:
+                try:
+                    yield filename, version, _read_post_for_search(filename)
+                except Exception as e:
+                    print(f"Error reading file for search index {filename}: {e}")
+
+        post_search_index.upsert_many(load(stale))
+        for filename in indexed:
+            post_search_index.delete(filename)
+        _post_search_state['generation'] = generation
+    return post_search_index.available
+
+def _post_search_filter(search_terms):
+    """いずれかの検索語（小文字）を含む投稿かを判定する関数を返す。
+    検索インデックスを優先し、使えない場合は本文の線形走査にフォールバックする。"""
+    if _sync_post_search_index():
+        return post_search_index.match_any(search_terms).__contains__
+    return lambda filename: _post_matches_any_term(filename, search_terms)
+
+def _is_api_post_filename(filename):
+    """API 系一覧の対象（.txt かつ . / bk / tmp 始まりでない）かを判定"""
+    return (filename.endswith('.txt')
+            and not (filename.startswith('.') or filename.startswith('bk') or filename.startswith('tmp')))
+
+def _api_post_title(entry):
+    """API 応答用タイトル（見出し記号を除去、見出しでなければ先頭100文字、空ならファイル名）"""
+    first_line = entry['title']
+    if first_line.startswith('#'):
+        return first_line.lstrip('#').strip()
+    if first_line:
+        return first_line[:100]
+    return entry['filename']
+
+def _post_matches_any_term(filename, search_terms):
+    """本文を読み込み、いずれかの検索語（小文字）を含むかを返す"""
+    file_path = os.path.join('./post', filename)
+    try:
+        with open(file_path, 'r', encoding='utf-8', errors='ignore') as file:
+            content = file.read().lower()
+    except Exception as e:
+        print(f"Error reading file for search {file_path}: {e}")
+        return False
+    return any(term in content for term in search_terms)
 
-        topic_files[topic].append(file_info)
+def get_sorted_post_files_info():
+    """投稿ファイルの情報をトピック別に取得（共有インデックスから構築し、返却時に認証でフィルタ）"""
+    search_query = request.args.get('search')
+    search_terms = search_query.lower().split() if search_query else []
+    authenticated = current_user.is_authenticated
 
-    post_files_info = {topic: files for topic, files in topic_files.items() if files}
+    matches = _post_search_filter(search_terms) if search_terms else None
 
-    if search_query:
-        search_terms = search_query.lower().split()
-        filtered_info = {}
-        for topic, files in post_files_info.items():
-            filtered_files = [file for file in files if any(term in file.get('content', '') for term in search_terms)]
-            if filtered_files:
-                filtered_info[topic] = filtered_files
-        post_files_info = filtered_info
-
-    for topic in post_files_info:
-        post_files_info[topic].sort(key=lambda x: x['filename'])
-    all_sorted = dict(sorted(post_files_info.items()))
-
-    if not search_query:
-        try:
-            cache_dir = os.path.dirname(CACHE_FILE)
-            os.makedirs(cache_dir, exist_ok=True)
-            with open(CACHE_FILE, 'w', encoding='utf-8') as f:
-                json.dump(all_sorted, f, ensure_ascii=False, indent=2)
-            current_files = [
-                f for f in os.listdir('./post')
-                if os.path.isfile(os.path.join('./post', f)) and not f.endswith('.gitkeep')
-            ]
-            with open(FILELIST_CACHE, 'w', encoding='utf-8') as f:
-                json.dump(current_files, f, ensure_ascii=False, indent=2)
-        except Exception as e:
-            print(f"Error writing cache: {e}")
+    topic_files = {}
+    for entry in post_metadata_index.entries():
+        if not authenticated and entry['hidden']:
+            continue
+        if matches and not matches(entry['filename']):
+            continue
 
-    if not authenticated:
-        filtered = {}
-        for topic, files in all_sorted.items():
-            visible = [it for it in files if not it.get('title', '').startswith('#')]
-            if visible:
-                filtered[topic] = visible
-        return filtered
-    return all_sorted
+        topic = entry['category'] if entry['category'] is not None else '_トピック未設定'
+        topic_files.setdefault(topic, []).append({
+            'filename': entry['filename'],
+            'title': entry['title'],
+            'tags': entry['tags'],
+            'timestamp': entry['timestamp']
+        })
+
+    for topic in topic_files:
+        topic_files[topic].sort(key=lambda x: x['filename'])
+    return dict(sorted(topic_files.items()))
 
 def is_valid_filename(filename):
     # ファイル名がディレクトリトラバーサルを含まないかチェック
@@ -1251,6 +2223,285 @@ def find_section_by_h1_title(sections, target_title):
                 return i, sec
     return None, None
 
+def _section_list_title(first_line):
+    """セクション一覧・検索 API 用のタイトル（H1 なら # を除去、それ以外は1行目そのまま）"""
+    return first_line.lstrip('# ').strip() if first_line.startswith('# ') else first_line.strip()
+
+class PostSectionIndex:
+    """投稿ファイルのセクション境界インデックス。
+
+    1行目（タイトル）/ 2行目（タグ）と、本文の各セクション（split_markdown_by_sections と
+    同じ分割）のバイト範囲・1行目を保持する。path ごとに (mtime_ns, size) が一致する間は
+    プロセス内 LRU（MAX_FILES 件）から返すので、見出し一覧は本文を読まずに、
+    セクション本文は要求された範囲だけを seek して読み込める。
+    改行は text モードと同じく \r\n を \n に正規化する。単独の \r を含むファイルは
+    バイト範囲が text モードの改行変換と一致しないため、セクション本文ごと保持する。"""
+
+    MAX_FILES = 256
+
+    def __init__(self):
+        self._cache = {}  # path → エントリ（挿入順 = LRU 順）
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _build(data, st):
+        entry = {'mtime_ns': st.st_mtime_ns, 'size': st.st_size, 'texts': None}
+        if data.count(b'\r') != data.count(b'\r\n'):
+            text = data.decode('utf-8', errors='ignore').replace('\r\n', '\n').replace('\r', '\n')
+            lines = text.split('\n', 2)
+            entry['title'] = lines[0]
+            entry['tags'] = lines[1] if len(lines) > 1 else ''
+            entry['texts'] = split_markdown_by_sections(lines[2] if len(lines) > 2 else '')
+            entry['first_lines'] = [sec.split('\n', 1)[0] for sec in entry['texts']]
+            return entry
+
+        def line_text(start, end):
+            return data[start:end].rstrip(b'\r').decode('utf-8', errors='ignore')
+
+        first_nl = data.find(b'\n')
+        second_nl = data.find(b'\n', first_nl + 1) if first_nl != -1 else -1
+        entry['title'] = line_text(0, first_nl if first_nl != -1 else len(data))
+        entry['tags'] = line_text(first_nl + 1, second_nl if second_nl != -1 else len(data)) if first_nl != -1 else ''
+        body_start = second_nl + 1 if second_nl != -1 else len(data)
+
+        # split_markdown_by_sections と同じ規則でセクション開始行を決める
+        offsets = []
+        first_lines = []
+        in_code_fence = False
+        sec_start = pos = body_start
+        prev_end = body_start
+        while True:
+            nl = data.find(b'\n', pos)
+            line_end = nl if nl != -1 else len(data)
+            content_end = line_end - 1 if line_end > pos and data[line_end - 1:line_end] == b'\r' else line_end
+            raw = data[pos:content_end]
+            if b'```' in raw or b'~~~' in raw:
+                stripped = raw.decode('utf-8', errors='ignore').strip()
+                if stripped.startswith('```') or stripped.startswith('~~~'):
+                    in_code_fence = not in_code_fence
+            if not in_code_fence and raw.startswith(b'# ') and pos != body_start:
+                offsets.append((sec_start, prev_end))
+                sec_start = pos
+            if pos == sec_start:
+                first_lines.append(raw.decode('utf-8', errors='ignore'))
+            prev_end = content_end
+            if nl == -1:
+                break
+            pos = nl + 1
+        offsets.append((sec_start, len(data)))
+        entry['offsets'] = offsets
+        entry['first_lines'] = first_lines
+        return entry
+
+    def _entry(self, path, f=None):
+        """有効なエントリを返す（無い・古い場合は f またはファイルから作り直す）"""
+        st = os.fstat(f.fileno()) if f else os.stat(path)
+        with self._lock:
+            entry = self._cache.pop(path, None)
+            if entry and entry['mtime_ns'] == st.st_mtime_ns and entry['size'] == st.st_size:
+                self._cache[path] = entry
+                return entry
+        if f:
+            f.seek(0)
+            entry = self._build(f.read(), st)
+        else:
+            with open(path, 'rb') as rf:
+                return self._entry(path, rf)
+        with self._lock:
+            self._cache[path] = entry
+            while len(self._cache) > self.MAX_FILES:
+                self._cache.pop(next(iter(self._cache)))
+        return entry
+
+    def info(self, path):
+        """title / tags / first_lines（各セクションの1行目）を持つエントリを返す"""
+        return self._entry(path)
+
+    def read(self, path, start=0, stop=None, errors='ignore'):
+        """セクション start〜stop-1 の本文リストを返す（該当範囲のバイトだけを読む）"""
+        with open(path, 'rb') as f:
+            entry = self._entry(path, f)
+            if entry['texts'] is not None:
+                return entry['texts'][start:stop]
+            spans = entry['offsets'][start:stop]
+            if not spans:
+                return []
+            base = spans[0][0]
+            f.seek(base)
+            chunk = f.read(spans[-1][1] - base)
+        return [chunk[s - base:e - base].decode('utf-8', errors=errors).replace('\r\n', '\n') for s, e in spans]
+
+    @staticmethod
+    def find_h1(entry, target_title):
+        """find_section_by_h1_title と同じ判定で、H1 見出しが一致するセクション番号を返す"""
+        target = (target_title or '').strip()
+        if not target:
+            return None
+        for i, first_line in enumerate(entry['first_lines']):
+            first_line = first_line.strip()
+            if first_line.startswith('# ') and first_line[2:].strip() == target:
+                return i
+        return None
+
+post_section_index = PostSectionIndex()
+
+def _bare_url_extension():
+    """本文中の裸の URL をリンクにする Markdown 拡張（閲覧画面の marked の GFM autolink 相当）。
+    markdown ライブラリは任意依存のため、利用時に組み立てる"""
+    import xml.etree.ElementTree as etree
+    from markdown.extensions import Extension
+    from markdown.inlinepatterns import InlineProcessor
+    from markdown.util import AtomicString
+
+    class BareUrlProcessor(InlineProcessor):
+        def handleMatch(self, m, data):
+            el = etree.Element('a')
+            el.set('href', m.group(0))
+            el.text = AtomicString(m.group(0))
+            return el, m.start(0), m.end(0)
+
+    class BareUrlExtension(Extension):
+        def extendMarkdown(self, md):
+            # [text](url)・<url>・属性値の中の URL は対象外。インラインコード（190）より後、リンク（160）より前
+            md.inlinePatterns.register(
+                BareUrlProcessor(r'(?<![\(\[<"\'=])https?://[^\s<>"\'\)\]]+', md), 'bare_url', 175)
+
+    return BareUrlExtension()
+
+class PostFragmentCache:
+    """投稿セクションの HTML 断片キャッシュ（サーバーサイドレンダリング用）。
+
+    PostSectionIndex のセクション（split_markdown_by_sections と同じ単位）ごとに Markdown を
+    HTML に変換し、投稿の版（mtime_ns / size）と変換設定（profile）ごとに cache_dir に保存する。
+    変換は要求されたセクションについて版ごとに1回だけ行う。markdown ライブラリが無い環境では
+    available が False になり、呼び出し側は従来どおりクライアント側でレンダリングする。"""
+
+    RENDER_VERSION = 3  # 変換規則を変えたら上げる（保存済みの断片を作り直させる）
+    PROFILES = {
+        # 閲覧画面: post.html の marked + カスタム renderer と同等の HTML に後処理する
+        'view': ('tables', 'fenced_code', 'sane_lists'),
+        # PDF: _render_post_pdf_bytes の従来の変換と同じ
+        'pdf': ('tables', 'fenced_code', 'nl2br', 'sane_lists'),
+    }
+    CODE_BLOCK = re.compile(r'<pre><code(?: class="language-([^"]+)")?>(.*?)</code></pre>', re.S)
+    TABLE = re.compile(r'<table>.*?</table>', re.S)
+
+    def __init__(self, section_index, cache_dir='./post/.cache/html'):
+        self.section_index = section_index
+        self.cache_dir = cache_dir
+        self._md = None  # markdown モジュール（None=未確認, False=利用不可）
+        self._lock = threading.Lock()
+
+    @property
+    def available(self):
+        if self._md is None:
+            try:
+                import markdown
+                self._md = markdown
+            except ImportError:
+                self._md = False
+        return bool(self._md)
+
+    def _cache_path(self, path, profile):
+        key = hashlib.sha1(os.path.abspath(path).encode('utf-8')).hexdigest()
+        return os.path.join(self.cache_dir, f"{key}.{profile}.json")
+
+    def _render(self, text, profile, section_no):
+        extensions = list(self.PROFILES[profile])
+        if profile == 'view':
+            extensions.append(_bare_url_extension())
+        rendered = self._md.markdown(text, extensions=extensions)
+        if profile != 'view':
+            # PDF は従来の変換結果のまま（生の HTML も印刷する）
+            return rendered
+        # Markdown は生の HTML を通すため、ページに埋め込む閲覧用は後処理で加えるボタン等より前に
+        # 許可リストで無害化する（post.html の applySecurityFilter より厳しい。README の ssr_sections 参照）
+        rendered = sanitize_html(rendered)
+
+        code_ids = []
+
+        def code_block(m):
+            lang, code = m.group(1), m.group(2).strip()
+            if lang is None:
+                return f'<pre>{code}</pre>'
+            if lang == 'mermaid':
+                return f'<div class="mermaid">{code}</div>'
+            code_id = f'code-s{section_no}-{len(code_ids)}'
+            code_ids.append(code_id)
+            return (
+                '<div>'
+                f'<button class="btn btn-dark btn-sm" onclick="toggleCode(this, \'{code_id}\')">&lt;CodeSection/&gt;...</button>'
+                f'<button class="btn btn-dark btn-sm" onclick="copyCode(this, \'{code_id}\')"><i class="fa fa-copy"></i></button>'
+                f'<pre id="{code_id}" style="display:none;"><code>{code}</code></pre>'
+                '</div>'
+            )
+
+        rendered = self.CODE_BLOCK.sub(code_block, rendered)
+        rendered = rendered.replace('<img ', '<img loading="lazy" ')
+        rendered = self.TABLE.sub(
+            lambda m: '<div class="table-responsive"><button type="button" class="table-copy-btn" '
+                      'title="Markdownでコピー"><i class="fas fa-copy"></i></button>' + m.group(0) + '</div>',
+            rendered)
+        return rendered
+
+    def _load(self, cache_path, version):
+        try:
+            with open(cache_path, 'r', encoding='utf-8') as f:
+                cached = json.load(f)
+            if cached.get('version') == version:
+                return cached
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            print(f"Error reading html fragment cache: {e}")
+        return {'version': version, 'sections': {}}
+
+    def _save(self, cache_path, cached):
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(cached, f, ensure_ascii=False)
+            os.replace(tmp_path, cache_path)
+        except Exception as e:
+            print(f"Error writing html fragment cache: {e}")
+
+    def fragments(self, path, start=0, stop=None, profile='view'):
+        """セクション start〜stop-1 の HTML 断片のリスト（未変換のセクションだけ変換して保存する）"""
+        if not self.available:
+            raise RuntimeError('markdown library is not installed')
+        entry = self.section_index.info(path)
+        version = f"{entry['mtime_ns']}:{entry['size']}:{self.RENDER_VERSION}"
+        indexes = range(len(entry['first_lines']))[start:stop]
+        cache_path = self._cache_path(path, profile)
+        with self._lock:
+            cached = self._load(cache_path, version)
+            sections = cached['sections']
+            missing = [i for i in indexes if str(i) not in sections]
+            if missing:
+                texts = self.section_index.read(path, missing[0], missing[-1] + 1)
+                for i, text in zip(range(missing[0], missing[-1] + 1), texts):
+                    sections.setdefault(str(i), self._render(text, profile, i))
+                # 読み込み中に更新された場合は保存しない（次回、新しい版で作り直す）
+                current = self.section_index.info(path)
+                if (current['mtime_ns'], current['size']) == (entry['mtime_ns'], entry['size']):
+                    self._save(cache_path, cached)
+            return [sections[str(i)] for i in indexes if str(i) in sections]
+
+    def discard(self, path):
+        """削除・リネームされた投稿の断片を消す"""
+        for profile in self.PROFILES:
+            try:
+                os.remove(self._cache_path(path, profile))
+            except OSError:
+                pass
+
+post_fragment_cache = PostFragmentCache(post_section_index)
+
+def _ssr_enabled():
+    """閲覧画面をサーバー側でレンダリングするか（config の ssr_sections と markdown ライブラリの有無）"""
+    return bool(config.get('ssr_sections')) and post_fragment_cache.available
+
 ATTACH_REF_PATTERN = re.compile(r'/attach/((?:s_)?[a-f0-9]{64}\.[A-Za-z0-9]+)')
 
 # サムネ画像 + フル画像へのリンクの2階層 Markdown 記法
@@ -1289,6 +2540,19 @@ def _sanitize_section_for_filename(section_title):
     cleaned = cleaned[:80].rstrip(' .')  # Windows末尾「.」「 」は不可
     return cleaned or 'section'
 
+def _guard_post_access(filename):
+    """ファイル名/存在/認可ガード（非公開投稿は未認証なら 404）。返り値: (path, PostSectionIndex のエントリ)"""
+    if not is_valid_filename(filename):
+        abort(400)
+    path = os.path.join('./post', filename)
+    if not os.path.exists(path):
+        abort(404)
+
+    entry = post_section_index.info(path)
+    if entry['title'].strip().startswith('##') and not current_user.is_authenticated:
+        abort(404)
+    return path, entry
+
 def _resolve_post_and_section(filename):
     """download_post_zip / download_post_pdf 共通の前処理:
     1. ファイル名/存在/認可ガード
@@ -1296,48 +2560,149 @@ def _resolve_post_and_section(filename):
     返り値: (full_text_or_section_text, display_title, section_or_None)
             text は ZIP/PDF 化対象の Markdown 本文（title/tags 行を含む）
             section_or_None は ?section が解決できたときのセクションタイトル文字列"""
-    if not is_valid_filename(filename):
-        abort(400)
-    path = os.path.join('./post', filename)
-    if not os.path.exists(path):
-        abort(404)
+    path, entry = _guard_post_access(filename)
 
-    with open(path, 'r', encoding='utf-8', errors='ignore') as f:
-        full_text = f.read()
+    requested_section = request.args.get('section', '').strip()
+    index = post_section_index.find_h1(entry, requested_section) if requested_section else None
+    if index is None:
+        # 未指定・セクションが見つからない場合は全体（既存ルールと整合）
+        with open(path, 'r', encoding='utf-8', errors='ignore') as f:
+            return f.read(), None
 
-    first_line = full_text.split('\n', 1)[0].strip() if full_text else ''
-    if first_line.startswith('##') and not current_user.is_authenticated:
-        abort(404)
+    sec = post_section_index.read(path, index, index + 1)[0]
+    scoped_text = f"{entry['title']}\n{entry['tags']}\n{sec}"
+    return scoped_text, requested_section
 
-    requested_section = request.args.get('section', '').strip()
-    if not requested_section:
-        return full_text, None
+# ZIP ストリーミング
+# 画像・動画・PDF などは既に圧縮済みで deflate しても縮まないため無圧縮（ZIP_STORED）で格納し、
+# Markdown などのテキストだけを deflate する
+ZIP_STORED_EXTENSIONS = {
+    '.jpg', '.jpeg', '.png', '.gif', '.webp', '.heic', '.heif', '.avif',
+    '.mp4', '.mov', '.webm', '.mp3', '.m4a', '.aac', '.ogg',
+    '.pdf', '.zip', '.gz', '.tgz', '.bz2', '.xz', '.7z', '.docx', '.xlsx', '.pptx',
+}
+ZIP_STREAM_CHUNK = 64 * 1024
 
-    # 1〜2行目（title / tags）+ 本文 に分解
-    lines = full_text.split('\n', 2)
-    title_line = lines[0] if len(lines) > 0 else ''
-    tags_line = lines[1] if len(lines) > 1 else ''
-    body_md = lines[2] if len(lines) > 2 else ''
+class _ZipStreamBuffer:
+    """zipfile の書き込み先。seek できない出力として扱われる（データディスクリプタ方式）ので、
+    書かれたバイト列を溜めておき、drain() でストリーミング応答側へ渡す。"""
 
-    sections = split_markdown_by_sections(body_md)
-    _, sec = find_section_by_h1_title(sections, requested_section)
-    if sec is None:
-        # セクションが見つからない場合は全体にフォールバック（既存ルールと整合）
-        return full_text, None
+    def __init__(self):
+        self._chunks = []
 
-    scoped_text = f"{title_line}\n{tags_line}\n{sec}"
-    return scoped_text, requested_section
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
 
-def _download_post_zip_impl(filename):
-    """ZIP 生成のコア処理。レート制限デコレータは呼び出し側で付与する。
-    ZIP 内 Markdown は VSCode / Obsidian 等のオフラインビューワで
-    そのまま画像表示できるよう以下の変換を行う:
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+def _zip_compress_type(name):
+    return zipfile.ZIP_STORED if os.path.splitext(name)[1].lower() in ZIP_STORED_EXTENSIONS else zipfile.ZIP_DEFLATED
+
+def _iter_zip_stream(members):
+    """(arcname, source) の列から ZIP を組み立てながら bytes を逐次返すジェネレータ。
+    source は bytes（メモ本文など）またはファイルパス。ファイルは ZIP_STREAM_CHUNK ずつ
+    読んで書き出すため、アーカイブ全体をメモリに持たない。読めないファイルはスキップする。"""
+    out = _ZipStreamBuffer()
+    with zipfile.ZipFile(out, 'w', compression=zipfile.ZIP_DEFLATED) as zf:
+        for arcname, source in members:
+            if isinstance(source, bytes):
+                zinfo = zipfile.ZipInfo(arcname, date_time=time.localtime()[:6])
+                zinfo.compress_type = _zip_compress_type(arcname)
+                zf.writestr(zinfo, source)
+            else:
+                try:
+                    src = open(source, 'rb')
+                except OSError as e:
+                    app.logger.warning(f"zip stream: cannot read {source}: {e}")
+                    continue
+                with src:
+                    zinfo = zipfile.ZipInfo.from_file(source, arcname)
+                    zinfo.compress_type = _zip_compress_type(arcname)
+                    with zf.open(zinfo, 'w') as dest:
+                        while True:
+                            chunk = src.read(ZIP_STREAM_CHUNK)
+                            if not chunk:
+                                break
+                            dest.write(chunk)
+                            data = out.drain()
+                            if data:
+                                yield data
+            data = out.drain()
+            if data:
+                yield data
+    yield out.drain()  # セントラルディレクトリ
+
+def _iter_tar_stream(members, compress=False):
+    """_iter_zip_stream の tar 版（compress=True なら tar.gz）。
+    ヘッダ・本体・パディングを自前で並べ、ファイルは ZIP_STREAM_CHUNK ずつ送る。"""
+    gz = zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None
+
+    def out(data):
+        return gz.compress(data) if gz else data
+
+    for arcname, source in members:
+        info = tarfile.TarInfo(arcname)
+        info.mode = 0o644
+        if isinstance(source, bytes):
+            info.size = len(source)
+            info.mtime = time.time()
+            data = out(info.tobuf(tarfile.PAX_FORMAT, 'utf-8', 'surrogateescape') + source
+                       + b'\0' * (-info.size % tarfile.BLOCKSIZE))
+            if data:
+                yield data
+            continue
+        try:
+            src = open(source, 'rb')
+        except OSError as e:
+            app.logger.warning(f"tar stream: cannot read {source}: {e}")
+            continue
+        with src:
+            st = os.fstat(src.fileno())
+            info.size = st.st_size
+            info.mtime = st.st_mtime
+            data = out(info.tobuf(tarfile.PAX_FORMAT, 'utf-8', 'surrogateescape'))
+            remaining = info.size
+            while remaining > 0:
+                chunk = src.read(min(ZIP_STREAM_CHUNK, remaining))
+                if not chunk:
+                    chunk = b'\0' * remaining  # 読み込み中に縮んだ場合もヘッダのサイズに合わせる
+                remaining -= len(chunk)
+                data += out(chunk)
+                if data:
+                    yield data
+                data = b''
+            data += out(b'\0' * (-info.size % tarfile.BLOCKSIZE))
+            if data:
+                yield data
+    data = out(b'\0' * (tarfile.BLOCKSIZE * 2))
+    yield data + gz.flush() if gz else data
+
+def _attachment_disposition(download_name):
+    """send_file(as_attachment=True, download_name=...) と同等の Content-Disposition 値（日本語名は RFC 5987）"""
+    import unicodedata
+    from urllib.parse import quote
+    simple = unicodedata.normalize('NFKD', download_name).encode('ascii', 'ignore').decode('ascii')
+    simple = simple.replace('\\', '').replace('"', '')
+    if simple == download_name:
+        return f'attachment; filename="{simple}"'
+    return f"attachment; filename=\"{simple}\"; filename*=UTF-8''{quote(download_name, safe='')}"
+
+def _zip_stream_response(members, download_name):
+    return Response(stream_with_context(_iter_zip_stream(members)), mimetype='application/zip',
+                    headers={'Content-Disposition': _attachment_disposition(download_name)})
+
+def _rewrite_for_offline(text):
+    """ZIP / エクスポート用に Markdown を書き換え、参照している添付ファイル名を順序保持で返す:
       - /attach/xxx → xxx（同ディレクトリのフラット相対パスに）
       - [![alt](thumb)](full) → ![alt](full)（リンク内画像を解除）
-    変換後 Markdown が参照しなくなったサムネファイル s_xxx は ZIP に
-    含めない（容量削減）。"""
-    text, section = _resolve_post_and_section(filename)
-
+    返り値: (rewritten, referenced)"""
     # 1) /attach/ プレフィックス除去
     rewritten = ATTACH_REF_PATTERN.sub(lambda m: m.group(1), text)
     # 2) サムネ→フル画像のリンク記法を素のサムネなし image 参照に簡略化
@@ -1352,6 +2717,18 @@ def _download_post_zip_impl(filename):
         if name not in seen:
             seen.add(name)
             referenced.append(name)
+    return rewritten, referenced
+
+def _download_post_zip_impl(filename):
+    """ZIP 生成のコア処理。レート制限デコレータは呼び出し側で付与する。
+    ZIP 内 Markdown は VSCode / Obsidian 等のオフラインビューワで
+    そのまま画像表示できるよう以下の変換を行う:
+      - /attach/xxx → xxx（同ディレクトリのフラット相対パスに）
+      - [![alt](thumb)](full) → ![alt](full)（リンク内画像を解除）
+    変換後 Markdown が参照しなくなったサムネファイル s_xxx は ZIP に
+    含めない（容量削減）。ZIP はメモリに溜めずに生成しながら送る。"""
+    text, section = _resolve_post_and_section(filename)
+    rewritten, referenced = _rewrite_for_offline(text)
 
     # ファイル名（ZIP内 .txt + ZIP自体）
     base = filename[:-4] if filename.lower().endswith('.txt') else filename
@@ -1360,20 +2737,14 @@ def _download_post_zip_impl(filename):
     inner_filename = base + '.txt'
     zip_name = base + '.zip'
 
-    from io import BytesIO
-    buf = BytesIO()
-    with zipfile.ZipFile(buf, 'w', compression=zipfile.ZIP_DEFLATED) as zf:
-        zf.writestr(inner_filename, rewritten)
-        for name in referenced:
-            src = os.path.join(UPLOAD_FOLDER, name)
-            if os.path.isfile(src):
-                zf.write(src, arcname=name)
-            else:
-                app.logger.warning(f"download_post_zip: missing attach {name} for {filename}")
-    buf.seek(0)
+    members = [(inner_filename, rewritten.encode('utf-8'))]
+    for name in referenced:
+        if attachment_catalog.get(name) is not None:
+            members.append((name, os.path.join(UPLOAD_FOLDER, name)))
+        else:
+            app.logger.warning(f"download_post_zip: missing attach {name} for {filename}")
 
-    return send_file(buf, as_attachment=True, download_name=zip_name,
-                     mimetype='application/zip')
+    return _zip_stream_response(members, zip_name)
 
 @app.route('/post/<filename>/download')
 @limiter.limit("10 per minute")
@@ -1577,30 +2948,318 @@ def _find_chromium_executable():
             return p
     return None
 
-def _render_post_pdf_bytes(text, base_url, include_title=True,
-                           imgsize=None, codes=None, theme=None):
-    """Markdown 本文（title/tags 行を含む raw text）を A4 PDF にレンダリング。
-    base_url は <base href> として埋め込み、/attach/xxx 等の相対パスを
-    実画像 URL に解決させる（Playwright が同一サーバから取得する）。
-    include_title=False の場合、1行目のタイトル行と 2行目のタグ行を出力しない
-    （セクション単独 PDF 化用）。
-
+def _chromium_launch_kwargs():
+    launch_kwargs = {'args': ['--no-sandbox']}
+    exec_path = _find_chromium_executable()
+    if exec_path:
+        launch_kwargs['executable_path'] = exec_path
+    return launch_kwargs
+
+def _pdf_local_asset(url_path):
+    """PDF 印刷中のブラウザが自サーバに要求したパスを、ディスク上のファイルに解決する。
+    /attach/<ハッシュ名> は UPLOAD_FOLDER 内、/static/... は ./static 内のファイルのみ。
+    それ以外・存在しないファイルは None"""
+    m = ATTACH_REF_PATTERN.fullmatch(url_path)
+    if m:
+        path = os.path.join(UPLOAD_FOLDER, m.group(1))
+        return path if os.path.isfile(path) else None
+    if url_path.startswith('/static/'):
+        root = os.path.realpath('./static')
+        path = os.path.realpath(os.path.join(root, url_path[len('/static/'):]))
+        if path.startswith(root + os.sep) and os.path.isfile(path):
+            return path
+    return None
+
+class PdfRenderBusy(RuntimeError):
+    """PDF レンダリングの待ち行列が満杯"""
+
+class PdfRenderPool:
+    """PDF 出力用の常駐 headless Chromium プール。
+
+    Playwright の sync API はオブジェクトを作ったスレッドからしか使えないため、
+    size 本のワーカースレッドがそれぞれ1つのブラウザを起動したまま持ち、キューに積まれた
+    レンダリング要求を処理する（最大 size 件を並行処理）。ページは max_renders_per_page 回
+    使うか失敗したら作り直し、使う前に応答を確認する。ブラウザが落ちていれば起動し直す。
+    待ち行列が queue_depth 件を超える要求は PdfRenderBusy で断る。"""
+
+    LATENCY_SAMPLES = 200
+
+    def __init__(self, size=2, max_renders_per_page=50, queue_depth=16, timeout=120):
+        self.size = max(1, int(size))
+        self.max_renders_per_page = max(1, int(max_renders_per_page))
+        self.queue_depth = max(0, int(queue_depth))
+        self.timeout = timeout
+        self._queue = queue.Queue()
+        self._workers = []
+        self._lock = threading.Lock()
+        self._counts = {'renders': 0, 'failures': 0, 'rejected': 0, 'launches': 0, 'recycles': 0}
+        self._in_flight = 0
+        self._samples = collections.deque(maxlen=self.LATENCY_SAMPLES)  # (待ち時間, 描画時間) 秒
+
+    def render(self, full_html, base_url=None):
+        """HTML を A4 PDF にして bytes を返す（ワーカーの処理完了まで待つ）"""
+        future = self.submit(full_html, base_url)
+        try:
+            return future.result(timeout=self.timeout)
+        except concurrent.futures.TimeoutError:
+            future.cancel()  # まだ待ち行列にあればワーカーは処理しない
+            raise
+
+    def submit(self, full_html, base_url=None):
+        """レンダリング要求を待ち行列に積み、結果（PDF の bytes）を受け取る Future を返す。
+        base_url と同じオリジンへのリクエストはサーバを経由せずディスクから返す（_pdf_local_asset）。"""
+        future = concurrent.futures.Future()
+        with self._lock:
+            self._workers = [w for w in self._workers if w.is_alive()]
+            if self._queue.qsize() >= self.queue_depth + max(0, self.size - self._in_flight):
+                self._counts['rejected'] += 1
+                raise PdfRenderBusy('PDF render queue is full')
+            while len(self._workers) < self.size:
+                worker = threading.Thread(target=self._serve, name='pdf-render', daemon=True)
+                worker.start()
+                self._workers.append(worker)
+            self._queue.put((full_html, base_url, future, time.monotonic()))
+        return future
+
+    @staticmethod
+    def _print(page, full_html, base_url=None):
+        # 自サーバ宛て（/attach/xxx 等）の取得はリクエストワーカーを使わずディスクから返す。
+        # 少ないワーカー数のサーバで、PDF 生成中の要求が自分自身を待って詰まるのを防ぐ。
+        matcher = handler = None
+        if base_url:
+            parsed = urlparse(base_url)
+            origin = f"{parsed.scheme}://{parsed.netloc}/"
+            matcher = lambda url: url.startswith(origin)
+
+            def handler(route):
+                local_path = _pdf_local_asset(unquote(urlparse(route.request.url).path))
+                if local_path:
+                    route.fulfill(path=local_path)
+                else:
+                    route.abort()
+            page.route(matcher, handler)
+        try:
+            # set_content + networkidle で <img> ロード完了まで待機（外部画像を含む）
+            page.set_content(full_html, wait_until='networkidle', timeout=20000)
+            return page.pdf(format='A4', print_background=True,
+                            margin={'top': '18mm', 'right': '14mm',
+                                    'bottom': '18mm', 'left': '14mm'})
+        finally:
+            if matcher is not None:
+                page.unroute(matcher, handler)
+
+    @staticmethod
+    def _close(obj):
+        try:
+            if obj is not None:
+                obj.close()
+        except Exception:
+            pass
+
+    @staticmethod
+    def _stop(playwright):
+        try:
+            if playwright is not None:
+                playwright.stop()
+        except Exception:
+            pass
+
+    def _page_is_healthy(self, page):
+        try:
+            return not page.is_closed() and page.evaluate('1 + 1') == 2
+        except Exception:
+            return False
+
+    def _serve(self):
+        playwright = browser = page = None
+        renders = 0
+        try:
+            while True:
+                full_html, base_url, future, queued_at = self._queue.get()
+                if not future.set_running_or_notify_cancel():
+                    continue  # 呼び出し側がタイムアウト済み
+                started = time.monotonic()
+                with self._lock:
+                    self._in_flight += 1
+                ok = False
+                try:
+                    if playwright is None:
+                        from playwright.sync_api import sync_playwright
+                        playwright = sync_playwright().start()
+                    if browser is None or not browser.is_connected():
+                        page = None
+                        try:
+                            browser = playwright.chromium.launch(**_chromium_launch_kwargs())
+                        except Exception:
+                            # Playwright のドライバが落ちていると起動し続けられないので、次の要求で作り直す
+                            browser = None
+                            self._stop(playwright)
+                            playwright = None
+                            raise
+                        with self._lock:
+                            self._counts['launches'] += 1
+                    if page is not None and (renders >= self.max_renders_per_page
+                                             or not self._page_is_healthy(page)):
+                        self._close(page)
+                        page = None
+                        with self._lock:
+                            self._counts['recycles'] += 1
+                    if page is None:
+                        page = browser.new_page()
+                        renders = 0
+                    result = self._print(page, full_html, base_url)
+                    renders += 1
+                    ok = True
+                except Exception as e:
+                    # 失敗したページは使い回さない
+                    self._close(page)
+                    page = None
+                    future.set_exception(e)
+                finally:
+                    finished = time.monotonic()
+                    with self._lock:
+                        self._in_flight -= 1
+                        self._counts['renders' if ok else 'failures'] += 1
+                        self._samples.append((started - queued_at, finished - started))
+                if ok:
+                    future.set_result(result)
+        finally:
+            self._close(browser)
+            self._stop(playwright)
+
+    def stats(self):
+        """プールの状態（ワーカー数・待ち行列・処理件数・待ち時間 / 描画時間の分布）"""
+        def summary(values):
+            if not values:
+                return None
+            values = sorted(values)
+            return {
+                'avg_ms': round(sum(values) / len(values) * 1000, 1),
+                'p50_ms': round(values[len(values) // 2] * 1000, 1),
+                'p95_ms': round(values[min(len(values) - 1, int(len(values) * 0.95))] * 1000, 1),
+                'max_ms': round(values[-1] * 1000, 1),
+            }
+        with self._lock:
+            samples = list(self._samples)
+            return {
+                'size': self.size,
+                'workers': sum(1 for w in self._workers if w.is_alive()),
+                'in_flight': self._in_flight,
+                'queued': self._queue.qsize(),
+                'queue_depth': self.queue_depth,
+                'max_renders_per_page': self.max_renders_per_page,
+                **self._counts,
+                'wait': summary([s[0] for s in samples]),
+                'render': summary([s[1] for s in samples]),
+            }
+
+pdf_render_pool = PdfRenderPool(**{k: v for k, v in (config.get('pdf_pool') or {}).items()
+                                   if k in ('size', 'max_renders_per_page', 'queue_depth', 'timeout')})
+
+class PostPdfCache:
+    """レンダリング済み PDF のディスクキャッシュ（post/.cache/pdf/<sha256>.pdf）。
+
+    キーは印刷する HTML 全体（本文・テーマ CSS・画像幅/コード表示などのオプションを
+    すべて含む）のハッシュなので、同じ内容・同じ設定の再出力はブラウザを使わずに返せる。
+    合計サイズが max_bytes を超えたら最終利用（mtime）が古いものから削除する（LRU）。
+    合計は put のたびにディレクトリを走査して求める（他プロセスが書き込んだ分も数えるため。
+    put はレンダリング1回ごとなので、走査の費用は描画に比べて小さい）。"""
+
+    def __init__(self, cache_dir='./post/.cache/pdf', max_bytes=256 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(full_html):
+        return hashlib.sha256(full_html.encode('utf-8')).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key + '.pdf')
+
+    def contains(self, key):
+        return os.path.isfile(self._path(key))
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            print(f"Error reading pdf cache: {e}")
+            return None
+        try:
+            os.utime(path)  # LRU 用に最終利用時刻を更新
+        except OSError:
+            pass
+        return data
+
+    def put(self, key, data):
+        path = self._path(key)
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            print(f"Error writing pdf cache: {e}")
+            return
+        with self._lock:
+            self._evict()
+
+    def _evict(self):
+        """ディレクトリを走査して合計サイズを求め、超過分を古い順に削除する"""
+        files = []
+        with os.scandir(self.cache_dir) as it:
+            for de in it:
+                if not de.name.endswith('.pdf'):
+                    continue
+                try:
+                    st = de.stat()
+                except OSError:
+                    continue
+                files.append((st.st_mtime, st.st_size, de.path))
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass  # 他プロセスが先に削除した
+            except OSError:
+                continue
+            total -= size
+
+post_pdf_cache = PostPdfCache(max_bytes=int(config.get('pdf_cache_max_mb', 256)) * 1024 * 1024)
+
+def _build_post_pdf_html(text, base_url, include_title=True,
+                         imgsize=None, codes=None, theme=None, body_html=None):
+    """Markdown 本文（title/tags 行を含む raw text）から A4 PDF 印刷用の HTML を組み立てる。
+    base_url は <base href> として埋め込み、/attach/xxx 等の相対パスを
+    実画像 URL に解決させる（リンク先 URL 用。画像の実体はプールがディスクから読む）。
+    include_title=False の場合、1行目のタイトル行と 2行目のタグ行を出力しない
+    （セクション単独 PDF 化用）。
+
     オプション設定（呼び出し側で検証済み前提）:
       imgsize : int | None  -- 画像幅% (例 70=小, 100=中, 150=大, 200=特大)
       codes   : 'hide' | 'show' | None  -- コードブロックの表示制御
-      theme   : ALLOWED_PDF_THEMES の文字列 | None  -- テーマ名"""
-    import markdown as md_lib
-    from playwright.sync_api import sync_playwright
-
+      theme   : ALLOWED_PDF_THEMES の文字列 | None  -- テーマ名
+      body_html : str | None  -- 本文の変換済み HTML（PostFragmentCache の 'pdf' 断片）。None なら text から変換"""
     # 1〜2行目（title / tags）を分離 — title は <h1>、tags は <small>
     lines = text.split('\n', 2)
     title = (lines[0] if len(lines) > 0 else '').lstrip('#').strip()
     tags = (lines[1] if len(lines) > 1 else '').strip()
     body_md = lines[2] if len(lines) > 2 else ''
 
-    body_html = md_lib.markdown(body_md, extensions=['tables', 'fenced_code', 'nl2br', 'sane_lists'])
+    if body_html is None:
+        import markdown as md_lib
+        body_html = md_lib.markdown(body_md, extensions=['tables', 'fenced_code', 'nl2br', 'sane_lists'])
 
-    # imgsize 指定時: 各 <img src="/attach/..."> の元画像を開いて自然幅を取得し、
+    # imgsize 指定時: 各 <img src="/attach/..."> の元画像の自然幅を添付カタログから取得し、
     # style="width: <natural*N/100>px; max-width: 100%; height: auto" を埋め込む。
     # 閲覧画面の setImageSize() と同等の「元画像の自然幅 × N%」を PDF で再現する。
     # （単なる CSS max-width: N% では元画像が紙幅より小さい場合に効かない問題への対処）
@@ -1611,14 +3270,10 @@ def _render_post_pdf_bytes(text, base_url, include_title=True,
             am = re.match(r'/?attach/((?:s_)?[a-f0-9]{64}\.[A-Za-z0-9]+)$', src)
             if not am:
                 return tag
-            path = os.path.join(UPLOAD_FOLDER, am.group(1))
-            if not os.path.isfile(path):
-                return tag
-            try:
-                with Image.open(path) as im:
-                    natural_w = im.width
-            except Exception:
+            entry = attachment_catalog.get(am.group(1))
+            if entry is None or entry['width'] is None:
                 return tag
+            natural_w = entry['width']
             new_w = max(1, int(natural_w * imgsize / 100))
             style_decl = f'width: {new_w}px; max-width: 100%; height: auto;'
             # 既存 style 属性があれば末尾に追記、なければ新規追加
@@ -1658,37 +3313,26 @@ def _render_post_pdf_bytes(text, base_url, include_title=True,
         '</div></body></html>'
     )
 
-    launch_kwargs = {'args': ['--no-sandbox']}
-    exec_path = _find_chromium_executable()
-    if exec_path:
-        launch_kwargs['executable_path'] = exec_path
-
-    from io import BytesIO
-    with sync_playwright() as p:
-        browser = p.chromium.launch(**launch_kwargs)
-        try:
-            page = browser.new_page()
-            # set_content + networkidle で <img> ロード完了まで待機
-            page.set_content(full_html, wait_until='networkidle', timeout=20000)
-            pdf_bytes = page.pdf(format='A4', print_background=True,
-                                 margin={'top': '18mm', 'right': '14mm',
-                                         'bottom': '18mm', 'left': '14mm'})
-        finally:
-            browser.close()
+    return full_html
+
+def _render_post_pdf_bytes(text, base_url, **options):
+    """Markdown 本文を A4 PDF にレンダリングして bytes を返す（options は _build_post_pdf_html と同じ）。
+    印刷は常駐ブラウザのプール（pdf_render_pool）で行い、結果は印刷する HTML の
+    ハッシュをキーに post_pdf_cache へ保存する（同じ内容・設定の再出力は即座に返る）。"""
+    full_html = _build_post_pdf_html(text, base_url, **options)
+    cache_key = post_pdf_cache.key(full_html)
+    pdf_bytes = post_pdf_cache.get(cache_key)
+    if pdf_bytes is None:
+        pdf_bytes = pdf_render_pool.render(full_html, base_url)
+        post_pdf_cache.put(cache_key, pdf_bytes)
     return pdf_bytes
 
-def _download_post_pdf_impl(filename):
-    """PDF 生成のコア処理。レート制限デコレータは呼び出し側で付与する。
-    ?section= 指定時は 1行目タイトル/2行目タグを出力せず、当該セクションのみ。
-    クエリパラメータで現在画面の閲覧設定を反映:
+def _post_pdf_options(filename, section):
+    """PDF 出力のクエリパラメータ（現在画面の閲覧設定）を検証し、_build_post_pdf_html の引数にする:
       ?imgsize=N (70/100/150/200 のいずれか)
       ?codes=show|hide
       ?theme=<ALLOWED_PDF_THEMES のいずれか>
     指定なし/不正値はサーバデフォルトにフォールバック。"""
-    text, section = _resolve_post_and_section(filename)
-    base_url = request.url_root  # http://host/ — <img src="/attach/xxx"> 解決用
-
-    # クエリパラメータの検証
     imgsize_arg = (request.args.get('imgsize', '') or '').strip()
     imgsize = None
     if imgsize_arg.isdigit():
@@ -1700,34 +3344,273 @@ def _download_post_pdf_impl(filename):
     theme_arg = (request.args.get('theme', '') or '').strip()
     theme = theme_arg if theme_arg in ALLOWED_PDF_THEMES else None
 
-    try:
-        pdf_bytes = _render_post_pdf_bytes(text, base_url,
-                                           include_title=(section is None),
-                                           imgsize=imgsize, codes=codes, theme=theme)
-    except Exception as e:
-        app.logger.exception(f"download_post_pdf failed for {filename} section={section}: {e}")
-        abort(500)
+    # 本文 HTML はセクション単位の断片キャッシュ（閲覧画面の SSR と共用）から組み立てる
+    body_html = None
+    if post_fragment_cache.available:
+        path = os.path.join('./post', filename)
+        if section is None:
+            body_html = '\n'.join(post_fragment_cache.fragments(path, profile='pdf'))
+        else:
+            index = post_section_index.find_h1(post_section_index.info(path), section)
+            if index is not None:
+                body_html = '\n'.join(post_fragment_cache.fragments(path, index, index + 1, profile='pdf'))
 
+    return {'include_title': section is None, 'imgsize': imgsize, 'codes': codes,
+            'theme': theme, 'body_html': body_html}
+
+def _post_pdf_name(filename, section):
     base = filename[:-4] if filename.lower().endswith('.txt') else filename
     if section:
         base = f"{base}_{_sanitize_section_for_filename(section)}"
-    pdf_name = base + '.pdf'
+    return base + '.pdf'
+
+def _download_post_pdf_impl(filename):
+    """PDF 生成のコア処理。レート制限デコレータは呼び出し側で付与する。
+    ?section= 指定時は 1行目タイトル/2行目タグを出力せず、当該セクションのみ。
+    ?imgsize= / ?codes= / ?theme= で現在画面の閲覧設定を反映する（_post_pdf_options）。"""
+    text, section = _resolve_post_and_section(filename)
+    base_url = request.url_root  # http://host/ — <img src="/attach/xxx"> 解決用
+
+    try:
+        pdf_bytes = _render_post_pdf_bytes(text, base_url, **_post_pdf_options(filename, section))
+    except PdfRenderBusy:
+        app.logger.warning(f"download_post_pdf: render queue full for {filename}")
+        abort(503)
+    except Exception as e:
+        app.logger.exception(f"download_post_pdf failed for {filename} section={section}: {e}")
+        abort(500)
 
     # ブラウザ内表示 (inline) — タブで PDF ビューワが起動し、必要に応じて
     # ユーザーが手動でダウンロード可能。download_name はビューワ保存時の
     # ヒントとして使われる。
     from io import BytesIO
     return send_file(BytesIO(pdf_bytes), as_attachment=False,
-                     download_name=pdf_name, mimetype='application/pdf')
+                     download_name=_post_pdf_name(filename, section), mimetype='application/pdf')
 
 @app.route('/post/<filename>/download_pdf')
-@limiter.limit("5 per minute")
+@limiter.limit("20 per minute")
 def download_post_pdf(filename):
     """メモを Markdown → HTML → A4 PDF に変換して返す（後方互換ルート）。
     新しい UI からは /post/<filename>?downloadtype=pdf&section=... が使われるが、
     こちらも引き続き利用可能。"""
     return _download_post_pdf_impl(filename)
 
+class PdfExportJobs:
+    """非同期の PDF 出力ジョブ。
+
+    ジョブの記録（対象投稿・状態・PDF 名・post_pdf_cache のキー）は jobs_dir/<job_id>.json に置き、
+    どのプロセスに届いた状態確認・ダウンロードでも同じ記録で投稿の一致を確かめる。ジョブ ID は
+    投稿名と印刷する HTML のハッシュ（= キャッシュのキー）から作るので、同じ投稿・同じ設定の要求は
+    実行中のジョブにまとまる。レンダリングは pdf_render_pool で行い、このプロセスで実行中のジョブは
+    Future から状態を求める。完成した PDF はキャッシュに入れ、キャッシュの上限を超えて残らなかった
+    場合は jobs_dir/<job_id>.pdf に置いて受け渡す。記録と結果は TTL 秒で捨てる。"""
+
+    TTL = 3600    # 秒
+    STALE = 600   # 他プロセスのジョブがこの秒数を過ぎても終わらなければ中断されたとみなす
+    PRUNE_INTERVAL = 60
+    JOB_ID_PATTERN = re.compile(r'[a-f0-9]{64}')
+
+    def __init__(self, pool, cache, jobs_dir=None):
+        self.pool = pool
+        self.cache = cache
+        self.jobs_dir = jobs_dir or os.path.join(cache.cache_dir, 'jobs')
+        self._futures = {}  # job_id → このプロセスで実行中のジョブの Future
+        self._pruned = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def job_id(filename, key):
+        return hashlib.sha256(f"{filename}\0{key}".encode('utf-8')).hexdigest()
+
+    def _record_path(self, job_id):
+        return os.path.join(self.jobs_dir, job_id + '.json')
+
+    def _result_path(self, job_id):
+        return os.path.join(self.jobs_dir, job_id + '.pdf')
+
+    def _write(self, path, data):
+        try:
+            os.makedirs(self.jobs_dir, exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+            return True
+        except Exception as e:
+            print(f"Error writing pdf job file: {e}")
+            return False
+
+    def _prune(self):
+        """TTL を過ぎた記録と結果を消す（PRUNE_INTERVAL 秒に1回）"""
+        now = time.time()
+        if now - self._pruned < self.PRUNE_INTERVAL:
+            return
+        self._pruned = now
+        try:
+            with os.scandir(self.jobs_dir) as it:
+                for de in it:
+                    if de.name[:64] in self._futures:
+                        continue
+                    try:
+                        if now - de.stat().st_mtime > self.TTL:
+                            os.remove(de.path)
+                    except OSError:
+                        pass
+        except FileNotFoundError:
+            pass
+
+    def get(self, job_id):
+        """ジョブの記録（filename, pdf_name, key, state, error, created）。無ければ None"""
+        try:
+            with open(self._record_path(job_id), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            print(f"Error reading pdf job record: {e}")
+            return None
+
+    def submit(self, full_html, base_url, filename, pdf_name):
+        """ジョブを登録して ID を返す。同じ内容のジョブが実行中・完了済みならそれを返す。
+        待ち行列が満杯なら PdfRenderBusy"""
+        key = self.cache.key(full_html)
+        job_id = self.job_id(filename, key)
+        with self._lock:
+            self._prune()
+            record = self.get(job_id)
+            if record is not None and self._status(job_id, record)[0] != 'error':
+                return job_id
+            record = {'filename': filename, 'pdf_name': pdf_name, 'key': key,
+                      'state': 'queued', 'error': None, 'created': time.time()}
+            future = None
+            if self.cache.contains(key):
+                record['state'] = 'done'
+            else:
+                future = self.pool.submit(full_html, base_url)
+                self._futures[job_id] = future
+            self._write(self._record_path(job_id), json.dumps(record).encode('utf-8'))
+        if future is not None:
+            future.add_done_callback(lambda f: self._finish(job_id, record, f))
+        return job_id
+
+    def _finish(self, job_id, record, future):
+        record = dict(record, state='done')
+        if future.cancelled():
+            record.update(state='error', error='Cancelled')
+        elif future.exception() is not None:
+            app.logger.error(f"PDF job {job_id} for {record['filename']} failed: {future.exception()}")
+            record.update(state='error', error=str(future.exception()))
+        else:
+            pdf_bytes = future.result()
+            self.cache.put(record['key'], pdf_bytes)
+            # キャッシュの上限より大きい PDF はすぐ追い出されるので、ジョブの結果として別に置く
+            if not self.cache.contains(record['key']) and not self._write(self._result_path(job_id), pdf_bytes):
+                record.update(state='error', error='Failed to store the rendered PDF')
+        self._write(self._record_path(job_id), json.dumps(record).encode('utf-8'))
+        with self._lock:
+            self._futures.pop(job_id, None)
+
+    def _status(self, job_id, record):
+        future = self._futures.get(job_id)
+        if future is not None:
+            # 完了直後は記録の更新中
+            return ('rendering' if future.running() or future.done() else 'queued'), None
+        if record['state'] == 'done':
+            if self.cache.contains(record['key']) or os.path.isfile(self._result_path(job_id)):
+                return 'done', None
+            return 'error', 'The rendered PDF has expired'
+        if record['state'] == 'error':
+            return 'error', record['error']
+        # 他のプロセスが実行中（そのプロセスが終了して記録が更新されないままなら中断とみなす）
+        if time.time() - record['created'] > self.STALE:
+            return 'error', 'The job was interrupted'
+        return 'queued', None
+
+    def status(self, job_id, record):
+        """(状態, エラーメッセージ) を返す。状態は queued / rendering / done / error"""
+        with self._lock:
+            return self._status(job_id, record)
+
+    def read(self, job_id, record):
+        """完成した PDF のバイト列（キャッシュ、無ければジョブの結果）。無ければ None"""
+        pdf_bytes = self.cache.get(record['key'])
+        if pdf_bytes is None:
+            try:
+                with open(self._result_path(job_id), 'rb') as f:
+                    pdf_bytes = f.read()
+            except OSError:
+                return None
+        return pdf_bytes
+
+pdf_export_jobs = PdfExportJobs(pdf_render_pool, post_pdf_cache)
+
+def _pdf_job_payload(filename, job_id, record):
+    status, error = pdf_export_jobs.status(job_id, record)
+    payload = {
+        'job_id': job_id,
+        'status': status,
+        'status_url': url_for('post_pdf_job_status', filename=filename, job_id=job_id),
+    }
+    if status == 'done':
+        payload['download_url'] = url_for('download_post_pdf_job', filename=filename, job_id=job_id)
+    if error:
+        payload['error'] = error
+    return payload
+
+def _pdf_job_or_404(filename, job_id):
+    """ジョブ ID の形式と記録を確認し、対象投稿が一致する記録を返す"""
+    if not PdfExportJobs.JOB_ID_PATTERN.fullmatch(job_id):
+        abort(404)
+    record = pdf_export_jobs.get(job_id)
+    if record is None or record.get('filename') != filename:
+        abort(404)
+    return record
+
+@app.route('/post/<filename>/pdf_jobs', methods=['POST'])
+@limiter.limit("20 per minute")
+def create_post_pdf_job(filename):
+    """PDF 出力をジョブとして受け付け、すぐにジョブ ID を返す（クエリは download_post_pdf と同じ）。
+    長い投稿でもリクエストワーカーやプロキシのタイムアウトに縛られない。"""
+    text, section = _resolve_post_and_section(filename)
+    base_url = request.url_root
+
+    try:
+        full_html = _build_post_pdf_html(text, base_url, **_post_pdf_options(filename, section))
+        job_id = pdf_export_jobs.submit(full_html, base_url, filename, _post_pdf_name(filename, section))
+    except PdfRenderBusy:
+        app.logger.warning(f"create_post_pdf_job: render queue full for {filename}")
+        return jsonify({'error': 'PDF 出力が混み合っています。しばらくしてから再度お試しください。'}), 503
+    except Exception as e:
+        app.logger.exception(f"create_post_pdf_job failed for {filename} section={section}: {e}")
+        return jsonify({'error': 'PDF 出力の受け付けに失敗しました。'}), 500
+
+    record = pdf_export_jobs.get(job_id)
+    if record is None:
+        return jsonify({'error': 'PDF 出力の受け付けに失敗しました。'}), 500
+    return jsonify(_pdf_job_payload(filename, job_id, record)), 202
+
+@app.route('/post/<filename>/pdf_jobs/<job_id>')
+@limiter.limit("120 per minute")
+def post_pdf_job_status(filename, job_id):
+    """PDF 出力ジョブの状態（queued / rendering / done / error）。done なら download_url を含む"""
+    _guard_post_access(filename)
+    record = _pdf_job_or_404(filename, job_id)
+    return jsonify(_pdf_job_payload(filename, job_id, record))
+
+@app.route('/post/<filename>/pdf_jobs/<job_id>/download')
+@limiter.limit("60 per minute")
+def download_post_pdf_job(filename, job_id):
+    """完了した PDF 出力ジョブの結果を返す（download_post_pdf と同じくブラウザ内表示）"""
+    _guard_post_access(filename)
+    record = _pdf_job_or_404(filename, job_id)
+    pdf_bytes = pdf_export_jobs.read(job_id, record)
+    if pdf_bytes is None:
+        abort(404)
+
+    from io import BytesIO
+    return send_file(BytesIO(pdf_bytes), as_attachment=False,
+                     download_name=record['pdf_name'], mimetype='application/pdf')
+
 def _is_downloadtype(kind):
     """request.args の downloadtype が指定種別かを判定する exempt_when 用ヘルパ。
     is_downloadtype('zip') -> downloadtype が 'zip' のときのみ False（=制限を適用する）。"""
@@ -1739,7 +3622,7 @@ def _is_downloadtype(kind):
 # downloadtype=zip / =pdf のときだけ、各々の重い処理に対応するレート制限を適用する。
 # それ以外（通常の閲覧）では両方の exempt_when が True を返し、制限は発動しない。
 @limiter.limit("10 per minute", exempt_when=_is_downloadtype('zip'))
-@limiter.limit("5 per minute", exempt_when=_is_downloadtype('pdf'))
+@limiter.limit("20 per minute", exempt_when=_is_downloadtype('pdf'))
 def post(filename):
     # downloadtype= による ZIP/PDF ダウンロードへのディスパッチ
     # （セクション横アイコンが /post/<file>?section=...&downloadtype=zip|pdf を叩く）
@@ -1756,7 +3639,8 @@ def post(filename):
         abort(400)  # 無効なファイル名の場合は400エラーを返す
 
     path = os.path.join('./post', filename)
-    if not os.path.exists(path):
+    st = _stat_or_none(path)
+    if st is None:
         auth = current_user.is_authenticated
         if auth:
             # 認証されている場合、編集画面へリダイレクト
@@ -1765,57 +3649,80 @@ def post(filename):
             # 認証されていない場合、404エラーを返す
             abort(404)
 
+    # 認証済みの場合のみページ切り替え用の最新投稿リストを取得
+    recent_posts = get_latest_posts(limit=20, exclude=filename) if authenticated else []
+    backlinks = _backlink_items(filename, authenticated)
+
+    # 本文・認証状態・最新投稿/被リンク一覧・レンダリング方式が変わっていなければファイルを開かずに 304
+    # （ssr_sections の切り替えや変換規則の更新で本文の HTML が変わるため、方式と RENDER_VERSION も含める）
+    ssr = _ssr_enabled()
+    render_profile = f"ssr{PostFragmentCache.RENDER_VERSION}" if ssr else 'csr'
+    etag, _ = _file_validators([st], authenticated, _TEMPLATE_VALIDATOR_SALT, _csrf_validator_part(), render_profile,
+                               json.dumps([recent_posts, backlinks], ensure_ascii=False, sort_keys=True))
+    if authenticated or _post_is_public_at(filename, st):
+        not_modified = _not_modified(etag)
+        if not_modified:
+            return not_modified
+
     INITIAL_SECTION_COUNT = 3
 
-    with open(path, 'r', encoding='utf-8', errors='ignore') as memo_file:
-        lines = memo_file.readlines()
-        title = html.escape(lines[0].strip()) if lines else ""
-        tags  = html.escape(lines[1].strip()) if len(lines) > 1 else ""
-        full_markdown = ''.join(lines[2:])
+    # セクション境界インデックスから、表示に必要な範囲だけを読む
+    entry = post_section_index.info(path)
+    title = html.escape(entry['title'].strip())
+    tags  = html.escape(entry['tags'].strip())
 
     # 1行目が##で始まる場合は認証されていない場合に返答しない
     if not authenticated and title.startswith('##'):
         abort(404)
 
-    sections       = split_markdown_by_sections(full_markdown)
-    total_sections = len(sections)
+    total_sections = len(entry['first_lines'])
 
     # ?section=<H1名> による単独セクション表示モード
     requested_section = request.args.get('section', '').strip()
     single_section_mode = False
     single_section_title = None
     if requested_section:
-        _, sec = find_section_by_h1_title(sections, requested_section)
-        if sec is not None:
-            sections = [sec]
+        index = post_section_index.find_h1(entry, requested_section)
+        if index is not None:
+            if not ssr:
+                sections = post_section_index.read(path, index, index + 1)
             total_sections = 1
             single_section_mode = True
             single_section_title = requested_section
         # 見つからない場合は通常表示にフォールバック（既存メモ全体ルールを継承）
 
     initial_count  = total_sections if single_section_mode else min(INITIAL_SECTION_COUNT, total_sections)
-    initial_markdown = html.escape('\n'.join(sections[:initial_count]))
+    if ssr:
+        # サーバー側でレンダリング済みの HTML 断片をそのまま埋め込む
+        first = index if single_section_mode else 0
+        initial_html = '\n'.join(post_fragment_cache.fragments(path, first, first + initial_count))
+        initial_markdown = ''
+    else:
+        if not single_section_mode:
+            sections = post_section_index.read(path, 0, initial_count)
+        initial_html = ''
+        initial_markdown = html.escape('\n'.join(sections[:initial_count]))
 
     content = {
         'initial_markdown': initial_markdown,
+        'initial_html': initial_html,
         'filename': filename,
         'title':    title,
         'tags':     tags,
     }
 
-    # 認証済みの場合のみページ切り替え用の最新投稿リストを取得
-    recent_posts = get_latest_posts(limit=20, exclude=filename) if authenticated else []
-
-    return render_template('post.html',
+    return _with_validators(make_response(render_template('post.html',
         content=content,
         authenticated=authenticated,
         recent_posts=recent_posts,
+        backlinks=backlinks,
         claude_code_url=config.get('claude_code_url', ''),
         total_sections=total_sections,
         initial_sections_count=initial_count,
         single_section_mode=single_section_mode,
         single_section_title=single_section_title,
-    )
+        ssr=ssr,
+    )), etag)
 
 @app.route('/postmd/<filename>')
 def markdown_file(filename):
@@ -1826,7 +3733,8 @@ def markdown_file(filename):
         abort(400)  # 無効なファイル名の場合は400エラーを返す
 
     path = os.path.join('./post', filename)
-    if not os.path.exists(path):
+    st = _stat_or_none(path)
+    if st is None:
         auth = current_user.is_authenticated
         if auth:
             # 認証されている場合、編集画面へリダイレクト
@@ -1835,6 +3743,13 @@ def markdown_file(filename):
             # 認証されていない場合、404エラーを返す
             abort(404)
 
+    # 本文は認証状態に依らないため、ファイルの版だけで判定する
+    etag, last_modified = _file_validators([st])
+    if authenticated or _post_is_public_at(filename, st):
+        not_modified = _not_modified(etag, last_modified, 'text/plain')
+        if not_modified:
+            return not_modified
+
     with open(path, 'r', encoding='utf-8', errors='ignore') as memo_file:
         lines = memo_file.readlines()
         markdown = ''.join(lines)  # 全ての行を結合して返す
@@ -1844,7 +3759,8 @@ def markdown_file(filename):
     if not authenticated and title.startswith('##'):
         abort(404)
 
-    return markdown, 200, {'Content-Type': 'text/plain; charset=utf-8'}
+    resp = make_response(markdown, 200, {'Content-Type': 'text/plain; charset=utf-8'})
+    return _with_validators(resp, etag, last_modified)
 
 @app.route('/api/ui/postsections/<filename>')
 @limiter.limit("120 per minute")
@@ -1858,11 +3774,10 @@ def api_ui_postsections(filename):
     if not os.path.exists(path):
         abort(404)
 
-    with open(path, 'r', encoding='utf-8', errors='ignore') as f:
-        lines = f.readlines()
+    entry = post_section_index.info(path)
 
     # 非公開記事チェック（/post/<filename> と同じ判定）
-    title = lines[0].strip() if lines else ""
+    title = entry['title'].strip()
     if not current_user.is_authenticated and title.startswith('##'):
         abort(404)
 
@@ -1876,10 +3791,20 @@ def api_ui_postsections(filename):
     if offset < 0 or count < 1:
         abort(400)
 
-    full_markdown = ''.join(lines[2:])
-    sections = split_markdown_by_sections(full_markdown)
-    total    = len(sections)
-    sliced   = sections[offset:offset + count]
+    total    = len(entry['first_lines'])
+
+    # ?format=html: サーバー側でレンダリング済みの HTML 断片を返す（利用できなければ Markdown のまま）
+    if request.args.get('format') == 'html' and _ssr_enabled():
+        fragments = post_fragment_cache.fragments(path, offset, offset + count)
+        return jsonify({
+            'html':     fragments,
+            'total':    total,
+            'offset':   offset,
+            'count':    len(fragments),
+            'has_more': (offset + count) < total,
+        })
+
+    sliced   = post_section_index.read(path, offset, offset + count)
 
     return jsonify({
         'sections': sliced,
@@ -1907,6 +3832,7 @@ def edit_post(filename):
     
     if request.method == 'POST' and form.validate_on_submit():
         content = form.content.data
+        existed = os.path.exists(post_path)
         with open(post_path, 'w', encoding='utf-8', errors='replace') as f:
             f.write(content)
         
@@ -1919,14 +3845,8 @@ def edit_post(filename):
         with open(backup_path, 'w', encoding='utf-8') as f:
             f.write(content)
             
-        # キャッシュファイルを削除して強制的に再生成を促す（全件キャッシュ＋旧キャッシュ）
-        cache_file_old = './post/.cache/post_files_info.json'
-        cache_file_all = './post/.cache/post_files_info_all.json'
-        filelist_cache = './post/.cache/filelist.json'
-        for cf in [cache_file_old, cache_file_all, filelist_cache]:
-            if os.path.exists(cf):
-                os.remove(cf)
-                print(f"Removed cache file: {cf}")
+        # 投稿インデックスを差分更新（全件キャッシュの再生成はしない）
+        _on_post_changed(filename, 'updated' if existed else 'created')
         
         # .txtを空文字列に置換して削除
         filename_without_txt = filename.replace('.txt', '')
@@ -1970,6 +3890,7 @@ def upload_text():
                         
                         with open(new_filepath, 'w', encoding='utf-8') as f:
                             f.write(f"##{file.filename}\n\n{content}")
+                        _on_post_changed(new_filename, 'created')
                 else:
                     print(f'ファイル {file.filename} は空です。スキップします。')
             else:
@@ -1986,16 +3907,23 @@ def postdata(filename):
         abort(400)  # 無効なファイル名の場合は400エラーを返す
 
     path = os.path.join('./post', filename)
-    if not os.path.exists(path):
+    st = _stat_or_none(path)
+    if st is None:
         abort(404)
 
+    authenticated = current_user.is_authenticated
+
+    etag, last_modified = _file_validators([st])
+    if authenticated or _post_is_public_at(filename, st):
+        not_modified = _not_modified(etag, last_modified)
+        if not_modified:
+            return not_modified
+
     with open(path, 'r', encoding='utf-8', errors='ignore') as memo_file:
         lines = memo_file.readlines()
         title = lines[0].strip() if lines else ""
         markdown = ''.join(lines[2:])  # 3行目以降を抽出
 
-    authenticated = current_user.is_authenticated
-
     # 非公開の場合は認証されていない場合に出力しない
     if not authenticated and title.startswith('##'):
         abort(404)
@@ -2005,7 +3933,7 @@ def postdata(filename):
     # [](...)形式のリンクも除外
     markdown = re.sub(r'\[.*?\]\(/attach/.*?\)', '', markdown)
 
-    return markdown
+    return _with_validators(make_response(markdown), etag, last_modified)
 
 
 @app.route('/api/ui/postlist/preview/<filename>')
@@ -2055,114 +3983,180 @@ def require_login_or_api_key(f):
     return decorated_function
 
 
-@app.route('/api/ui/postlist/graph')
-@require_login_or_api_key
-@limiter.limit("30 per minute")
-@csrf.exempt
-def api_ui_postlist_graph():
-    """メモ間のリンク関係をグラフデータとして返す（キャッシュ対応）"""
-    from urllib.parse import unquote
+class PostLinkIndex:
+    """投稿ごとの発リンク（/post/・/edit_post/ への URL）を保持するインデックス。
 
-    post_dir = './post'
-    cache_dir = os.path.join(post_dir, '.cache')
-    cache_file = os.path.join(cache_dir, 'graph_data.json')
+    filename → {timestamp, size, links} を post_links.json（+ 差分ログ post_links_delta.jsonl）に
+    保存し、PostMetadataIndex の generation が変わったときだけ、前回の同期以降に変化した投稿の
+    リンクを抽出し直す。マージ済みのグラフも generation 単位でメモリに保持する。
+    逆引き（リンク先 → リンク元の集合）も同じ差分更新で維持し、被リンクを走査なしで返す。"""
 
-    # キャッシュの有効性チェック
-    try:
-        os.makedirs(cache_dir, exist_ok=True)
-        if os.path.exists(cache_file):
-            cache_mtime = os.path.getmtime(cache_file)
-            # postディレクトリ内の最新ファイル更新時刻を取得
-            latest_mtime = 0
-            for fname in os.listdir(post_dir):
-                if fname.endswith('.txt'):
-                    fpath = os.path.join(post_dir, fname)
-                    mtime = os.path.getmtime(fpath)
-                    if mtime > latest_mtime:
-                        latest_mtime = mtime
-            if latest_mtime <= cache_mtime:
-                with open(cache_file, 'r', encoding='utf-8') as f:
-                    resp = jsonify(json.load(f))
-                    resp.headers['Cache-Control'] = 'no-cache, no-store'
-                    return resp
-    except Exception:
-        pass
-
-    # グラフデータ生成（/post/ と /edit_post/ 両方対応、生の角括弧も許容）
-    link_pattern = re.compile(
+    LINK_PATTERN = re.compile(
         r'https://paper\.path-finder\.jp/(?:post|edit_post)/([^\s\)"\'<>#]+)'
     )
 
-    titles = {}
-    raw_edges = []
-
-    txt_files = [f for f in os.listdir(post_dir) if f.endswith('.txt')]
-
-    for fname in txt_files:
-        fpath = os.path.join(post_dir, fname)
+    def __init__(self, metadata_index, post_dir='./post',
+                 cache_file='./post/.cache/post_links.json',
+                 delta_file='./post/.cache/post_links_delta.jsonl'):
+        self.metadata_index = metadata_index
+        self.post_dir = post_dir
+        self._store = SnapshotDeltaStore(cache_file, delta_file, 'link cache')
+        self._links = {}
+        self._backlinks = {}  # リンク先 → リンク元ファイル名の set
+        self._loaded = False
+        self._generation = None
+        self._graph = None
+        self._lock = threading.RLock()
+
+    def _extract(self, filename):
+        """1ファイルの発リンク先（重複除去・出現順）。読めなければ None"""
         try:
-            with open(fpath, 'r', encoding='utf-8', errors='ignore') as f:
+            with open(os.path.join(self.post_dir, filename), 'r', encoding='utf-8', errors='ignore') as f:
                 content = f.read()
         except Exception:
-            continue
-
-        lines = content.split('\n')
-        title = lines[0].lstrip('#').strip() if lines else fname
-
-        titles[fname] = title
-
-        for match in link_pattern.finditer(content):
-            raw_target = match.group(1)
+            return None
+        targets = []
+        for match in self.LINK_PATTERN.finditer(content):
             # URLデコードしてアンカー部分を除去
-            decoded = unquote(raw_target)
-            target_file = decoded.split('#')[0].strip()
-            if target_file and target_file != fname:
-                raw_edges.append((fname, target_file))
-
-    # リンクを持つ（または被リンクがある）ノードを特定（存在しないファイルも含める）
-    linked_sources = {e[0] for e in raw_edges}
-    linked_targets = {e[1] for e in raw_edges}
-    relevant_nodes = linked_sources | linked_targets
-
-    nodes = []
-    for nid in sorted(relevant_nodes):
-        exists = nid in titles
-        node_title = titles.get(nid, nid)
-        label = node_title[:40] if len(node_title) > 40 else node_title
-        if not exists:
-            label = '⚠ ' + label
-        nodes.append({
-            'id': nid,
-            'label': label,
-            'url': '/post/' + nid if exists else None,
-            'exists': 1 if exists else 0,
-            'modified_at': os.path.getmtime(os.path.join(post_dir, nid)) if exists else None
-        })
-
-    edges = []
-    seen_edges = set()
-    for src, tgt in raw_edges:
-        key = (src, tgt)
-        if key not in seen_edges:
-            seen_edges.add(key)
-            edges.append({'source': src, 'target': tgt})
-
-    result = {'nodes': nodes, 'edges': edges}
+            target_file = unquote(match.group(1)).split('#')[0].strip()
+            if target_file and target_file != filename:
+                targets.append(target_file)
+        return list(dict.fromkeys(targets))
+
+    def _set_links(self, filename, record):
+        """filename の発リンクを record（None なら削除）に置き換え、逆引きも更新する"""
+        old = self._links.pop(filename, None)
+        for target in (old['links'] if old else []):
+            sources = self._backlinks.get(target)
+            if sources:
+                sources.discard(filename)
+                if not sources:
+                    del self._backlinks[target]
+        if record is not None:
+            self._links[filename] = record
+            for target in record['links']:
+                self._backlinks.setdefault(target, set()).add(filename)
+
+    def _sync(self):
+        """世代が変わっていれば変化した投稿だけ抽出し直す。同期したかを返す。
+        変化した投稿は PostMetadataIndex.changes_since() で求め、記録が残っていない場合だけ全件を突き合わせる"""
+        generation, names = self.metadata_index.changes_since(self._generation)
+        if names is not None and not names:
+            return False
+        if not self._loaded:
+            for filename, record in self._store.load().items():
+                self._set_links(filename, record)
+            self._loaded = True
+        if names is None:
+            entries = {e['filename']: e for e in self.metadata_index.entries() if e['filename'].endswith('.txt')}
+            removed = [f for f in self._links if f not in entries]
+        else:
+            entries = {f: e for f, e in ((f, self.metadata_index.get(f)) for f in names if f.endswith('.txt'))
+                       if e is not None}
+            removed = [f for f in names if f not in entries and f in self._links]
+        changed = []
+        for filename, entry in entries.items():
+            cached = self._links.get(filename)
+            if cached and cached['timestamp'] == entry['timestamp'] and cached['size'] == entry['size']:
+                continue
+            links = self._extract(filename)
+            if links is None:
+                continue
+            self._set_links(filename, {'timestamp': entry['timestamp'], 'size': entry['size'], 'links': links})
+            changed.append(filename)
+        for filename in removed:
+            self._set_links(filename, None)
+            changed.append(filename)
+        self._store.append(self._links, changed)
+        self._generation = generation
+        self._graph = None
+        return True
 
-    # キャッシュ保存
-    try:
-        with open(cache_file, 'w', encoding='utf-8') as f:
-            json.dump(result, f, ensure_ascii=False)
-    except Exception:
-        pass
+    def _build_graph(self):
+        entries = {e['filename']: e for e in self.metadata_index.entries() if e['filename'].endswith('.txt')}
+        edges = []
+        for src in sorted(self._links):
+            if src in entries:
+                edges.extend({'source': src, 'target': tgt} for tgt in self._links[src]['links'])
+
+        # リンクを持つ（または被リンクがある）ノードを特定（存在しないファイルも含める）
+        relevant_nodes = {e['source'] for e in edges} | {e['target'] for e in edges}
+        nodes = []
+        for nid in sorted(relevant_nodes):
+            entry = entries.get(nid)
+            node_title = entry['title'].lstrip('#').strip() if entry else nid
+            label = node_title[:40] if len(node_title) > 40 else node_title
+            if not entry:
+                label = '⚠ ' + label
+            nodes.append({
+                'id': nid,
+                'label': label,
+                'url': '/post/' + nid if entry else None,
+                'exists': 1 if entry else 0,
+                'modified_at': entry['timestamp'] if entry else None
+            })
+        return {'nodes': nodes, 'edges': edges}
+
+    def backlinks(self, filename):
+        """filename へリンクしている投稿のメタデータエントリ（更新日時の降順）"""
+        with self._lock:
+            self._sync()
+            sources = list(self._backlinks.get(filename, ()))
+        entries = [self.metadata_index.get(src) for src in sources]
+        return sorted((e for e in entries if e), key=lambda e: e['timestamp'], reverse=True)
+
+    def versioned_graph(self):
+        """(generation, マージ済みグラフ {nodes, edges})。グラフは読み取り専用として扱うこと"""
+        with self._lock:
+            self._sync()
+            if self._graph is None:
+                self._graph = self._build_graph()
+            return self._generation, self._graph
+
+    def graph(self):
+        """マージ済みグラフ {nodes, edges}（読み取り専用として扱うこと）"""
+        return self.versioned_graph()[1]
+
+post_link_index = PostLinkIndex(post_metadata_index)
 
-    resp = jsonify(result)
+@app.route('/api/ui/postlist/graph')
+@require_login_or_api_key
+@limiter.limit("30 per minute")
+@csrf.exempt
+def api_ui_postlist_graph():
+    """メモ間のリンク関係をグラフデータとして返す（投稿ごとのリンクインデックスから構築し、
+    JSON と圧縮済みの本文は generation ごとに1回だけ作る）"""
+    generation, graph = post_link_index.versioned_graph()
+    resp = _precompressed_json_response('postlist_graph', generation, lambda: graph)
     resp.headers['Cache-Control'] = 'no-cache, no-store'
     return resp
 
+def _backlink_items(filename, authenticated):
+    """被リンク一覧（非認証時は # で始まるタイトルのメモを除外）"""
+    return [{
+        'filename': entry['filename'],
+        'title': entry['title'].lstrip('#').strip() or entry['filename'],
+        'modified_at': dt.datetime.fromtimestamp(entry['timestamp']).isoformat()
+    } for entry in post_link_index.backlinks(filename) if authenticated or not entry['hidden']]
 
-def _parse_date_text(text, today):
-    """テキストから日付を解析する。返却: (date_obj, matched_text) or None"""
+@app.route('/api/ui/backlinks/<filename>')
+@limiter.limit("120 per minute")
+@csrf.exempt
+def api_ui_backlinks(filename):
+    """このメモへリンクしているメモの一覧（逆引きインデックスから返す）"""
+    if not is_valid_filename(filename):
+        abort(400)
+    entry = post_metadata_index.get(filename)
+    if entry is None:
+        abort(404)
+    # 非公開記事チェック（/post/<filename> と同じ判定）
+    if not current_user.is_authenticated and entry['private']:
+        abort(404)
+    return jsonify({'backlinks': _backlink_items(filename, current_user.is_authenticated)})
+
+
+def _parse_absolute_date_text(text):
+    """年を含む（今日に依存しない）日付表記だけを解析する。返却: (date_obj, matched_text) or None"""
     # YYYYMMDD (8桁連続)
     m = re.search(r'(\d{4})(0[1-9]|1[0-2])(0[1-9]|[12]\d|3[01])', text)
     if m:
@@ -2190,6 +4184,15 @@ def _parse_date_text(text, today):
         except ValueError:
             pass
 
+    return None
+
+
+def _parse_date_text(text, today):
+    """テキストから日付を解析する。返却: (date_obj, matched_text) or None"""
+    result = _parse_absolute_date_text(text)
+    if result:
+        return result
+
     # M月D日
     m = re.search(r'(\d{1,2})月(\d{1,2})日', text)
     if m:
@@ -2270,16 +4273,140 @@ def _parse_date_text(text, today):
     return None
 
 
-def extract_dates_from_line(line, today):
-    """1行から**太字**で囲まれた日付情報のみを抽出する。複数ある場合は今日に最も近い日付を採用。"""
-    candidates = []
-    for m in re.finditer(r'\*\*(.+?)\*\*', line):
-        result = _parse_date_text(m.group(1), today)
-        if result:
-            candidates.append(result)
-    if not candidates:
-        return None
-    return min(candidates, key=lambda x: abs((x[0] - today).days))
+class PostDateIndex:
+    """投稿ごとの日付情報（タイムライン用の**太字**日付、過去実績用の `# YYYYMMDD` 見出し）を保持するインデックス。
+
+    filename → {timestamp, size, title, mentions, h1} を post_dates.json（+ 差分ログ
+    post_dates_delta.jsonl）に保存し、要求されたファイルの mtime / size が変わっていたときだけ読み直す。
+    年を含む日付は抽出時に確定させ、M/D・来週などの相対表記は太字部分の文字列のまま
+    保持して、問い合わせ時の「今日」で解決する。"""
+
+    TIMELINE_LINES = 22  # タイムラインは先頭22行（タイトル行・タグ行を除く本文）だけを見る
+    H1_PATTERN = re.compile(r'^# (\d{8})(.*)')
+    BOLD_PATTERN = re.compile(r'\*\*(.+?)\*\*')
+    RELATIVE_HINT = re.compile(r'\d{1,2}月|\d/\d|来週|来月|今月')
+
+    def __init__(self, metadata_index, post_dir='./post',
+                 cache_file='./post/.cache/post_dates.json',
+                 delta_file='./post/.cache/post_dates_delta.jsonl'):
+        self.metadata_index = metadata_index
+        self.post_dir = post_dir
+        self._store = SnapshotDeltaStore(cache_file, delta_file, 'date cache')
+        self._records = {}
+        self._loaded = False
+        self._lock = threading.RLock()
+
+    @classmethod
+    def _date_specs(cls, line):
+        """1行の太字部分ごとの日付候補。['abs', ISO日付, 一致文字列] か ['rel', 太字部分]"""
+        specs = []
+        for m in cls.BOLD_PATTERN.finditer(line):
+            segment = m.group(1)
+            result = _parse_absolute_date_text(segment)
+            if result:
+                specs.append(['abs', result[0].isoformat(), result[1]])
+            elif cls.RELATIVE_HINT.search(segment):
+                specs.append(['rel', segment])
+        return specs
+
+    def _extract(self, filename, entry):
+        """1ファイルを読み、日付情報のレコードを返す。読めなければ None"""
+        try:
+            with open(os.path.join(self.post_dir, filename), 'r', encoding='utf-8', errors='ignore') as f:
+                lines = f.read().split('\n')
+        except Exception:
+            return None
+        if lines[-1] == '':
+            lines.pop()
+
+        mentions = []
+        # 本文は3行目以降（タイトル行+タグ行をスキップ）
+        for line in lines[2:self.TIMELINE_LINES]:
+            specs = self._date_specs(line)
+            if specs:
+                mentions.append([line.strip(), specs])
+
+        h1 = []
+        in_code_fence = False
+        for line in lines:
+            stripped = line.strip()
+            if stripped.startswith('```') or stripped.startswith('~~~'):
+                in_code_fence = not in_code_fence
+                continue
+            if in_code_fence:
+                continue
+            m = self.H1_PATTERN.match(stripped)
+            if m:
+                date_str = m.group(1)
+                try:
+                    d = datetime.date(int(date_str[:4]), int(date_str[4:6]), int(date_str[6:8]))
+                except ValueError:
+                    continue
+                h1.append([d.isoformat(), stripped[2:]])  # "# " を除去
+
+        return {
+            'timestamp': entry['timestamp'],
+            'size': entry['size'],
+            'title': lines[0] if lines else None,
+            'mentions': mentions,
+            'h1': h1,
+        }
+
+    def _load_snapshot(self):
+        """保存済みのレコードを読み込み、削除済みの投稿の分を捨てる"""
+        self._records = self._store.load()
+        live = {e['filename'] for e in self.metadata_index.entries()}
+        dead = [f for f in self._records if f not in live]
+        for filename in dead:
+            del self._records[filename]
+        self._store.append(self._records, dead)
+
+    def records(self, filenames):
+        """[(filename, record)]（存在しない・読めないファイルは除く）。変化したファイルだけ読み直し、
+        変化した分だけを差分ログに追記する"""
+        with self._lock:
+            if not self._loaded:
+                self._load_snapshot()
+                self._loaded = True
+            result = []
+            changed = []
+            for filename in filenames:
+                entry = self.metadata_index.get(filename)
+                if entry is None:
+                    if self._records.pop(filename, None) is not None:
+                        changed.append(filename)
+                    continue
+                record = self._records.get(filename)
+                if not (record and record['timestamp'] == entry['timestamp'] and record['size'] == entry['size']):
+                    record = self._extract(filename, entry)
+                    if record is None:
+                        continue
+                    self._records[filename] = record
+                    changed.append(filename)
+                result.append((filename, record))
+            self._store.append(self._records, changed)
+            return result
+
+    @staticmethod
+    def resolve(specs, today):
+        """行の日付候補を今日基準で解決し、今日に最も近い (date_obj, matched_text) を返す"""
+        candidates = []
+        for spec in specs:
+            if spec[0] == 'abs':
+                candidates.append((datetime.date.fromisoformat(spec[1]), spec[2]))
+            else:
+                result = _parse_date_text(spec[1], today)
+                if result:
+                    candidates.append(result)
+        if not candidates:
+            return None
+        return min(candidates, key=lambda x: abs((x[0] - today).days))
+
+post_date_index = PostDateIndex(post_metadata_index)
+
+def _post_date_label(d):
+    weekday_names = ['月', '火', '水', '木', '金', '土', '日']
+    return f"{d.month}/{d.day}({weekday_names[d.weekday()]})"
 
 
 @app.route('/api/ui/postlist/graph/timeline', methods=['POST'])
@@ -2287,46 +4414,25 @@ def extract_dates_from_line(line, today):
 @limiter.limit("30 per minute")
 @csrf.exempt
 def api_ui_postlist_graph_timeline():
-    """グラフ上のメモから日時情報を抽出してタイムライン表示用データを返す"""
+    """グラフ上のメモから日時情報を抽出してタイムライン表示用データを返す（日付インデックスを参照）"""
     data = request.get_json(silent=True)
     if not data or 'filenames' not in data:
         return jsonify({'items': []})
 
-    filenames = data['filenames'][:200]
+    filenames = [f for f in data['filenames'][:200] if is_valid_filename(f)]
     today = datetime.date.today()
-    weekday_names = ['月', '火', '水', '木', '金', '土', '日']
     items = []
 
-    for filename in filenames:
-        if not is_valid_filename(filename):
-            continue
-        path = os.path.join('./post', filename)
-        if not os.path.exists(path):
-            continue
-        try:
-            with open(path, 'r', encoding='utf-8', errors='ignore') as f:
-                lines = []
-                for i, line in enumerate(f):
-                    if i >= 22:
-                        break
-                    lines.append(line.rstrip('\n'))
-        except Exception:
-            continue
-
-        title = lines[0] if lines else filename
-        # 本文は3行目以降（タイトル行+タグ行をスキップ）
-        body_lines = lines[2:] if len(lines) > 2 else []
-
-        for line in body_lines:
-            result = extract_dates_from_line(line, today)
+    for filename, record in post_date_index.records(filenames):
+        title = record['title'] if record['title'] is not None else filename
+        for line, specs in record['mentions']:
+            result = PostDateIndex.resolve(specs, today)
             if result:
-                d, matched = result
-                wd = weekday_names[d.weekday()]
-                date_label = f"{d.month}/{d.day}({wd})"
+                d = result[0]
                 items.append({
                     'date': d.isoformat(),
-                    'date_label': date_label,
-                    'line': line.strip(),
+                    'date_label': _post_date_label(d),
+                    'line': line,
                     'filename': filename,
                     'title': title
                 })
@@ -2340,60 +4446,29 @@ def api_ui_postlist_graph_timeline():
 @limiter.limit("30 per minute")
 @csrf.exempt
 def api_ui_postlist_graph_achievements():
-    """グラフ上のメモからH1の8桁日付を抽出して過去実績データを返す"""
+    """グラフ上のメモからH1の8桁日付を抽出して過去実績データを返す（日付インデックスを参照）"""
     data = request.get_json(silent=True)
     if not data or 'filenames' not in data:
         return jsonify({'items': []})
 
-    filenames = data['filenames'][:200]
+    filenames = [f for f in data['filenames'][:200] if is_valid_filename(f)]
     days = data.get('days', 7)
     today = datetime.date.today()
-    cutoff = today - datetime.timedelta(days=days)
-    weekday_names = ['月', '火', '水', '木', '金', '土', '日']
+    cutoff = (today - datetime.timedelta(days=days)).isoformat()
+    today_iso = today.isoformat()
     items = []
-    h1_pattern = re.compile(r'^# (\d{8})(.*)')
 
-    for filename in filenames:
-        if not is_valid_filename(filename):
-            continue
-        path = os.path.join('./post', filename)
-        if not os.path.exists(path):
-            continue
-        try:
-            with open(path, 'r', encoding='utf-8', errors='ignore') as f:
-                file_lines = f.readlines()
-        except Exception:
-            continue
-
-        title = file_lines[0].rstrip('\n') if file_lines else filename
-
-        in_code_fence = False
-        for line in file_lines:
-            stripped = line.strip()
-            if stripped.startswith('```') or stripped.startswith('~~~'):
-                in_code_fence = not in_code_fence
-                continue
-            if in_code_fence:
-                continue
-            m = h1_pattern.match(stripped)
-            if m:
-                date_str = m.group(1)
-                rest = m.group(2).strip()
-                try:
-                    d = datetime.date(int(date_str[:4]), int(date_str[4:6]), int(date_str[6:8]))
-                except ValueError:
-                    continue
-                if cutoff <= d <= today:
-                    wd = weekday_names[d.weekday()]
-                    date_label = f"{d.month}/{d.day}({wd})"
-                    text = stripped[2:]  # "# " を除去
-                    items.append({
-                        'date': d.isoformat(),
-                        'date_label': date_label,
-                        'text': text,
-                        'filename': filename,
-                        'title': title
-                    })
+    for filename, record in post_date_index.records(filenames):
+        title = record['title'] if record['title'] is not None else filename
+        for date_iso, text in record['h1']:
+            if cutoff <= date_iso <= today_iso:
+                items.append({
+                    'date': date_iso,
+                    'date_label': _post_date_label(datetime.date.fromisoformat(date_iso)),
+                    'text': text,
+                    'filename': filename,
+                    'title': title
+                })
 
     items.sort(key=lambda x: x['date'])
     return jsonify({'items': items})
@@ -2453,6 +4528,7 @@ def rename_post():
         if os.path.exists(new_path):
             return jsonify({'error': '新しいファイル名は既に存在します。'}), 400
         os.rename(old_path, new_path)
+        _on_post_changed(new_filename, old_filename=old_filename)
         return jsonify({'success': 'ファイル名が変更されました。'}), 200
     else:
         return jsonify({'error': '元のファイルが存在しません。'}), 404
@@ -2466,6 +4542,7 @@ def add_post():
     
     with open(file_path, 'w') as new_file:
         new_file.write("##タイトル未設定\n\n")
+    _on_post_changed(filename, 'created')
     
     return redirect(url_for('edit_post', filename=filename))
 
@@ -2482,6 +4559,7 @@ def delete_post():
     if os.path.exists(file_path):
         try:
             os.remove(file_path)
+            _on_post_changed(filename, 'deleted')
             return jsonify({'success': 'ファイルが削除されました。'}), 200
         except Exception as e:
             return jsonify({'error': f'ファイルの削除に失敗しました: {str(e)}'}), 500
@@ -2505,6 +4583,7 @@ def archive_post():
         new_path = os.path.join('./post', new_filename)
         
         os.rename(file_path, new_path)
+        _on_post_changed(new_filename, old_filename=filename)
         return jsonify({'success': 'ファイルがアーカイブされました。'}), 200
     except Exception as e:
         return jsonify({'error': f'アーカイブに失敗しました: {str(e)}'}), 500
@@ -2524,8 +4603,10 @@ def duplicate_post():
         try:
             with open(original_path, 'r', encoding='utf-8') as f:
                 content = f.read()
+            existed = os.path.exists(new_path)
             with open(new_path, 'w', encoding='utf-8') as f:
                 f.write(content)
+            _on_post_changed(new_filename, 'updated' if existed else 'created')
             return jsonify({'success': 'ファイルが複製されました。'}), 200
         except Exception as e:
             return jsonify({'error': f'ファイルの複製に失敗しました: {str(e)}'}), 500
@@ -2537,19 +4618,12 @@ def duplicate_post():
 def get_categories():
     """既存のカテゴリ一覧を取得"""
     try:
-        post_dir = './post'
-        post_files = [f for f in os.listdir(post_dir)
-                      if os.path.isfile(os.path.join(post_dir, f))
-                      and not f.endswith('.gitkeep')]
-
         categories = set()
-        for filename in post_files:
-            topic_match = re.match(r'\[(.*?)\]', filename)
-            if topic_match:
-                category = topic_match.group(1)
-                # _archivedは除外
-                if category != '_archived':
-                    categories.add(category)
+        for entry in post_metadata_index.entries():
+            category = entry['category']
+            # _archivedは除外
+            if category is not None and category != '_archived':
+                categories.add(category)
 
         # アルファベット順にソート
         sorted_categories = sorted(list(categories))
@@ -2600,13 +4674,8 @@ def change_category():
         # ファイルをリネーム
         os.rename(file_path, new_path)
 
-        # キャッシュをクリア
-        cache_file_old = './post/.cache/post_files_info.json'
-        cache_file_all = './post/.cache/post_files_info_all.json'
-        filelist_cache = './post/.cache/filelist.json'
-        for cf in [cache_file_old, cache_file_all, filelist_cache]:
-            if os.path.exists(cf):
-                os.remove(cf)
+        # 投稿インデックスを差分更新
+        _on_post_changed(new_filename, old_filename=filename)
 
         return jsonify({'success': 'カテゴリが変更されました。', 'new_filename': new_filename}), 200
     except Exception as e:
@@ -2768,13 +4837,8 @@ def add_comment():
         with open(file_path, 'w', encoding='utf-8', errors='replace') as f:
             f.writelines(new_content)
 
-        # キャッシュ削除
-        cache_file_old = './post/.cache/post_files_info.json'
-        cache_file_all = './post/.cache/post_files_info_all.json'
-        filelist_cache = './post/.cache/filelist.json'
-        for cf in [cache_file_old, cache_file_all, filelist_cache]:
-            if os.path.exists(cf):
-                os.remove(cf)
+        # 投稿インデックスを差分更新
+        _on_post_changed(filename)
 
         return jsonify({'success': 'コメントが追加されました。'}), 200
     except Exception as e:
@@ -2784,7 +4848,8 @@ def add_comment():
 @app.route('/summary/<filename>')
 def summary(filename):
     path = os.path.join('./summary', secure_filename(filename))
-    if not os.path.exists(path):
+    st = _stat_or_none(path)
+    if st is None:
         auth = current_user.is_authenticated
         if auth:
             # 認証されている場合、編集画面へリダイレクト
@@ -2793,6 +4858,14 @@ def summary(filename):
             # 認証されていない場合、404エラーを返す
             abort(404)
 
+    authenticated = current_user.is_authenticated
+
+    # 表示内容は要約ファイルと認証状態で決まるため、両方が同じなら 304
+    etag, _ = _file_validators([st], authenticated, _TEMPLATE_VALIDATOR_SALT)
+    not_modified = _not_modified(etag)
+    if not_modified:
+        return not_modified
+
     with open(path, 'r') as memo_file:
         markdown = memo_file.read()
 
@@ -2801,9 +4874,8 @@ def summary(filename):
         'filename': filename
     }
 
-    authenticated = current_user.is_authenticated
-    
-    return render_template('summary.html', content=content, authenticated=authenticated)
+    resp = make_response(render_template('summary.html', content=content, authenticated=authenticated))
+    return _with_validators(resp, etag)
 
 class EditSummaryForm(FlaskForm):
     content = TextAreaField('Content', validators=[DataRequired()])
@@ -2819,6 +4891,7 @@ def edit_summary(filename):
         content = request.form['content']
         with open(txt_path, 'w') as f:
             f.write(content)
+        _on_paper_changed(os.path.splitext(os.path.basename(txt_path))[0])
         # .txtを空文字列に置換して削除
         filename_without_txt = filename.replace('.txt', '')
         return redirect(url_for('permalink', filename=filename_without_txt))
@@ -2866,6 +4939,7 @@ def edit_summary2(filename):
         content = request.form['content']
         with open(txt_path, 'w') as f:
             f.write(content)
+        _on_paper_changed(os.path.splitext(os.path.basename(txt_path))[0])
         # .txtを空文字列に置換して削除
         filename_without_txt = filename.replace('.txt', '')
         return redirect(url_for('permalink', filename=filename_without_txt))
@@ -3036,6 +5110,7 @@ def webtomd():
                 
                 with open(file_path, 'w', encoding='utf-8') as file:
                     file.write('##' + web_url.strip() + '\n' + markdown_text)
+                _on_post_changed(file_name, 'created')
                 
                 success_count += 1
             except requests.exceptions.RequestException as e:
@@ -3050,30 +5125,17 @@ def webtomd():
     return render_template('webtomd.html', form=form, message=message)
 
 def _get_latest_visible_post_filename(authenticated):
-    """mtime 降順で投稿ディレクトリをスキャンし、最初の閲覧可能ファイル名を返す。
+    """mtime 降順で投稿インデックスを走査し、最初の閲覧可能ファイル名を返す。
     認証なしユーザーには 1行目が '##' で始まるプライベートメモを除外する
     （/post/<filename> の既存ガードと同じ判定）。該当なしなら None。"""
-    post_dir = './post'
-    candidates = []
-    for f in os.listdir(post_dir):
-        path = os.path.join(post_dir, f)
-        if not os.path.isfile(path) or f.endswith('.gitkeep'):
-            continue
-        candidates.append((os.path.getmtime(path), f))
-    candidates.sort(reverse=True)  # mtime 降順
-
-    for _mtime, filename in candidates:
-        if authenticated:
-            return filename
-        # 認証なし: ## で始まるプライベートメモはスキップ
-        try:
-            with open(os.path.join(post_dir, filename), 'r', encoding='utf-8', errors='ignore') as fp:
-                title = fp.readline().strip()
-        except Exception:
-            continue
-        if not title.startswith('##'):
-            return filename
-    return None
+    candidates = [
+        (entry['timestamp'], entry['filename'])
+        for entry in post_metadata_index.entries()
+        if authenticated or not entry['private']
+    ]
+    if not candidates:
+        return None
+    return max(candidates)[1]
 
 @app.route('/postlist')
 def post_list():
@@ -3186,39 +5248,24 @@ def get_posts_by_date_periods():
 
     # 検索クエリの取得
     search_query = request.args.get('search')
+    search_terms = search_query.lower().split() if search_query else []
+    matches = _post_search_filter(search_terms) if search_terms else None
 
-    # 投稿ファイルの取得
-    post_dir = './post'
-    post_files = [f for f in os.listdir(post_dir)
-                if os.path.isfile(os.path.join(post_dir, f))
-                and not f.endswith('.gitkeep')]
-
-    for filename in post_files:
-        file_path = os.path.join(post_dir, filename)
-        timestamp = os.path.getmtime(file_path)
+    for entry in post_metadata_index.entries():
+        timestamp = entry['timestamp']
         file_date = datetime.datetime.fromtimestamp(timestamp)
 
-        # メタデータの取得
-        metadata = get_file_metadata(file_path)
-
         # 認証なしユーザーには#で始まるタイトルを非表示
-        if not authenticated and metadata['title'].startswith('#'):
+        if not authenticated and entry['hidden']:
             continue
 
-        # 検索時は全文を読み込む
-        if search_query:
-            try:
-                with open(file_path, 'r', encoding='utf-8', errors='ignore') as file:
-                    content = file.read().lower()
-                    if not any(term.lower() in content for term in search_query.split()):
-                        continue
-            except Exception as e:
-                print(f"Error reading file for search {file_path}: {e}")
-                continue
+        # 検索時は全文検索インデックスで絞り込む
+        if matches and not matches(entry['filename']):
+            continue
 
         file_info = {
-            'filename': filename,
-            'title': metadata['title'],
+            'filename': entry['filename'],
+            'title': entry['title'],
             'date': file_date.strftime('%Y/%m/%d %H:%M'),
             'timestamp': timestamp,
             'relative_time': get_relative_time(timestamp)
@@ -3238,30 +5285,20 @@ def get_posts_by_date_periods():
     for period in posts:
         posts[period].sort(key=lambda x: x['timestamp'], reverse=True)
 
-    return posts
-
-def get_latest_posts(limit=10, exclude=None):
-    """最新N件の投稿を取得（指定ファイルを除外可能）"""
-    post_dir = './post'
-    post_files = [f for f in os.listdir(post_dir)
-                  if os.path.isfile(os.path.join(post_dir, f))
-                  and not f.endswith('.gitkeep')
-                  and f != exclude]  # 現在編集中のファイルを除外
-
-    files_with_time = []
-    for filename in post_files:
-        file_path = os.path.join(post_dir, filename)
-        timestamp = os.path.getmtime(file_path)
-        metadata = get_file_metadata(file_path)
-        files_with_time.append({
-            'filename': filename,
-            'title': metadata['title'],
-            'date': datetime.datetime.fromtimestamp(timestamp).strftime('%Y/%m/%d %H:%M'),
-            'timestamp': timestamp
-        })
+    return posts
+
+def get_latest_posts(limit=10, exclude=None):
+    """最新N件の投稿を取得（指定ファイルを除外可能）"""
+    entries = [e for e in post_metadata_index.entries()
+               if e['filename'] != exclude]  # 現在編集中のファイルを除外
+    latest = heapq.nlargest(limit, entries, key=lambda e: e['timestamp'])
 
-    files_with_time.sort(key=lambda x: x['timestamp'], reverse=True)
-    return files_with_time[:limit]
+    return [{
+        'filename': e['filename'],
+        'title': e['title'],
+        'date': datetime.datetime.fromtimestamp(e['timestamp']).strftime('%Y/%m/%d %H:%M'),
+        'timestamp': e['timestamp']
+    } for e in latest]
 
 def get_relative_time(timestamp):
     """相対的な時間表示を生成"""
@@ -3441,19 +5478,24 @@ def api_get_post(filename):
     file_path = os.path.join('./post', filename)
 
     # ファイル存在チェック
-    if not os.path.isfile(file_path):
+    file_stat = _stat_or_none(file_path)
+    if file_stat is None or not stat.S_ISREG(file_stat.st_mode):
         return jsonify({
             "status": "error",
             "message": "File not found"
         }), 404
 
+    # 変更がなければファイルを開かずに 304
+    etag, last_modified = _file_validators([file_stat])
+    not_modified = _not_modified(etag, last_modified, 'application/json')
+    if not_modified:
+        return not_modified
+
     try:
         with open(file_path, 'r', encoding='utf-8') as f:
             content = f.read()
 
-        file_stat = os.stat(file_path)
-
-        return jsonify({
+        return _with_validators(jsonify({
             "status": "success",
             "data": {
                 "filename": filename,
@@ -3461,7 +5503,7 @@ def api_get_post(filename):
                 "size": file_stat.st_size,
                 "modified_at": dt.datetime.fromtimestamp(file_stat.st_mtime).isoformat()
             }
-        })
+        }), etag, last_modified)
     except Exception as e:
         app.logger.error(f"Error reading file {filename}: {str(e)}")
         return jsonify({
@@ -3512,13 +5554,8 @@ def api_get_post_sections(filename):
         }), 400
 
     try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            lines = f.readlines()
-
-        full_markdown = ''.join(lines[2:])
-        sections = split_markdown_by_sections(full_markdown)
-        total = len(sections)
-        sliced = sections[offset:offset + count]
+        total = len(post_section_index.info(file_path)['first_lines'])
+        sliced = post_section_index.read(file_path, offset, offset + count, errors='strict')
 
         return jsonify({
             "status": "success",
@@ -3560,17 +5597,10 @@ def api_get_post_section_titles(filename):
         }), 404
 
     try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            lines = f.readlines()
-
-        full_markdown = ''.join(lines[2:])
-        sections = split_markdown_by_sections(full_markdown)
-
-        titles = []
-        for i, sec in enumerate(sections):
-            first_line = sec.split('\n', 1)[0]
-            title = first_line.lstrip('# ').strip() if first_line.startswith('# ') else first_line.strip()
-            titles.append({"index": i, "title": title})
+        # 見出しはセクション境界インデックスから返す（本文は読まない）
+        first_lines = post_section_index.info(file_path)['first_lines']
+        titles = [{"index": i, "title": _section_list_title(first_line)}
+                  for i, first_line in enumerate(first_lines)]
 
         return jsonify({
             "status": "success",
@@ -3620,19 +5650,16 @@ def api_search_post_sections(filename):
         }), 400
 
     try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            lines = f.readlines()
-
-        full_markdown = ''.join(lines[2:])
-        sections = split_markdown_by_sections(full_markdown)
+        first_lines = post_section_index.info(file_path)['first_lines']
         query_lower = query.lower()
 
+        # 見出しで絞り込み、一致したセクションの本文だけを読む
         matched = []
-        for i, sec in enumerate(sections):
-            first_line = sec.split('\n', 1)[0]
-            title = first_line.lstrip('# ').strip() if first_line.startswith('# ') else first_line.strip()
+        for i, first_line in enumerate(first_lines):
+            title = _section_list_title(first_line)
             if query_lower in title.lower():
-                matched.append({"index": i, "title": title, "content": sec})
+                content = post_section_index.read(file_path, i, i + 1, errors='strict')[0]
+                matched.append({"index": i, "title": title, "content": content})
 
         return jsonify({
             "status": "success",
@@ -3641,7 +5668,7 @@ def api_search_post_sections(filename):
                 "query": query,
                 "sections": matched,
                 "matched": len(matched),
-                "total": len(sections)
+                "total": len(first_lines)
             }
         })
     except Exception as e:
@@ -3651,24 +5678,159 @@ def api_search_post_sections(filename):
             "message": "Internal server error"
         }), 500
 
-# API 2: 新規投稿作成
-@app.route('/api/posts', methods=['POST'])
+# API: 被リンク一覧
+@app.route('/api/posts/<filename>/backlinks', methods=['GET'])
 @require_api_key
 @limiter.limit("60 per minute")
 @csrf.exempt
-def api_create_post():
-    """新規投稿を作成（ファイル名は自動生成）"""
-    data = request.get_json()
+def api_get_post_backlinks(filename):
+    """この投稿へリンクしている投稿の一覧を取得（逆引きリンクインデックスから返す）"""
+    if not is_valid_api_filename(filename):
+        return jsonify({
+            "status": "error",
+            "message": "Invalid filename or access denied"
+        }), 400
 
-    if not data or 'content' not in data:
+    if post_metadata_index.get(filename) is None:
         return jsonify({
             "status": "error",
-            "message": "Missing 'content' field"
+            "message": "File not found"
+        }), 404
+
+    try:
+        backlinks = [{
+            "filename": entry['filename'],
+            "category": entry['category'] if entry['category'] is not None else '_',
+            "title": _api_post_title(entry),
+            "modified_at": dt.datetime.fromtimestamp(entry['timestamp']).isoformat()
+        } for entry in post_link_index.backlinks(filename)]
+
+        return jsonify({
+            "status": "success",
+            "data": {
+                "filename": filename,
+                "backlinks": backlinks,
+                "total": len(backlinks)
+            }
+        })
+    except Exception as e:
+        app.logger.error(f"Error reading backlinks of {filename}: {str(e)}")
+        return jsonify({
+            "status": "error",
+            "message": "Internal server error"
+        }), 500
+
+# API: 複数投稿の一括取得
+BATCH_GET_FIELDS = ('title', 'tags', 'content', 'sections', 'size', 'modified_at')
+BATCH_GET_DEFAULT_FIELDS = ('content', 'size', 'modified_at')  # GET /api/posts/<filename> と同じ
+BATCH_GET_MAX_FILES = 10000
+
+def _batch_get_item(filename, fields):
+    """一括取得の1件分。返却: (item, None) または (None, エラーメッセージ)"""
+    if not is_valid_api_filename(filename):
+        return None, "Invalid filename or access denied"
+    file_path = os.path.join('./post', filename)
+    file_stat = _stat_or_none(file_path)
+    if file_stat is None or not stat.S_ISREG(file_stat.st_mode):
+        return None, "File not found"
+
+    item = {"filename": filename}
+    try:
+        if 'content' in fields:
+            with open(file_path, 'r', encoding='utf-8') as f:
+                item['content'] = f.read()
+        if 'title' in fields or 'tags' in fields:
+            # タイトル・タグはメタデータインデックスから（本文を読まない）
+            entry = post_metadata_index.get(filename) or PostMetadataIndex._make_entry(filename, '', '', 0, 0)
+            if 'title' in fields:
+                item['title'] = _api_post_title(entry)
+            if 'tags' in fields:
+                item['tags'] = entry['tags']
+        if 'sections' in fields:
+            item['sections'] = post_section_index.read(file_path, errors='strict')
+    except (OSError, UnicodeDecodeError) as e:
+        app.logger.error(f"Error reading file {filename}: {str(e)}")
+        return None, "Failed to read file"
+    if 'size' in fields:
+        item['size'] = file_stat.st_size
+    if 'modified_at' in fields:
+        item['modified_at'] = dt.datetime.fromtimestamp(file_stat.st_mtime).isoformat()
+    return item, None
+
+@app.route('/api/posts/batch_get', methods=['POST'])
+@require_api_key
+@limiter.limit("30 per minute")
+@csrf.exempt
+def api_batch_get_posts():
+    """
+    複数の投稿を1リクエストで取得
+    リクエストボディ(JSON):
+      - filenames: 取得するファイル名の配列（最大 BATCH_GET_MAX_FILES 件）
+      - fields: 返す項目の配列（title, tags, content, sections, size, modified_at。省略時は content, size, modified_at）
+    クエリパラメータ:
+      - format: json（デフォルト）| ndjson（1行1件で逐次返す。大量取得向け）
+    """
+    data = request.get_json(silent=True)
+    if not data or not isinstance(data.get('filenames'), list) \
+            or not all(isinstance(f, str) for f in data['filenames']):
+        return jsonify({
+            "status": "error",
+            "message": "'filenames' must be an array of strings"
         }), 400
 
-    content = data['content']
+    filenames = list(dict.fromkeys(data['filenames']))  # 重複除去（順序保持）
+    if len(filenames) > BATCH_GET_MAX_FILES:
+        return jsonify({
+            "status": "error",
+            "message": f"Too many filenames (max {BATCH_GET_MAX_FILES})"
+        }), 400
+
+    fields = data.get('fields') or list(BATCH_GET_DEFAULT_FIELDS)
+    if not isinstance(fields, list) or any(f not in BATCH_GET_FIELDS for f in fields):
+        return jsonify({
+            "status": "error",
+            "message": f"Invalid 'fields'. Use any of: {', '.join(BATCH_GET_FIELDS)}"
+        }), 400
+    fields = set(fields)
+
+    fmt = request.args.get('format', 'json').lower()
+    if fmt not in ['json', 'ndjson']:
+        return jsonify({
+            "status": "error",
+            "message": "Invalid 'format' parameter. Use 'json' or 'ndjson'"
+        }), 400
+
+    if fmt == 'ndjson':
+        def generate():
+            for filename in filenames:
+                item, error = _batch_get_item(filename, fields)
+                if error:
+                    line = {"status": "error", "filename": filename, "message": error}
+                else:
+                    line = {"status": "success", "data": item}
+                yield json.dumps(line, ensure_ascii=False) + '\n'
+        return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+    posts = []
+    errors = []
+    for filename in filenames:
+        item, error = _batch_get_item(filename, fields)
+        if error:
+            errors.append({"filename": filename, "message": error})
+        else:
+            posts.append(item)
 
-    # 1行目が##で始まらない場合は##を付与（非公開にする）
+    return jsonify({
+        "status": "success",
+        "data": {
+            "posts": posts,
+            "errors": errors,
+            "total": len(posts)
+        }
+    })
+
+def _private_post_content(content):
+    """API で新規作成する本文の1行目が##で始まらない場合は##を付与（非公開にする）"""
     first_line = content.split('\n')[0] if content else ''
     if not first_line.startswith('##'):
         if first_line.startswith('#'):
@@ -3677,6 +5839,40 @@ def api_create_post():
         else:
             # #0個 → ##を先頭に付与
             content = '##' + content
+    return content
+
+def _insert_comment_lines(lines, comment, position):
+    """行リスト（改行付き）にコメントを先頭（タイトル・タグ行の直後）または末尾に挿入した新しいリストを返す"""
+    # 画像（Markdown画像記法）はリストマーカーなし＋後に空行
+    is_image = comment.startswith('![')
+    if is_image:
+        new_comment = f"{comment}\n\n"
+    else:
+        new_comment = f"- {comment}\n"
+
+    if position == 'top':
+        title = lines[0] if len(lines) > 0 else "\n"
+        tags = lines[1] if len(lines) > 1 else "\n"
+        body = lines[2:] if len(lines) > 2 else []
+        return [title, tags, new_comment] + body
+    return lines + [new_comment]
+
+# API 2: 新規投稿作成
+@app.route('/api/posts', methods=['POST'])
+@require_api_key
+@limiter.limit("60 per minute")
+@csrf.exempt
+def api_create_post():
+    """新規投稿を作成（ファイル名は自動生成）"""
+    data = request.get_json()
+
+    if not data or 'content' not in data:
+        return jsonify({
+            "status": "error",
+            "message": "Missing 'content' field"
+        }), 400
+
+    content = _private_post_content(data['content'])
 
     # ファイル名自動生成: [_]YYYYmmdd-HHMMSS.txt
     now = dt.datetime.now()
@@ -3693,6 +5889,7 @@ def api_create_post():
     try:
         with open(file_path, 'w', encoding='utf-8') as f:
             f.write(content)
+        _on_post_changed(filename, 'created')
 
         app.logger.info(f"API: Created new post {filename}")
 
@@ -3760,6 +5957,7 @@ def api_update_post(filename):
         # ファイル更新
         with open(file_path, 'w', encoding='utf-8') as f:
             f.write(content)
+        _on_post_changed(filename)
 
         app.logger.info(f"API: Updated post {filename} (backup: {backup_filename})")
 
@@ -3824,31 +6022,13 @@ def api_add_comment(filename):
         with open(file_path, 'r', encoding='utf-8', errors='replace') as f:
             lines = f.readlines()
 
-        # 画像（Markdown画像記法）はリストマーカーなし＋後に空行
-        is_image = comment.startswith('![')
-        if is_image:
-            new_comment = f"{comment}\n\n"
-        else:
-            new_comment = f"- {comment}\n"
-
-        if position == 'top':
-            title = lines[0] if len(lines) > 0 else "\n"
-            tags = lines[1] if len(lines) > 1 else "\n"
-            body = lines[2:] if len(lines) > 2 else []
-            new_content = [title, tags, new_comment] + body
-        else:
-            new_content = lines + [new_comment]
+        new_content = _insert_comment_lines(lines, comment, position)
 
         with open(file_path, 'w', encoding='utf-8', errors='replace') as f:
             f.writelines(new_content)
 
-        # キャッシュ削除
-        cache_file_old = './post/.cache/post_files_info.json'
-        cache_file_all = './post/.cache/post_files_info_all.json'
-        filelist_cache = './post/.cache/filelist.json'
-        for cf in [cache_file_old, cache_file_all, filelist_cache]:
-            if os.path.exists(cf):
-                os.remove(cf)
+        # 投稿インデックスを差分更新
+        _on_post_changed(filename)
 
         app.logger.info(f"API: Added comment to {filename} at {position}")
 
@@ -3867,54 +6047,444 @@ def api_add_comment(filename):
             "message": "Internal server error"
         }), 500
 
-# API 3.5: 投稿削除
-@app.route('/api/posts/<filename>', methods=['DELETE'])
+# API 3.5: 投稿削除
+@app.route('/api/posts/<filename>', methods=['DELETE'])
+@require_api_key
+@limiter.limit("30 per minute")
+@csrf.exempt
+def api_delete_post(filename):
+    """投稿を削除"""
+    # ファイル名検証
+    if not is_valid_api_filename(filename):
+        return jsonify({
+            "status": "error",
+            "message": "Invalid filename or access denied"
+        }), 400
+
+    file_path = os.path.join('./post', filename)
+
+    # ファイル存在チェック
+    if not os.path.isfile(file_path):
+        return jsonify({
+            "status": "error",
+            "message": "File not found"
+        }), 404
+
+    try:
+        os.remove(file_path)
+        app.logger.info(f"API: Deleted post {filename}")
+
+        # 投稿インデックスを差分更新
+        _on_post_changed(filename, 'deleted')
+
+        return jsonify({
+            "status": "success",
+            "message": "Post deleted successfully",
+            "data": {
+                "filename": filename
+            }
+        })
+    except Exception as e:
+        app.logger.error(f"Error deleting file {filename}: {str(e)}")
+        return jsonify({
+            "status": "error",
+            "message": "Internal server error"
+        }), 500
+
+# API 3.6: 一括書き込み
+BULK_OPS = ('create', 'update', 'comment', 'delete')
+BULK_MAX_OPS = 1000
+BULK_TMP_DIR = './post/.cache/tmp'
+
+def _atomic_write_bytes(path, data):
+    """一時ファイルに書き出してから os.replace で置き換える（読み手が書きかけの本文を見ない）。
+    一時ファイルは投稿一覧のスイープ対象外で、かつ同一ファイルシステムの BULK_TMP_DIR に作る。"""
+    os.makedirs(BULK_TMP_DIR, exist_ok=True)
+    tmp_path = os.path.join(BULK_TMP_DIR, f"{os.path.basename(path)}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+def _atomic_write_text(path, content, errors='strict'):
+    """本文（str）を UTF-8 で _atomic_write_bytes する"""
+    _atomic_write_bytes(path, content.encode('utf-8', errors=errors))
+
+def _atomic_create_bytes(path, data):
+    """_atomic_write_bytes の新規作成版。一時ファイルを os.link で置くので、既に同名のファイルが
+    あれば上書きせずに FileExistsError を送出する（内容は書き終わった状態でだけ見える）"""
+    os.makedirs(BULK_TMP_DIR, exist_ok=True)
+    tmp_path = os.path.join(BULK_TMP_DIR, f"{os.path.basename(path)}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.link(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+BULK_CREATE_NAME = re.compile(r'^(.*?)(?:_(\d+))?\.txt$')
+
+def _create_bulk_post(filename, content):
+    """一括 API の新規作成分を排他的に作る。計画後に別の作成（POST /api/posts や同じ秒の別の一括要求）が
+    同名のファイルを作っていたら、上書きせずに _n を進めて作り直す。実際のファイル名を返す"""
+    m = BULK_CREATE_NAME.match(filename)
+    base, n = m.group(1), int(m.group(2) or 1)
+    while True:
+        try:
+            _atomic_create_bytes(os.path.join('./post', filename), content.encode('utf-8', errors='replace'))
+            return filename
+        except FileExistsError:
+            n += 1
+            filename = f"{base}_{n}.txt"
+
+def _plan_bulk_operations(operations):
+    """操作列を検証し、ファイルごとの最終内容を組み立てる。
+    戻り値は (results, plan, originals, errors)。plan は filename → 新しい本文（削除なら None）、
+    originals は filename → 元のファイルのバイト列（新規作成なら None。失敗時の復元用）。
+    1件でもエラーがあれば呼び出し側は何も書き込まない。"""
+    results, errors = [], []
+    plan = {}        # filename → 最終内容（None は削除）
+    originals = {}   # filename → 元のバイト列（新規作成分は None）
+
+    def current(filename):
+        if filename in plan:
+            return plan[filename]
+        if filename not in originals:
+            file_path = os.path.join('./post', filename)
+            if not os.path.isfile(file_path):
+                return None
+            with open(file_path, 'rb') as f:
+                originals[filename] = f.read()
+        if originals[filename] is None:
+            return None
+        # テキストモードの読み込みと同じく改行を \n にそろえる
+        return originals[filename].decode('utf-8', errors='replace').replace('\r\n', '\n').replace('\r', '\n')
+
+    now = dt.datetime.now()
+    for i, op in enumerate(operations):
+        kind = op.get('op') if isinstance(op, dict) else None
+        if kind not in BULK_OPS:
+            errors.append({"index": i, "message": f"Invalid op. Must be one of: {', '.join(BULK_OPS)}"})
+            continue
+
+        if kind == 'create':
+            content = op.get('content')
+            if not isinstance(content, str):
+                errors.append({"index": i, "message": "Missing 'content' field"})
+                continue
+            # 同じ秒に複数作成するため、重複時は _2, _3 ... を付ける
+            base = f"[_]{now.strftime('%Y%m%d-%H%M%S')}"
+            filename, n = f"{base}.txt", 1
+            while filename in plan or os.path.exists(os.path.join('./post', filename)):
+                n += 1
+                filename = f"{base}_{n}.txt"
+            originals[filename] = None
+            plan[filename] = _private_post_content(content)
+            results.append({"index": i, "op": kind, "filename": filename})
+            continue
+
+        filename = op.get('filename')
+        if not isinstance(filename, str) or not is_valid_api_filename(filename):
+            errors.append({"index": i, "message": "Invalid filename or access denied"})
+            continue
+        text = current(filename)
+        if text is None:
+            errors.append({"index": i, "message": "File not found"})
+            continue
+
+        if kind == 'update':
+            content = op.get('content')
+            if not isinstance(content, str):
+                errors.append({"index": i, "message": "Missing 'content' field"})
+                continue
+            plan[filename] = content
+        elif kind == 'comment':
+            comment = op.get('comment')
+            comment = comment.strip() if isinstance(comment, str) else ''
+            position = op.get('position', 'top')
+            if not comment:
+                errors.append({"index": i, "message": "Missing or empty 'comment' field"})
+                continue
+            if position not in ('top', 'bottom'):
+                errors.append({"index": i, "message": "Invalid position. Must be 'top' or 'bottom'"})
+                continue
+            plan[filename] = ''.join(_insert_comment_lines(text.splitlines(keepends=True), comment, position))
+        else:
+            plan[filename] = None
+        results.append({"index": i, "op": kind, "filename": filename})
+
+    # 同じバッチで作成して削除したファイルは書き込むものが無い（結果には written: false を付ける）
+    discarded = {f for f, content in plan.items() if content is None and originals.get(f) is None}
+    for filename in discarded:
+        del plan[filename]
+    for result in results:
+        if result['filename'] in discarded:
+            result['written'] = False
+
+    return results, plan, originals, errors
+
+@app.route('/api/posts/bulk', methods=['POST'])
+@require_api_key
+@limiter.limit("30 per minute")
+@csrf.exempt
+def api_bulk_posts():
+    """作成・編集・コメント追加・削除をまとめて適用する。
+    全操作を先に検証し、1件でも不正なら何も書き込まない。バックアップは対象ファイルごとに1回、
+    本文は一時ファイル経由で置き換え、途中で失敗した場合は書き込み済みのファイルを元に戻す。
+    インデックスの更新は最後に1回だけ行う。"""
+    data = request.get_json(silent=True)
+    operations = data.get('operations') if isinstance(data, dict) else None
+
+    if not isinstance(operations, list) or not operations:
+        return jsonify({
+            "status": "error",
+            "message": "Missing 'operations' field"
+        }), 400
+
+    if len(operations) > BULK_MAX_OPS:
+        return jsonify({
+            "status": "error",
+            "message": f"Too many operations (max {BULK_MAX_OPS})"
+        }), 400
+
+    try:
+        results, plan, originals, errors = _plan_bulk_operations(operations)
+    except Exception as e:
+        app.logger.error(f"Error reading files for bulk operations: {str(e)}")
+        return jsonify({
+            "status": "error",
+            "message": "Internal server error"
+        }), 500
+
+    if errors:
+        return jsonify({
+            "status": "error",
+            "message": "Invalid operations (nothing was applied)",
+            "errors": errors
+        }), 400
+
+    written = {}  # filename → ジャーナルに記録する変化の種類
+    try:
+        # バックアップ作成（既存ファイルごとに1回）: 元のファイル名_YYYYmmdd-HH
+        backup_dir = './post/bk'
+        os.makedirs(backup_dir, exist_ok=True)
+        backup_suffix = dt.datetime.now().strftime('%Y%m%d-%H')
+        import shutil
+        backups = 0
+        for filename, original in originals.items():
+            if original is not None and filename in plan:
+                shutil.copy2(os.path.join('./post', filename),
+                             os.path.join(backup_dir, f"{filename}_{backup_suffix}"))
+                backups += 1
+
+        created = {}  # 計画時のファイル名 → 実際に作成したファイル名
+        for filename, content in plan.items():
+            file_path = os.path.join('./post', filename)
+            if originals[filename] is None:
+                # 新規作成は排他的に行い、作成できたものだけを巻き戻しの対象にする
+                created[filename] = _create_bulk_post(filename, content)
+                written[created[filename]] = 'created'
+                continue
+            written[filename] = 'deleted' if content is None else 'updated'
+            if content is None:
+                os.remove(file_path)
+            else:
+                _atomic_write_text(file_path, content, errors='replace')
+        for result in results:
+            result['filename'] = created.get(result['filename'], result['filename'])
+    except Exception as e:
+        app.logger.error(f"Error applying bulk operations: {str(e)}")
+        # 書き込み済みの分を元に戻す
+        for filename in written:
+            file_path = os.path.join('./post', filename)
+            try:
+                if originals.get(filename) is None:
+                    if os.path.exists(file_path):
+                        os.remove(file_path)
+                    written[filename] = 'deleted'
+                else:
+                    _atomic_write_bytes(file_path, originals[filename])
+                    written[filename] = 'created' if written[filename] == 'deleted' else 'updated'
+            except Exception as restore_error:
+                app.logger.error(f"Error restoring {filename} after bulk failure: {str(restore_error)}")
+        _on_posts_changed(written)
+        return jsonify({
+            "status": "error",
+            "message": "Internal server error (changes were rolled back)"
+        }), 500
+
+    # 投稿インデックスをまとめて差分更新
+    _on_posts_changed(written)
+
+    app.logger.info(f"API: Applied {len(results)} bulk operations to {len(written)} posts (backups: {backups})")
+
+    return jsonify({
+        "status": "success",
+        "message": "Bulk operations applied successfully",
+        "data": {
+            "results": results,
+            "files": len(written),
+            "backups": backups
+        }
+    })
+
+# API 3.7: 変更差分の取得（ミラー同期用）
+CHANGES_DEFAULT_LIMIT = 1000
+CHANGES_MAX_LIMIT = 10000
+
+@app.route('/api/changes', methods=['GET'])
+@require_api_key
+@limiter.limit("60 per minute")
+@csrf.exempt
+def api_list_changes():
+    """since カーソル以降の投稿・論文の変更イベントを返す。
+    since を省略した場合（またはジャーナル作り直し後の古いカーソル）は reset=true と
+    現在のカーソルだけを返すので、一覧 API で全件取得してからそのカーソルで差分を追う。"""
+    since = request.args.get('since') or None
+    # 直接編集・他プロセスの書き込みをここでも拾ってから読む（どちらも一定間隔に1回まで）
+    post_metadata_index.refresh()
+    _sync_paper_search_index()
+    try:
+        limit = int(request.args.get('limit', CHANGES_DEFAULT_LIMIT))
+    except ValueError:
+        limit = 0
+    if not 1 <= limit <= CHANGES_MAX_LIMIT:
+        return jsonify({
+            "status": "error",
+            "message": f"Invalid limit (1-{CHANGES_MAX_LIMIT})"
+        }), 400
+
+    try:
+        events, cursor, has_more, reset = change_journal.read(since, limit)
+    except ValueError:
+        return jsonify({
+            "status": "error",
+            "message": "Invalid cursor"
+        }), 400
+    except Exception as e:
+        app.logger.error(f"Error reading change journal: {str(e)}")
+        return jsonify({
+            "status": "error",
+            "message": "Internal server error"
+        }), 500
+
+    # 投稿は API でアクセスできるファイルのみ（.cache / bk / tmp などは除外）
+    changes = [e for e in events
+               if e.get('kind') != 'post' or _is_api_post_filename(e.get('id', ''))
+               or _is_api_post_filename(e.get('old_id', ''))]
+
+    return jsonify({
+        "status": "success",
+        "data": {
+            "changes": changes,
+            "cursor": cursor,
+            "has_more": has_more,
+            "reset": reset
+        }
+    })
+
+# API 3.8: 投稿のエクスポート（バックアップ用）
+EXPORT_FORMATS = {
+    'zip': ('zip', 'application/zip'),
+    'tar': ('tar', 'application/x-tar'),
+    'tgz': ('tar.gz', 'application/gzip'),
+}
+
+def _iter_export_members(entries):
+    """エクスポート対象の投稿を1件ずつ書き換えて (arcname, source) を返す。
+    添付ファイルは複数の投稿から参照されていても最初の1回だけ含める。"""
+    written = set()
+    for entry in entries:
+        filename = entry['filename']
+        try:
+            with open(os.path.join('./post', filename), 'r', encoding='utf-8', errors='ignore') as f:
+                text = f.read()
+        except OSError as e:
+            app.logger.warning(f"export: cannot read {filename}: {e}")
+            continue
+        rewritten, referenced = _rewrite_for_offline(text)
+        yield filename, rewritten.encode('utf-8')
+        for name in referenced:
+            if name in written:
+                continue
+            written.add(name)
+            if attachment_catalog.get(name) is not None:
+                yield name, os.path.join(UPLOAD_FOLDER, name)
+            else:
+                app.logger.warning(f"export: missing attach {name} for {filename}")
+
+@app.route('/api/export', methods=['GET'])
 @require_api_key
-@limiter.limit("30 per minute")
+@limiter.limit("10 per minute")
 @csrf.exempt
-def api_delete_post(filename):
-    """投稿を削除"""
-    # ファイル名検証
-    if not is_valid_api_filename(filename):
+def api_export_posts():
+    """全投稿（またはカテゴリ・更新日時で絞り込んだ投稿）と参照添付を1つのアーカイブで返す。
+    Markdown は投稿単体の ZIP ダウンロードと同じ書き換えを行い、生成しながら送る。"""
+    category = request.args.get('category')
+    since = request.args.get('since')
+    fmt = request.args.get('format', 'zip')
+
+    if fmt not in EXPORT_FORMATS:
         return jsonify({
             "status": "error",
-            "message": "Invalid filename or access denied"
+            "message": f"Invalid format. Must be one of: {', '.join(EXPORT_FORMATS)}"
         }), 400
 
-    file_path = os.path.join('./post', filename)
+    since_ts = None
+    if since:
+        try:
+            since_ts = dt.datetime.fromisoformat(since).timestamp()
+        except ValueError:
+            return jsonify({
+                "status": "error",
+                "message": "Invalid 'since' (ISO 8601 date or datetime)"
+            }), 400
 
-    # ファイル存在チェック
-    if not os.path.isfile(file_path):
-        return jsonify({
-            "status": "error",
-            "message": "File not found"
-        }), 404
+    entries = []
+    for entry in post_metadata_index.entries():
+        if not _is_api_post_filename(entry['filename']):
+            continue
+        if category is not None and (entry['category'] if entry['category'] is not None else '_') != category:
+            continue
+        if since_ts is not None and entry['timestamp'] < since_ts:
+            continue
+        entries.append(entry)
+    entries.sort(key=lambda e: e['filename'])
+
+    ext, mimetype = EXPORT_FORMATS[fmt]
+    name = 'papernote-export'
+    if category is not None:
+        name += '-' + _sanitize_section_for_filename(category)
+    download_name = f"{name}-{dt.datetime.now().strftime('%Y%m%d-%H%M%S')}.{ext}"
+
+    members = _iter_export_members(entries)
+    if fmt == 'zip':
+        stream = _iter_zip_stream(members)
+    else:
+        stream = _iter_tar_stream(members, compress=(fmt == 'tgz'))
 
-    try:
-        os.remove(file_path)
-        app.logger.info(f"API: Deleted post {filename}")
+    app.logger.info(f"API: Exporting {len(entries)} posts as {fmt}")
 
-        # キャッシュファイルを削除
-        cache_file_old = './post/.cache/post_files_info.json'
-        cache_file_all = './post/.cache/post_files_info_all.json'
-        filelist_cache = './post/.cache/filelist.json'
-        for cf in [cache_file_old, cache_file_all, filelist_cache]:
-            if os.path.exists(cf):
-                os.remove(cf)
+    return Response(stream_with_context(stream), mimetype=mimetype,
+                    headers={'Content-Disposition': _attachment_disposition(download_name),
+                             'X-Export-Count': str(len(entries))})
 
-        return jsonify({
-            "status": "success",
-            "message": "Post deleted successfully",
-            "data": {
-                "filename": filename
-            }
-        })
-    except Exception as e:
-        app.logger.error(f"Error deleting file {filename}: {str(e)}")
-        return jsonify({
-            "status": "error",
-            "message": "Internal server error"
-        }), 500
+# API 3.9: PDF レンダリングプールの状態
+@app.route('/api/pdf_pool', methods=['GET'])
+@require_api_key
+@limiter.limit("60 per minute")
+@csrf.exempt
+def api_pdf_pool_stats():
+    """常駐 Chromium プールのワーカー数・待ち行列・処理件数・レイテンシを返す"""
+    return jsonify({
+        "status": "success",
+        "data": pdf_render_pool.stats()
+    })
 
 # API 4: 投稿一覧取得
 @app.route('/api/posts', methods=['GET'])
@@ -3922,44 +6492,131 @@ def api_delete_post(filename):
 @limiter.limit("60 per minute")
 @csrf.exempt
 def api_list_posts():
-    """全投稿の一覧を取得（カテゴリ・タイトル・更新日時付き）"""
+    """全投稿の一覧を取得（カテゴリ・タイトル・更新日時付き）。
+    一覧の JSON と圧縮済みの本文は投稿メタデータの generation ごとに1回だけ作る"""
     try:
-        posts = []
-        post_dir = './post'
+        post_metadata_index.refresh()
+        return _precompressed_json_response('api_posts', post_metadata_index.generation, _api_post_list_payload)
+    except Exception as e:
+        app.logger.error(f"Error listing posts: {str(e)}")
+        return jsonify({
+            "status": "error",
+            "message": "Internal server error"
+        }), 500
 
-        for filename in os.listdir(post_dir):
-            # .txtファイルのみ、サブディレクトリは無視
-            if not filename.endswith('.txt'):
-                continue
-            if filename.startswith('.') or filename.startswith('bk') or filename.startswith('tmp'):
-                continue
+def _api_post_list_payload():
+    """GET /api/posts の応答本体"""
+    posts = []
 
-            file_path = os.path.join(post_dir, filename)
-            if not os.path.isfile(file_path):
-                continue
+    for entry in post_metadata_index.entries():
+        # .txtファイルのみ、サブディレクトリは無視
+        if not _is_api_post_filename(entry['filename']):
+            continue
 
-            # カテゴリ解析: [category]filename.txt
-            category = '_'  # デフォルト（未分類）
-            if filename.startswith('[') and ']' in filename:
-                category = filename[1:filename.index(']')]
+        # カテゴリ解析: [category]filename.txt
+        category = entry['category'] if entry['category'] is not None else '_'
 
-            # タイトル取得（1行目）
-            title = filename  # デフォルトはファイル名
-            try:
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    first_line = f.readline().strip()
-                    # Markdownの見出し記号を除去
-                    if first_line.startswith('#'):
-                        title = first_line.lstrip('#').strip()
-                    elif first_line:
-                        title = first_line[:100]  # 最大100文字
-            except:
-                pass
+        posts.append({
+            "filename": entry['filename'],
+            "category": category,
+            "title": _api_post_title(entry),
+            "size": entry['size'],
+            "modified_at": dt.datetime.fromtimestamp(entry['timestamp']).isoformat()
+        })
 
-            # ファイル情報
-            file_stat = os.stat(file_path)
+    # 更新日時の降順でソート
+    posts.sort(key=lambda x: x['modified_at'], reverse=True)
+
+    return {
+        "status": "success",
+        "data": {
+            "posts": posts,
+            "total": len(posts)
+        }
+    }
+
+def _parse_rank_params():
+    """検索 API 共通の ?rank=mtime|bm25 と ?limit=（bm25 時の件数、1〜100）を解釈する。
+    戻り値は (rank, limit, エラー応答 or None)"""
+    rank = request.args.get('rank', 'mtime').lower()
+    if rank not in ['mtime', 'bm25']:
+        return None, None, (jsonify({
+            "status": "error",
+            "message": "Invalid 'rank' parameter. Use 'mtime' or 'bm25'"
+        }), 400)
+    try:
+        limit = int(request.args.get('limit', 20))
+    except ValueError:
+        limit = 0
+    if not 1 <= limit <= 100:
+        return None, None, (jsonify({
+            "status": "error",
+            "message": "Invalid 'limit' parameter. Use an integer between 1 and 100"
+        }), 400)
+    return rank, limit, None
+
+def _apply_ranking(results, key_name, index, terms, fields, limit, weights):
+    """一致済みの結果一覧を bm25 で並べ替えて上位 limit 件に絞り、score / snippets を付与する"""
+    by_key = {r[key_name]: r for r in results}
+    _, ranked = index.ranked(terms, fields, keys=set(by_key), limit=limit, weights=weights)
+    top = []
+    for hit in ranked:
+        result = dict(by_key[hit['key']])
+        result['score'] = hit['score']
+        result['snippets'] = hit['snippets']
+        top.append(result)
+    return top
+
+def _search_posts_linear(query_lower, search_type):
+    """全投稿を読み込んで部分一致検索する（検索インデックスが使えない場合のフォールバック）"""
+    results = []
+    post_dir = './post'
+
+    for filename in os.listdir(post_dir):
+        if not filename.endswith('.txt'):
+            continue
+        if filename.startswith('.') or filename.startswith('bk') or filename.startswith('tmp'):
+            continue
+
+        file_path = os.path.join(post_dir, filename)
+        if not os.path.isfile(file_path):
+            continue
+
+        # カテゴリ解析
+        category = '_'
+        if filename.startswith('[') and ']' in filename:
+            category = filename[1:filename.index(']')]
 
-            posts.append({
+        try:
+            with open(file_path, 'r', encoding='utf-8') as f:
+                content = f.read()
+        except:
+            continue
+
+        # タイトル取得（1行目）
+        lines = content.split('\n')
+        first_line = lines[0].strip() if lines else ''
+        if first_line.startswith('#'):
+            title = first_line.lstrip('#').strip()
+        elif first_line:
+            title = first_line[:100]
+        else:
+            title = filename
+
+        # 検索マッチング
+        matched = False
+        if search_type == 'title':
+            matched = query_lower in title.lower()
+        elif search_type == 'body':
+            # タイトル行を除いた本文で検索
+            body = '\n'.join(lines[1:]) if len(lines) > 1 else ''
+            matched = query_lower in body.lower()
+        else:  # all
+            matched = query_lower in content.lower()
+
+        if matched:
+            file_stat = os.stat(file_path)
+            results.append({
                 "filename": filename,
                 "category": category,
                 "title": title,
@@ -3967,22 +6624,32 @@ def api_list_posts():
                 "modified_at": dt.datetime.fromtimestamp(file_stat.st_mtime).isoformat()
             })
 
-        # 更新日時の降順でソート
-        posts.sort(key=lambda x: x['modified_at'], reverse=True)
-
-        return jsonify({
-            "status": "success",
-            "data": {
-                "posts": posts,
-                "total": len(posts)
-            }
+    return results
+
+def _search_posts_indexed(query_lower, search_type):
+    """全文検索インデックスで部分一致検索する（結果は _search_posts_linear と同じ）"""
+    fields = {'title': ('title',), 'body': ('body',), 'all': ('title', 'body')}[search_type]
+    matched = post_search_index.match(query_lower, fields)
+    entries = [post_metadata_index.get(filename) for filename in matched]
+    if search_type == 'title':
+        # 索引は生の1行目なので、見出し記号除去・100文字切り詰め後のタイトルで確定させる
+        # （1行目が空の投稿はファイル名がタイトルになる）
+        entries = [e for e in entries if e and e['title']] + [
+            e for e in post_metadata_index.entries() if not e['title']]
+        entries = [e for e in entries if query_lower in _api_post_title(e).lower()]
+
+    results = []
+    for entry in entries:
+        if entry is None or not _is_api_post_filename(entry['filename']):
+            continue
+        results.append({
+            "filename": entry['filename'],
+            "category": entry['category'] if entry['category'] is not None else '_',
+            "title": _api_post_title(entry),
+            "size": entry['size'],
+            "modified_at": dt.datetime.fromtimestamp(entry['timestamp']).isoformat()
         })
-    except Exception as e:
-        app.logger.error(f"Error listing posts: {str(e)}")
-        return jsonify({
-            "status": "error",
-            "message": "Internal server error"
-        }), 500
+    return results
 
 # API 5: 投稿検索
 @app.route('/api/posts/search', methods=['GET'])
@@ -3995,9 +6662,14 @@ def api_search_posts():
     クエリパラメータ:
       - q: 検索キーワード（必須）
       - type: 検索対象 title|body|all（デフォルト: all）
+      - rank: mtime（更新日時の降順、デフォルト）| bm25（適合度順、score と snippets を付与）
+      - limit: rank=bm25 のときの返却件数（1〜100、デフォルト: 20）
     """
     query = request.args.get('q', '').strip()
     search_type = request.args.get('type', 'all').lower()
+    rank, limit, error_response = _parse_rank_params()
+    if error_response:
+        return error_response
 
     if not query:
         return jsonify({
@@ -4012,72 +6684,34 @@ def api_search_posts():
         }), 400
 
     try:
-        results = []
-        post_dir = './post'
         query_lower = query.lower()
+        if _sync_post_search_index():
+            results = _search_posts_indexed(query_lower, search_type)
+        elif rank == 'bm25':
+            return jsonify({
+                "status": "error",
+                "message": "Ranked search is unavailable"
+            }), 503
+        else:
+            results = _search_posts_linear(query_lower, search_type)
 
-        for filename in os.listdir(post_dir):
-            if not filename.endswith('.txt'):
-                continue
-            if filename.startswith('.') or filename.startswith('bk') or filename.startswith('tmp'):
-                continue
-
-            file_path = os.path.join(post_dir, filename)
-            if not os.path.isfile(file_path):
-                continue
-
-            # カテゴリ解析
-            category = '_'
-            if filename.startswith('[') and ']' in filename:
-                category = filename[1:filename.index(']')]
-
-            try:
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    content = f.read()
-            except:
-                continue
-
-            # タイトル取得（1行目）
-            lines = content.split('\n')
-            first_line = lines[0].strip() if lines else ''
-            if first_line.startswith('#'):
-                title = first_line.lstrip('#').strip()
-            elif first_line:
-                title = first_line[:100]
-            else:
-                title = filename
-
-            # 検索マッチング
-            matched = False
-            if search_type == 'title':
-                matched = query_lower in title.lower()
-            elif search_type == 'body':
-                # タイトル行を除いた本文で検索
-                body = '\n'.join(lines[1:]) if len(lines) > 1 else ''
-                matched = query_lower in body.lower()
-            else:  # all
-                matched = query_lower in content.lower()
-
-            if matched:
-                file_stat = os.stat(file_path)
-                results.append({
-                    "filename": filename,
-                    "category": category,
-                    "title": title,
-                    "size": file_stat.st_size,
-                    "modified_at": dt.datetime.fromtimestamp(file_stat.st_mtime).isoformat()
-                })
-
-        # 更新日時の降順でソート
-        results.sort(key=lambda x: x['modified_at'], reverse=True)
+        total = len(results)
+        if rank == 'bm25':
+            fields = {'title': ('title',), 'body': ('body',), 'all': ('title', 'body')}[search_type]
+            results = _apply_ranking(results, 'filename', post_search_index, [query_lower], fields,
+                                     limit, {'title': 3.0})
+        else:
+            # 更新日時の降順でソート
+            results.sort(key=lambda x: x['modified_at'], reverse=True)
 
         return jsonify({
             "status": "success",
             "data": {
                 "posts": results,
-                "total": len(results),
+                "total": total,
                 "query": query,
-                "type": search_type
+                "type": search_type,
+                "rank": rank
             }
         })
     except Exception as e:
@@ -4096,22 +6730,13 @@ def api_list_categories():
     """全カテゴリの一覧を取得（投稿数付き）"""
     try:
         categories = {}
-        post_dir = './post'
 
-        for filename in os.listdir(post_dir):
-            if not filename.endswith('.txt'):
-                continue
-            if filename.startswith('.') or filename.startswith('bk') or filename.startswith('tmp'):
-                continue
-
-            file_path = os.path.join(post_dir, filename)
-            if not os.path.isfile(file_path):
+        for entry in post_metadata_index.entries():
+            if not _is_api_post_filename(entry['filename']):
                 continue
 
             # カテゴリ解析
-            category = '_'  # 未分類
-            if filename.startswith('[') and ']' in filename:
-                category = filename[1:filename.index(']')]
+            category = entry['category'] if entry['category'] is not None else '_'  # 未分類
 
             if category not in categories:
                 categories[category] = 0
@@ -4215,6 +6840,103 @@ def api_ui_postlist_remaining():
         return jsonify({"status": "error", "message": str(e)}), 500
 
 
+class PostOrderIndex:
+    """投稿を (更新日時の降順, ファイル名) で並べた整列リストを保持するインデックス。
+
+    一覧の種類（認証有無 × トピック別/日付別）ごとに bisect で維持する整列リストを持ち、
+    PostMetadataIndex の generation が変わったときだけ、mtime や表示可否が変化した
+    投稿を挿入・削除する。ページの取得はリストのスライスで、全件の再ソートは行わない。"""
+
+    VIEWS = ((True, 'topic'), (False, 'topic'), (True, 'date'), (False, 'date'))
+
+    def __init__(self, metadata_index):
+        self.metadata_index = metadata_index
+        self._keys = {}     # filename → (sort_key, 含まれるビューの tuple)
+        self._entries = {}  # filename → メタデータエントリ
+        self._orders = {view: [] for view in self.VIEWS}
+        self._generation = None
+        self._lock = threading.RLock()
+
+    @staticmethod
+    def sort_key(timestamp, filename):
+        return (-timestamp, filename)
+
+    def _views_for(self, entry):
+        filename = entry['filename']
+        in_date = not (filename.startswith('.') or filename.startswith('bk') or filename.startswith('tmp'))
+        return tuple(view for view in self.VIEWS
+                     if (view[0] or not entry['hidden']) and (view[1] == 'topic' or in_date))
+
+    def _set(self, filename, entry):
+        old = self._keys.pop(filename, None)
+        self._entries.pop(filename, None)
+        if old:
+            for view in old[1]:
+                order = self._orders[view]
+                i = bisect.bisect_left(order, old[0])
+                if i < len(order) and order[i] == old[0]:
+                    del order[i]
+        if entry is not None:
+            key = self.sort_key(entry['timestamp'], filename)
+            views = self._views_for(entry)
+            for view in views:
+                bisect.insort(self._orders[view], key)
+            self._keys[filename] = (key, views)
+            self._entries[filename] = entry
+
+    def _sync(self):
+        """世代が変わっていれば、並び位置か表示可否が変わった投稿だけを入れ替える。
+        前回の同期以降に変化した投稿は PostMetadataIndex.changes_since() で求め、
+        記録が残っていない場合だけ全件を突き合わせる"""
+        generation, changed = self.metadata_index.changes_since(self._generation)
+        if changed is None:
+            entries = {e['filename']: e for e in self.metadata_index.entries()}
+            removed = [f for f in self._keys if f not in entries]
+        elif changed:
+            entries = {f: e for f, e in ((f, self.metadata_index.get(f)) for f in changed) if e is not None}
+            removed = [f for f in changed if f not in entries and f in self._keys]
+        else:
+            return
+        for filename, entry in entries.items():
+            current = self._keys.get(filename)
+            if current and current[0] == self.sort_key(entry['timestamp'], filename) \
+                    and current[1] == self._views_for(entry):
+                self._entries[filename] = entry
+                continue
+            self._set(filename, entry)
+        for filename in removed:
+            self._set(filename, None)
+        self._generation = generation
+
+    def page(self, authenticated, group_by, after=None, offset=0, limit=30, predicate=None):
+        """並び順で after（sort_key）より後ろ、または offset 件目から limit 件のエントリを返す。
+        返却: (entries, total, has_more)。predicate(entry) 指定時は条件に合うものだけを対象にする"""
+        with self._lock:
+            self._sync()
+            order = self._orders[(authenticated, group_by)]
+            if predicate is not None:
+                order = [key for key in order if predicate(self._entries[key[1]])]
+            start = bisect.bisect_right(order, after) if after is not None else offset
+            selected = [self._entries[key[1]] for key in order[start:start + limit]]
+            return selected, len(order), start + limit < len(order)
+
+post_order_index = PostOrderIndex(post_metadata_index)
+
+def _encode_post_cursor(timestamp, filename):
+    raw = json.dumps([timestamp, filename], ensure_ascii=False).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+def _decode_post_cursor(cursor):
+    """カーソル文字列を sort_key に戻す。不正なら ValueError"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        timestamp, filename = json.loads(raw.decode('utf-8'))
+    except Exception:
+        raise ValueError('Invalid cursor')
+    if not isinstance(timestamp, (int, float)) or not isinstance(filename, str):
+        raise ValueError('Invalid cursor')
+    return PostOrderIndex.sort_key(timestamp, filename)
+
 @app.route('/api/ui/posts/paginate', methods=['GET'])
 @limiter.limit("120 per minute")
 @csrf.exempt
@@ -4223,6 +6945,7 @@ def api_ui_posts_paginate():
     UI用ページネーションAPI（トピック別/日付別）
     クエリパラメータ:
       - page: ページ番号（1から開始、デフォルト: 1）
+      - cursor: 前ページの next_cursor（指定時は page より優先。スクロール中に編集があっても重複・欠落しない）
       - limit: 1ページあたりの件数（デフォルト: 30）
       - group: グループ化方式 topic|date（デフォルト: topic）
       - search: 検索キーワード（オプション）
@@ -4230,73 +6953,49 @@ def api_ui_posts_paginate():
     try:
         page = max(1, int(request.args.get('page', 1)))
         limit = min(100, max(1, int(request.args.get('limit', 30))))
-        group_by = request.args.get('group', 'topic').lower()
+        group_by = 'date' if request.args.get('group', 'topic').lower() == 'date' else 'topic'
         search_query = request.args.get('search', '').strip()
+        cursor = request.args.get('cursor')
         authenticated = current_user.is_authenticated
 
-        CACHE_FILE = './post/.cache/post_files_info_all.json'
-        FILELIST_CACHE = './post/.cache/filelist.json'
-        DATE_CACHE_FILE = './post/.cache/posts_by_date.json'
-
-        all_items = []
-
-        if group_by == 'date':
-            # 日付別グループ化（/post_latest用）
-            all_items = _get_posts_flat_by_date(authenticated, search_query)
-        else:
-            # トピック別（/post用）- キャッシュ活用
-            if not search_query and os.path.exists(CACHE_FILE) and os.path.exists(FILELIST_CACHE):
-                try:
-                    current_files = set(
-                        f for f in os.listdir('./post')
-                        if os.path.isfile(os.path.join('./post', f)) and not f.endswith('.gitkeep')
-                    )
-                    with open(FILELIST_CACHE, 'r') as f:
-                        cached_files = set(json.load(f))
-                    if current_files == cached_files:
-                        with open(CACHE_FILE, 'r') as f:
-                            all_cached = json.load(f)
-                        # フラット化
-                        for topic, files in all_cached.items():
-                            for file_info in files:
-                                if not authenticated and file_info.get('title', '').startswith('#'):
-                                    continue
-                                all_items.append({
-                                    **file_info,
-                                    'topic': topic
-                                })
-                except Exception as e:
-                    app.logger.error(f"Cache read error: {e}")
-
-            if not all_items:
-                # キャッシュがない場合は生成
-                all_items = _get_posts_flat_by_topic(authenticated, search_query)
+        after = None
+        if cursor:
+            try:
+                after = _decode_post_cursor(cursor)
+            except ValueError as e:
+                return jsonify({"status": "error", "message": str(e)}), 400
 
         # 検索フィルタ
+        predicate = None
         if search_query:
             search_terms = search_query.lower().split()
-            all_items = [
-                item for item in all_items
-                if any(term in item.get('title', '').lower() or term in item.get('filename', '').lower()
-                       for term in search_terms)
-            ]
+            predicate = lambda entry: any(
+                term in entry['title'].lower() or term in entry['filename'].lower()
+                for term in search_terms)
 
-        # ソート（更新日時の降順）
-        all_items.sort(key=lambda x: x.get('timestamp', 0), reverse=True)
+        # 更新日時の降順に整列済みのリストから切り出す
+        entries, total, has_more = post_order_index.page(
+            authenticated, group_by, after=after, offset=(page - 1) * limit,
+            limit=limit, predicate=predicate)
 
-        total = len(all_items)
-        start_idx = (page - 1) * limit
-        end_idx = start_idx + limit
-        paginated_items = all_items[start_idx:end_idx]
+        if group_by == 'date':
+            # 日付別グループ化（/post_latest用）
+            now = datetime.datetime.now()
+            paginated_items = [_post_date_item(entry, now) for entry in entries]
+        else:
+            # トピック別（/post用）
+            paginated_items = [_post_topic_item(entry) for entry in entries]
 
+        last = entries[-1] if entries else None
         return jsonify({
             "status": "success",
             "data": {
                 "items": paginated_items,
-                "page": page,
+                "page": None if cursor else page,
                 "limit": limit,
                 "total": total,
-                "has_more": end_idx < total
+                "has_more": has_more,
+                "next_cursor": _encode_post_cursor(last['timestamp'], last['filename']) if has_more else None
             }
         })
     except Exception as e:
@@ -4307,87 +7006,40 @@ def api_ui_posts_paginate():
         }), 500
 
 
-def _get_posts_flat_by_topic(authenticated, search_query=None):
-    """トピック別に投稿を取得しフラット化"""
-    post_dir = './post'
-    items = []
-
-    for filename in os.listdir(post_dir):
-        if not os.path.isfile(os.path.join(post_dir, filename)):
-            continue
-        if filename.endswith('.gitkeep'):
-            continue
-
-        file_path = os.path.join(post_dir, filename)
-        metadata = get_file_metadata(file_path)
-
-        # 非認証時は#始まりのタイトルを除外
-        if not authenticated and metadata['title'].startswith('#'):
-            continue
-
-        # トピック抽出
-        topic_match = re.match(r'\[(.*?)\]', filename)
-        topic = topic_match.group(1) if topic_match else '_トピック未設定'
-
-        items.append({
-            'filename': filename,
-            'title': metadata['title'],
-            'tags': metadata['tags'],
-            'timestamp': os.path.getmtime(file_path),
-            'topic': topic
-        })
-
-    return items
-
-
-def _get_posts_flat_by_date(authenticated, search_query=None):
-    """日付期間別に投稿を取得しフラット化"""
-    post_dir = './post'
-    now = datetime.datetime.now()
-    week_ago = now - datetime.timedelta(days=7)
-    month_ago = now - datetime.timedelta(days=30)
-    half_year_ago = now - datetime.timedelta(days=183)
-
-    items = []
-
-    for filename in os.listdir(post_dir):
-        if not os.path.isfile(os.path.join(post_dir, filename)):
-            continue
-        if filename.endswith('.gitkeep'):
-            continue
-        if filename.startswith('.') or filename.startswith('bk') or filename.startswith('tmp'):
-            continue
-
-        file_path = os.path.join(post_dir, filename)
-        metadata = get_file_metadata(file_path)
-
-        # 非認証時は#始まりのタイトルを除外
-        if not authenticated and metadata['title'].startswith('#'):
-            continue
+def _post_topic_item(entry):
+    """トピック別一覧の1件"""
+    return {
+        'filename': entry['filename'],
+        'title': entry['title'],
+        'tags': entry['tags'],
+        'timestamp': entry['timestamp'],
+        'topic': entry['category'] if entry['category'] is not None else '_トピック未設定'
+    }
 
-        timestamp = os.path.getmtime(file_path)
-        file_date = datetime.datetime.fromtimestamp(timestamp)
 
-        # 期間分類
-        if file_date >= week_ago:
-            period = 'week'
-        elif file_date >= month_ago:
-            period = 'month'
-        elif file_date >= half_year_ago:
-            period = 'half_year'
-        else:
-            period = 'older'
+def _post_date_item(entry, now):
+    """日付期間別一覧の1件（期間は now 基準で分類）"""
+    timestamp = entry['timestamp']
+    file_date = datetime.datetime.fromtimestamp(timestamp)
 
-        items.append({
-            'filename': filename,
-            'title': metadata['title'],
-            'tags': metadata.get('tags', ''),
-            'timestamp': timestamp,
-            'date': file_date.strftime('%Y/%m/%d %H:%M'),
-            'period': period
-        })
+    # 期間分類
+    if file_date >= now - datetime.timedelta(days=7):
+        period = 'week'
+    elif file_date >= now - datetime.timedelta(days=30):
+        period = 'month'
+    elif file_date >= now - datetime.timedelta(days=183):
+        period = 'half_year'
+    else:
+        period = 'older'
 
-    return items
+    return {
+        'filename': entry['filename'],
+        'title': entry['title'],
+        'tags': entry['tags'],
+        'timestamp': timestamp,
+        'date': file_date.strftime('%Y/%m/%d %H:%M'),
+        'period': period
+    }
 
 # ============================================
 # Paper APIs (論文管理API)
@@ -4473,6 +7125,7 @@ def api_upload_paper():
             if not os.path.exists(memo_path):
                 with open(memo_path, 'w') as memo_file:
                     memo_file.write(original_filename + '\n')
+                _on_paper_changed(pdf_id, created=True)
 
             # バックグラウンドで処理開始
             thread = threading.Thread(target=process_single_pdf, args=(pdf_id,))
@@ -4588,19 +7241,29 @@ def api_get_paper(pdf_id):
     try:
         # PDFの存在確認
         pdf_path = os.path.join('./pdfs', pdf_id + '.pdf')
-        if not os.path.exists(pdf_path):
+        pdf_stat = _stat_or_none(pdf_path)
+        if pdf_stat is None:
             return jsonify({
                 "status": "error",
                 "message": "Paper not found"
             }), 404
 
-        timestamp = os.path.getmtime(pdf_path)
+        timestamp = pdf_stat.st_mtime
+        memo_path = os.path.join('./memo', pdf_id + '.txt')
+        summary_path = os.path.join('./summary', pdf_id + '.txt')
+        summary2_path = os.path.join('./summary2', pdf_id + '.txt')
+
+        # PDF・memo・summary・summary2 のいずれも変わっていなければ読み込まずに 304
+        etag, last_modified = _file_validators(
+            [pdf_stat] + [_stat_or_none(p) for p in (memo_path, summary_path, summary2_path)])
+        not_modified = _not_modified(etag, last_modified, 'application/json')
+        if not_modified:
+            return not_modified
 
         # 各コンテンツを読み込み
         memo_content = ''
         title = pdf_id
         category = ''
-        memo_path = os.path.join('./memo', pdf_id + '.txt')
         if os.path.exists(memo_path):
             with open(memo_path, 'r', encoding='utf-8') as f:
                 lines = f.readlines()
@@ -4612,18 +7275,16 @@ def api_get_paper(pdf_id):
                     memo_content = ''.join(lines[2:])  # 3行目以降がメモ本文
 
         summary_content = ''
-        summary_path = os.path.join('./summary', pdf_id + '.txt')
         if os.path.exists(summary_path):
             with open(summary_path, 'r', encoding='utf-8') as f:
                 summary_content = f.read()
 
         summary2_content = ''
-        summary2_path = os.path.join('./summary2', pdf_id + '.txt')
         if os.path.exists(summary2_path):
             with open(summary2_path, 'r', encoding='utf-8') as f:
                 summary2_content = f.read()
 
-        return jsonify({
+        return _with_validators(jsonify({
             "status": "success",
             "data": {
                 "pdf_id": pdf_id,
@@ -4638,7 +7299,7 @@ def api_get_paper(pdf_id):
                 "has_summary": bool(summary_content),
                 "has_summary2": bool(summary2_content)
             }
-        })
+        }), etag, last_modified)
     except Exception as e:
         app.logger.error(f"Error getting paper {pdf_id}: {str(e)}")
         return jsonify({
@@ -4646,13 +7307,69 @@ def api_get_paper(pdf_id):
             "message": "Internal server error"
         }), 500
 
+PAPER_SEARCH_DEFAULT_FIELDS = ('title', 'category', 'memo', 'summary', 'summary2')
+
+def _paper_search_result(pdf_id, title, category):
+    """論文検索結果1件分（PDF が無ければ None）"""
+    pdf_path = os.path.join('./pdfs', pdf_id + '.pdf')
+    if not os.path.isfile(pdf_path):
+        return None
+    timestamp = os.path.getmtime(pdf_path)
+    has_memo = os.path.exists(os.path.join('./memo', pdf_id + '.txt'))
+    return {
+        'pdf_id': pdf_id,
+        'title': title.strip() if has_memo else pdf_id,
+        'category': category.strip() if has_memo else '',
+        'date': datetime.datetime.fromtimestamp(timestamp).strftime('%Y/%m/%d'),
+        'timestamp': timestamp,
+        'has_memo': has_memo,
+        'has_summary': os.path.exists(os.path.join('./summary', pdf_id + '.txt')),
+        'has_summary2': os.path.exists(os.path.join('./summary2', pdf_id + '.txt'))
+    }
+
+def _search_papers_indexed(search_terms, fields):
+    matched = paper_search_index.match_all(search_terms, fields)
+    if matched is None:
+        matched = paper_search_index.versions().keys()
+    results = []
+    for pdf_id in matched:
+        doc = paper_search_index.get(pdf_id, ('title', 'category')) or {'title': '', 'category': ''}
+        result = _paper_search_result(pdf_id, doc['title'], doc['category'])
+        if result:
+            results.append(result)
+    return results
+
+def _search_papers_linear(search_terms, fields):
+    """全論文のファイルを読み込んで検索する（検索インデックスが使えない場合のフォールバック）"""
+    results = []
+    for file in os.listdir('./pdfs'):
+        if not file.endswith('.pdf'):
+            continue
+        pdf_id = file.replace('.pdf', '')
+        values = _read_paper_for_search(pdf_id)
+        texts = [values[field].lower() for field in fields]
+        if all(any(term in text for text in texts) for term in search_terms):
+            result = _paper_search_result(pdf_id, values['title'], values['category'])
+            if result:
+                results.append(result)
+    return results
+
 # API 9: 論文検索
 @app.route('/api/papers/search', methods=['GET'])
 @require_api_key
 @limiter.limit("60 per minute")
 @csrf.exempt
 def api_search_papers():
-    """論文を検索（タイトル、メモ、サマリーを対象）"""
+    """
+    論文を検索（すべての検索語を含む論文）
+    クエリパラメータ:
+      - q: 検索キーワード（必須、空白区切りで AND）
+      - fields: 検索対象フィールドのカンマ区切り
+                title|category|memo|summary|summary2|fulltext
+                （デフォルト: title,category,memo,summary,summary2）
+      - rank: mtime（日付の降順、デフォルト）| bm25（適合度順、score と snippets を付与）
+      - limit: rank=bm25 のときの返却件数（1〜100、デフォルト: 20）
+    """
     try:
         query = request.args.get('q', '').strip()
         if not query:
@@ -4661,75 +7378,45 @@ def api_search_papers():
                 "message": "Missing search query parameter 'q'"
             }), 400
 
-        search_terms = query.lower().split()
-        pdf_files = [f for f in os.listdir('./pdfs') if os.path.isfile(os.path.join('./pdfs', f)) and f.endswith('.pdf') and f != '.gitkeep']
-
-        results = []
-        for file in pdf_files:
-            pdf_id = file.replace('.pdf', '')
-            path = os.path.join('./pdfs', file)
-            timestamp = os.path.getmtime(path)
-
-            # 検索対象テキストを収集
-            searchable_text = ''
-            title = pdf_id
-            category = ''
-
-            memo_path = os.path.join('./memo', pdf_id + '.txt')
-            has_memo = os.path.exists(memo_path)
-            if has_memo:
-                try:
-                    with open(memo_path, 'r', encoding='utf-8') as f:
-                        content = f.read()
-                        lines = content.split('\n')
-                        if len(lines) >= 1:
-                            title = lines[0].strip()
-                        if len(lines) >= 2:
-                            category = lines[1].strip()
-                        searchable_text += content.lower()
-                except Exception:
-                    pass
-
-            summary_path = os.path.join('./summary', pdf_id + '.txt')
-            has_summary = os.path.exists(summary_path)
-            if has_summary:
-                try:
-                    with open(summary_path, 'r', encoding='utf-8') as f:
-                        searchable_text += f.read().lower()
-                except Exception:
-                    pass
+        fields_param = request.args.get('fields', '').strip()
+        fields = tuple(f.strip() for f in fields_param.split(',') if f.strip()) if fields_param else PAPER_SEARCH_DEFAULT_FIELDS
+        if not fields or any(f not in paper_search_index.fields for f in fields):
+            return jsonify({
+                "status": "error",
+                "message": f"Invalid 'fields' parameter. Use any of: {', '.join(paper_search_index.fields)}"
+            }), 400
 
-            summary2_path = os.path.join('./summary2', pdf_id + '.txt')
-            has_summary2 = os.path.exists(summary2_path)
-            if has_summary2:
-                try:
-                    with open(summary2_path, 'r', encoding='utf-8') as f:
-                        searchable_text += f.read().lower()
-                except Exception:
-                    pass
+        rank, limit, error_response = _parse_rank_params()
+        if error_response:
+            return error_response
 
-            # 全ての検索語がマッチするか確認
-            if all(term in searchable_text for term in search_terms):
-                results.append({
-                    'pdf_id': pdf_id,
-                    'title': title,
-                    'category': category,
-                    'date': datetime.datetime.fromtimestamp(timestamp).strftime('%Y/%m/%d'),
-                    'timestamp': timestamp,
-                    'has_memo': has_memo,
-                    'has_summary': has_summary,
-                    'has_summary2': has_summary2
-                })
+        search_terms = query.lower().split()
+        if _sync_paper_search_index():
+            results = _search_papers_indexed(search_terms, fields)
+        elif rank == 'bm25':
+            return jsonify({
+                "status": "error",
+                "message": "Ranked search is unavailable"
+            }), 503
+        else:
+            results = _search_papers_linear(search_terms, fields)
 
-        # 日付で降順ソート
-        results.sort(key=lambda x: x['timestamp'], reverse=True)
+        total = len(results)
+        if rank == 'bm25':
+            results = _apply_ranking(results, 'pdf_id', paper_search_index, search_terms, fields,
+                                     limit, {'title': 3.0, 'category': 2.0})
+        else:
+            # 日付で降順ソート
+            results.sort(key=lambda x: x['timestamp'], reverse=True)
 
         return jsonify({
             "status": "success",
             "data": {
                 "papers": results,
-                "total": len(results),
-                "query": query
+                "total": total,
+                "query": query,
+                "fields": list(fields),
+                "rank": rank
             }
         })
     except Exception as e:
@@ -4878,6 +7565,8 @@ def api_upload_image():
                     # サムネイル生成に失敗しても元画像は保持
                     thumbnail_filename = new_filename
 
+            attachment_catalog.record(new_filename)
+
         # Markdown形式のURL生成
         markdown_url = f"[![{original_filename}](/attach/{thumbnail_filename})](/attach/{new_filename})"
 
@@ -4902,6 +7591,15 @@ def api_upload_image():
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Papernote server')
+    parser.add_argument('--backfill-attachments', action='store_true',
+                        help='./attach の既存ファイルを添付カタログに登録して終了する')
+    args = parser.parse_args()
+    if args.backfill_attachments:
+        count = attachment_catalog.backfill()
+        print(f"Attachment catalog: {count} files recorded in {attachment_catalog.catalog_file}")
+        raise SystemExit(0)
+
     # ユーザー情報のハッシュ化
     for user_id, user in config['users'].items():
         print(f"Hashing password for user: {user['username']}")
@@ -0,0 +1,467 @@
+"""
+# 全文検索インデックス (Full-text search index)
+
+投稿（./post）や論文（memo / summary / clean_text）を部分一致検索するための
+ディスク上の転置インデックス。SQLite（標準ライブラリの sqlite3）の FTS5 を
+ストレージに使い、文書単位で差分更新できる。
+
+- docs テーブル: キー（ファイル名や pdf_id）、バージョン文字列、各フィールドの本文
+- fts_word     : docs を外部コンテンツとする単語（unicode61）転置インデックス
+- vocab_word   : fts_word の語彙一覧（中間一致の候補語を引くため）
+- fts_tri      : 文字トライグラム（trigram）索引。3文字以上の検索語の部分一致
+- fts_bi       : 非 ASCII 文字のバイグラム索引（contentless）。2文字の日本語検索語用
+
+検索の意味論は従来の線形走査（`term in content.lower()`）と同じ「大文字小文字を
+区別しない部分一致」。日本語は単語の区切りが無いため、3文字以上はトライグラム、
+2文字はバイグラムのポスティングリストの積で候補を求める（位置の連続まで FTS5 が
+確認するので照合は不要）。それ以外の短い英数字の検索語は、語彙から候補語を引いて
+文書を絞り込み、必要な場合だけ候補文書の保存済み本文で照合する。
+
+Flask に依存しないため、tools/bench_search_index.py や tests/ から単体で利用できる。
+"""
+import html
+import os
+import re
+import sqlite3
+import threading
+
+# 検索語を転置インデックスの語に分解するパターン（unicode61 + tokenchars '_' と揃える）
+_TOKEN_RE = re.compile(r'\w+')
+
+
+def _cjk_bigrams(text):
+    """非 ASCII 文字が2つ続く箇所のバイグラムを空白区切りで返す（fts_bi の ascii トークナイザ用）"""
+    text = (text or '').lower()
+    return ' '.join(text[i:i + 2] for i in range(len(text) - 1)
+                    if text[i] > '\x7f' and text[i + 1] > '\x7f')
+
+
+class TextSearchIndex:
+    """キー → 複数フィールドの文書を保持する FTS5 ベースの検索インデックス。
+
+    fields はフィールド名のタプル（例: ('title', 'body')）。作成時に固定され、
+    変更した場合は SCHEMA_VERSION と同様にインデックスが作り直される。
+    FTS5 が使えない SQLite では available が False になり、呼び出し側は
+    従来の線形走査にフォールバックする。"""
+
+    SCHEMA_VERSION = 2
+    MAX_VOCAB_TERMS = 2000  # 1語から展開する候補語の上限（超えたら本文照合に切り替え）
+    CHUNK = 500             # MATCH 式 / IN 句 1回あたりの要素数
+    SNIPPET_TOKENS = 64     # スニペット1つあたりのトークン数（trigram では概ね文字数）
+
+    def __init__(self, db_path, fields):
+        self.db_path = db_path
+        self.fields = tuple(fields)
+        self.available = True
+        self._has_trigram = False
+        self._conn = None
+        self._lock = threading.RLock()
+        # 語彙・id→キー の読み取りキャッシュ（自プロセスの書き込みか data_version の変化で破棄）
+        self._cache = None
+        self._cache_data_version = None
+
+    # ------------------------------------------------------------
+    # 接続・スキーマ
+    # ------------------------------------------------------------
+
+    def _schema_signature(self):
+        return self.SCHEMA_VERSION * 1000 + len(self.fields)
+
+    def _create_schema(self, conn):
+        cols = ', '.join(self.fields)
+        conn.execute(
+            f'CREATE TABLE IF NOT EXISTS docs ('
+            f'id INTEGER PRIMARY KEY, key TEXT UNIQUE NOT NULL, version TEXT, '
+            f'{", ".join(f + " TEXT" for f in self.fields)})')
+        conn.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS fts_word USING fts5({cols}, "
+            f"content='docs', content_rowid='id', "
+            f"tokenize=\"unicode61 remove_diacritics 0 tokenchars '_'\")")
+        conn.execute("CREATE VIRTUAL TABLE IF NOT EXISTS vocab_word USING fts5vocab(fts_word, 'row')")
+        conn.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS fts_bi USING fts5({cols}, content='', tokenize='ascii')")
+        try:
+            conn.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS fts_tri USING fts5({cols}, "
+                f"content='docs', content_rowid='id', tokenize='trigram')")
+        except sqlite3.OperationalError as e:
+            # trigram は SQLite 3.34 以降。無ければ単語索引の経路だけで検索する
+            print(f"Trigram tokenizer unavailable: {e}")
+
+    def _open(self):
+        conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        return conn
+
+    def _connect(self):
+        if self._conn is not None or not self.available:
+            return self._conn
+        try:
+            os.makedirs(os.path.dirname(self.db_path) or '.', exist_ok=True)
+            conn = self._open()
+            if conn.execute('PRAGMA user_version').fetchone()[0] != self._schema_signature():
+                # スキーマ変更時は作り直す（中身は呼び出し側の同期処理で再投入される）
+                conn.close()
+                for suffix in ('', '-wal', '-shm'):
+                    if os.path.exists(self.db_path + suffix):
+                        os.remove(self.db_path + suffix)
+                conn = self._open()
+                with conn:
+                    self._create_schema(conn)
+                    conn.execute(f'PRAGMA user_version = {self._schema_signature()}')
+            self._has_trigram = conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE name = 'fts_tri'").fetchone() is not None
+            self._conn = conn
+        except sqlite3.Error as e:
+            print(f"Search index unavailable ({self.db_path}): {e}")
+            self.available = False
+        return self._conn
+
+    def _check_fields(self, fields):
+        fields = tuple(fields) if fields else self.fields
+        for f in fields:
+            if f not in self.fields:
+                raise ValueError(f"Unknown field: {f}")
+        return fields
+
+    # ------------------------------------------------------------
+    # 更新
+    # ------------------------------------------------------------
+
+    def versions(self, keys=None):
+        """キー → バージョン文字列 の dict を返す（差分同期用）。keys 指定時はそのキーだけ"""
+        with self._lock:
+            conn = self._connect()
+            if conn is None:
+                return {}
+            if keys is None:
+                return dict(conn.execute('SELECT key, version FROM docs'))
+            keys = list(keys)
+            result = {}
+            for i in range(0, len(keys), self.CHUNK):
+                chunk = keys[i:i + self.CHUNK]
+                result.update(conn.execute(
+                    f"SELECT key, version FROM docs WHERE key IN ({', '.join('?' * len(chunk))})", chunk))
+            return result
+
+    def _fts_delete(self, conn, row):
+        """各 FTS 表から旧内容の索引を取り除く（row = (id, *fields)）"""
+        cols = ', '.join(self.fields)
+        marks = ', '.join('?' * len(self.fields))
+        tables = ('fts_word', 'fts_tri') if self._has_trigram else ('fts_word',)
+        for table in tables:
+            conn.execute(f"INSERT INTO {table}({table}, rowid, {cols}) VALUES('delete', ?, {marks})", row)
+        conn.execute(f"INSERT INTO fts_bi(fts_bi, rowid, {cols}) VALUES('delete', ?, {marks})",
+                     (row[0], *(_cjk_bigrams(v) for v in row[1:])))
+
+    def _fts_insert(self, conn, doc_id, values):
+        cols = ', '.join(self.fields)
+        marks = ', '.join('?' * len(self.fields))
+        tables = ('fts_word', 'fts_tri') if self._has_trigram else ('fts_word',)
+        for table in tables:
+            conn.execute(f'INSERT INTO {table}(rowid, {cols}) VALUES(?, {marks})', (doc_id, *values))
+        conn.execute(f'INSERT INTO fts_bi(rowid, {cols}) VALUES(?, {marks})',
+                     (doc_id, *(_cjk_bigrams(v) for v in values)))
+
+    def _upsert(self, conn, key, version, values):
+        self._cache = None
+        row_values = tuple(values.get(f) or '' for f in self.fields)
+        cols = ', '.join(self.fields)
+        old = conn.execute(f'SELECT id, {cols} FROM docs WHERE key = ?', (key,)).fetchone()
+        if old:
+            doc_id = old[0]
+            self._fts_delete(conn, old)
+            sets = ', '.join(f'{f} = ?' for f in self.fields)
+            conn.execute(f'UPDATE docs SET version = ?, {sets} WHERE id = ?',
+                         (version, *row_values, doc_id))
+        else:
+            marks = ', '.join('?' * len(self.fields))
+            cur = conn.execute(f'INSERT INTO docs(key, version, {cols}) VALUES(?, ?, {marks})',
+                               (key, version, *row_values))
+            doc_id = cur.lastrowid
+        self._fts_insert(conn, doc_id, row_values)
+
+    def upsert(self, key, version, values):
+        """文書を追加・更新する。values は フィールド名 → 本文 の dict"""
+        self.upsert_many([(key, version, values)])
+
+    def upsert_many(self, docs):
+        """(key, version, values) の列をまとめて反映する（CHUNK 件ごとに1トランザクション）"""
+        with self._lock:
+            conn = self._connect()
+            if conn is None:
+                return
+            batch = []
+            for doc in docs:
+                batch.append(doc)
+                if len(batch) >= self.CHUNK:
+                    with conn:
+                        for key, version, values in batch:
+                            self._upsert(conn, key, version, values)
+                    batch = []
+            if batch:
+                with conn:
+                    for key, version, values in batch:
+                        self._upsert(conn, key, version, values)
+
+    def get(self, key, fields=None):
+        """保存済みの文書（フィールド名 → 本文 の dict）を返す。無ければ None"""
+        fields = self._check_fields(fields)
+        with self._lock:
+            conn = self._connect()
+            if conn is None:
+                return None
+            row = conn.execute(f"SELECT {', '.join(fields)} FROM docs WHERE key = ?", (key,)).fetchone()
+        return dict(zip(fields, row)) if row else None
+
+    def delete(self, key):
+        cols = ', '.join(self.fields)
+        with self._lock:
+            conn = self._connect()
+            if conn is None:
+                return
+            with conn:
+                old = conn.execute(f'SELECT id, {cols} FROM docs WHERE key = ?', (key,)).fetchone()
+                if old:
+                    self._cache = None
+                    self._fts_delete(conn, old)
+                    conn.execute('DELETE FROM docs WHERE id = ?', (old[0],))
+
+    # ------------------------------------------------------------
+    # 検索
+    # ------------------------------------------------------------
+
+    @staticmethod
+    def _quote(term):
+        return '"' + term.replace('"', '""') + '"'
+
+    def _read_cache(self, conn):
+        """語彙（改行区切りの1文字列）、id → キー、キー → id の対応を返す。
+        他プロセスの書き込みは PRAGMA data_version の変化で検知する。"""
+        data_version = conn.execute('PRAGMA data_version').fetchone()[0]
+        if self._cache is None or self._cache_data_version != data_version:
+            vocab = '\n'.join(r[0] for r in conn.execute('SELECT term FROM vocab_word'))
+            keys = dict(conn.execute('SELECT id, key FROM docs'))
+            self._cache = ('\n' + vocab + '\n', keys, {key: doc_id for doc_id, key in keys.items()})
+            self._cache_data_version = data_version
+        return self._cache
+
+    def _vocab_terms(self, conn, token, suffix=False):
+        """token を部分文字列として含む（suffix=True なら token で終わる）索引語の一覧。
+        多すぎる場合は None"""
+        vocab = self._read_cache(conn)[0]
+        terms = []
+        pos = vocab.find(token)
+        while pos != -1:
+            start = vocab.rfind('\n', 0, pos) + 1
+            end = vocab.find('\n', pos)
+            if not suffix or vocab.endswith(token, start, end):
+                terms.append(vocab[start:end])
+                if len(terms) > self.MAX_VOCAB_TERMS:
+                    return None
+            pos = vocab.find(token, end)
+        return terms
+
+    def _match_ids(self, conn, expr_parts, fields, table='fts_word'):
+        """OR で結合した MATCH 式（CHUNK 件ずつ）に一致する文書 id の集合"""
+        ids = set()
+        col_filter = '{' + ' '.join(fields) + '}'
+        for i in range(0, len(expr_parts), self.CHUNK):
+            expr = f"{col_filter} : ({' OR '.join(expr_parts[i:i + self.CHUNK])})"
+            ids.update(r[0] for r in conn.execute(
+                f'SELECT rowid FROM {table} WHERE {table} MATCH ?', (expr,)))
+        return ids
+
+    def _phrase_ids(self, conn, tokens, fields):
+        """複数語の検索語を隣接フレーズとして絞り込む。
+        先頭語は索引語の後方一致、末尾語は前方一致、中間語は完全一致になる。"""
+        heads = self._vocab_terms(conn, tokens[0], suffix=True)
+        if heads is None:
+            return None
+        if not heads:
+            return set()
+        rest = ' + '.join(self._quote(t) for t in tokens[1:]) + '*'
+        return self._match_ids(conn, [f'({self._quote(h)} + {rest})' for h in heads], fields)
+
+    def _iter_docs(self, conn, fields, ids=None):
+        """(key, フィールド本文...) を返す。ids 指定時はその文書だけ"""
+        cols = ', '.join(('key',) + tuple(fields))
+        if ids is None:
+            yield from conn.execute(f'SELECT {cols} FROM docs')
+            return
+        ids = list(ids)
+        for i in range(0, len(ids), self.CHUNK):
+            chunk = ids[i:i + self.CHUNK]
+            marks = ', '.join('?' * len(chunk))
+            yield from conn.execute(f'SELECT {cols} FROM docs WHERE id IN ({marks})', chunk)
+
+    def _keys_for_ids(self, conn, ids):
+        keys = self._read_cache(conn)[1]
+        return {keys[i] for i in ids if i in keys}
+
+    def _verify(self, conn, term, fields, ids=None):
+        """保存済み本文で部分一致を照合する（ids 未指定時は全件）"""
+        keys = set()
+        for row in self._iter_docs(conn, fields, ids):
+            if any(term in (text or '').lower() for text in row[1:]):
+                keys.add(row[0])
+        return keys
+
+    def match(self, term, fields=None):
+        """fields のいずれかに term を（大文字小文字を区別せず）部分文字列として含む
+        文書のキー集合を返す。term が空なら None（絞り込みなし）。"""
+        term = (term or '').lower()
+        if not term:
+            return None
+        fields = self._check_fields(fields)
+        with self._lock:
+            conn = self._connect()
+            if conn is None:
+                return None
+            # 文字 n-gram 索引で引ける長さなら、ポスティングリストの積がそのまま部分一致になる
+            if len(term) >= 3 and self._has_trigram:
+                return self._keys_for_ids(conn, self._match_ids(conn, [self._quote(term)], fields, 'fts_tri'))
+            if len(term) == 2 and term[0] > '\x7f' and term[1] > '\x7f':
+                return self._keys_for_ids(conn, self._match_ids(conn, [self._quote(term)], fields, 'fts_bi'))
+
+            tokens = _TOKEN_RE.findall(term)
+            if len(tokens) > 1:
+                ids = self._phrase_ids(conn, tokens, fields)
+                if ids is not None:
+                    return self._verify(conn, term, fields, ids) if ids else set()
+            ids = None
+            constrained_all = True
+            for token in dict.fromkeys(tokens):
+                terms = self._vocab_terms(conn, token)
+                if terms is None:
+                    constrained_all = False
+                    continue
+                token_ids = self._match_ids(conn, [self._quote(t) for t in terms], fields)
+                ids = token_ids if ids is None else ids & token_ids
+                if not ids:
+                    return set()
+            # 検索語が1語だけで、その語の候補を語彙から引き切れた場合は照合不要
+            if ids is not None and constrained_all and len(tokens) == 1 and tokens[0] == term:
+                return self._keys_for_ids(conn, ids)
+            return self._verify(conn, term, fields, ids)
+
+    def match_any(self, terms, fields=None):
+        """いずれかの語を含む文書のキー集合（OR 検索）"""
+        keys = set()
+        for term in terms:
+            matched = self.match(term, fields)
+            if matched is None:
+                continue
+            keys |= matched
+        return keys
+
+    def match_all(self, terms, fields=None):
+        """すべての語を含む文書のキー集合（AND 検索）。語が無ければ None"""
+        keys = None
+        for term in terms:
+            matched = self.match(term, fields)
+            if matched is None:
+                continue
+            keys = matched if keys is None else keys & matched
+            if not keys:
+                break
+        return keys
+
+    # ------------------------------------------------------------
+    # 順位付け検索（bm25 + スニペット）
+    # ------------------------------------------------------------
+
+    @staticmethod
+    def _mark(text):
+        """\x02 / \x03 で囲んだ一致箇所を、HTML エスケープした上で <mark> に置き換える"""
+        return html.escape(text).replace('\x02', '<mark>').replace('\x03', '</mark>')
+
+    def _text_snippets(self, values, terms):
+        """FTS の位置情報を使えない短い検索語用に、保存済み本文から最初の一致箇所を切り出す"""
+        snippets = []
+        for field, text in values.items():
+            lower = (text or '').lower()
+            hits = sorted((lower.find(t), t) for t in terms if t in lower)
+            if not hits:
+                continue
+            pos, term = hits[0]
+            start = max(0, pos - self.SNIPPET_TOKENS // 2)
+            end = min(len(text), pos + len(term) + self.SNIPPET_TOKENS // 2)
+            piece = text[start:pos] + '\x02' + text[pos:pos + len(term)] + '\x03' + text[pos + len(term):end]
+            snippets.append({'field': field,
+                             'text': ('…' if start > 0 else '') + self._mark(piece) + ('…' if end < len(text) else '')})
+        return snippets
+
+    def ranked(self, terms, fields=None, keys=None, limit=20, weights=None):
+        """すべての語を含む文書を bm25 で順位付けし、上位 limit 件を返す。
+
+        keys を渡すと順位付けの対象をそのキー集合に限定する（呼び出し側で絞り込み済みの
+        一致集合）。省略時は match_all で求める。戻り値は (一致総数, 上位の一覧) で、
+        一覧の各要素は {'key', 'score', 'snippets': [{'field', 'text'}]}。
+        score は大きいほど適合度が高い。スニペットは上位の文書についてだけ FTS5 の
+        snippet()（索引の出現位置）から作るため、一致した全文書を読み込むことはない。"""
+        terms = [t.lower() for t in terms if t]
+        fields = self._check_fields(fields)
+        weights = weights or {}
+        with self._lock:
+            conn = self._connect()
+            if conn is None:
+                return 0, []
+            if keys is None:
+                keys = self.match_all(terms, fields)
+                if keys is None:
+                    return 0, []
+            if not keys:
+                return 0, []
+            id_by_key = self._read_cache(conn)[2]
+            candidate_ids = [id_by_key[k] for k in keys if k in id_by_key]
+
+            # 順位付けに使う索引: 3文字以上の語はトライグラム、2文字の日本語はバイグラム
+            if self._has_trigram and any(len(t) >= 3 for t in terms):
+                table, rank_terms = 'fts_tri', [t for t in terms if len(t) >= 3]
+            elif any(len(t) == 2 and t[0] > '\x7f' and t[1] > '\x7f' for t in terms):
+                table, rank_terms = 'fts_bi', [t for t in terms if len(t) == 2 and t[0] > '\x7f' and t[1] > '\x7f']
+            else:
+                table, rank_terms = None, []
+
+            if table is None:
+                # bm25 を計算できる語が無い（1〜2文字の英数字のみ）場合はキー順
+                top = [(self._read_cache(conn)[1][i], 0.0) for i in sorted(candidate_ids)[:limit]]
+            else:
+                conn.execute('CREATE TEMP TABLE IF NOT EXISTS rank_candidates (id INTEGER PRIMARY KEY)')
+                conn.execute('DELETE FROM rank_candidates')
+                conn.executemany('INSERT INTO rank_candidates(id) VALUES(?)', ((i,) for i in candidate_ids))
+                expr = '{' + ' '.join(fields) + '} : (' + ' OR '.join(self._quote(t) for t in rank_terms) + ')'
+                bm25_weights = ', '.join(str(float(weights.get(f, 1.0))) for f in self.fields)
+                rows = conn.execute(
+                    f'SELECT d.key, bm25({table}, {bm25_weights}) FROM {table} '
+                    f'JOIN docs d ON d.id = {table}.rowid '
+                    f'WHERE {table} MATCH ? AND {table}.rowid IN (SELECT id FROM rank_candidates) '
+                    f'ORDER BY bm25({table}, {bm25_weights}) LIMIT ?', (expr, limit)).fetchall()
+                top = [(key, -score) for key, score in rows]
+                if len(top) < limit:
+                    # 順位付けの語を含まない候補（短い語だけで一致したもの）を後ろに補う
+                    ranked_keys = {key for key, _ in top}
+                    rest = sorted(k for k in keys if k not in ranked_keys)
+                    top += [(k, 0.0) for k in rest[:limit - len(top)]]
+
+            results = []
+            if table == 'fts_tri' and top:
+                col_index = {f: i for i, f in enumerate(self.fields)}
+                snippet_cols = ', '.join(
+                    f"snippet(fts_tri, {col_index[f]}, char(2), char(3), '…', {self.SNIPPET_TOKENS})" for f in fields)
+                marks = ', '.join('?' * len(top))
+                snippets_by_key = {}
+                for row in conn.execute(
+                        f'SELECT d.key, {snippet_cols} FROM fts_tri JOIN docs d ON d.id = fts_tri.rowid '
+                        f'WHERE fts_tri MATCH ? AND d.key IN ({marks})', (expr, *[k for k, _ in top])):
+                    snippets_by_key[row[0]] = [{'field': f, 'text': self._mark(text)}
+                                               for f, text in zip(fields, row[1:]) if text and '\x02' in text]
+                for key, score in top:
+                    results.append({'key': key, 'score': score, 'snippets': snippets_by_key.get(key, [])})
+            else:
+                for key, score in top:
+                    values = self.get(key, fields) or {}
+                    results.append({'key': key, 'score': score, 'snippets': self._text_snippets(values, terms)})
+            return len(keys), results
@@ -0,0 +1,81 @@
+"""html_sanitizer（サーバーサイドレンダリングする投稿断片の無害化）のテスト。
+
+    python -m unittest discover -s tests
+"""
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from html_sanitizer import sanitize_html
+
+try:
+    import markdown
+except ImportError:
+    markdown = None
+
+POST = """# XSS テスト
+tags
+
+本文 <script src=x></script>
+
+<script type="text/javascript">alert(1)</script>
+
+<iframe src="https://example.com/"></iframe>
+
+<form action="https://example.com/"><input name="q"></form>
+
+<img src="x" onerror="alert(1)">
+
+[link](javascript:alert(1))
+"""
+
+
+class SanitizeHtmlTest(unittest.TestCase):
+    def assertInert(self, out):
+        lowered = out.lower()
+        for tag in ('<script', '<iframe', '<form', '<input', '<object', '<embed', '<style', '<meta', '<link'):
+            self.assertNotIn(tag, lowered)
+        self.assertNotIn('onerror', lowered)
+        self.assertNotIn('href="javascript:', lowered)
+
+    def test_tags_with_attributes_are_escaped(self):
+        out = sanitize_html('<p>a<script src=x></script><iframe src="https://e.com/"></iframe></p>')
+        self.assertInert(out)
+        self.assertIn('&lt;script src=x&gt;', out)
+        self.assertIn('&lt;iframe src=&quot;https://e.com/&quot;&gt;', out)
+        self.assertTrue(out.startswith('<p>') and out.endswith('</p>'))
+
+    def test_script_body_is_text(self):
+        out = sanitize_html('<script type="text/javascript">if (a < b) alert(1)</script>')
+        self.assertInert(out)
+        self.assertIn('if (a &lt; b) alert(1)', out)
+
+    def test_event_handlers_and_unsafe_urls_are_dropped(self):
+        out = sanitize_html('<img src="x" onerror="alert(1)"><a href="java\tscript:alert(1)">a</a>'
+                            '<a href="&#106;avascript:alert(1)">b</a><img src="data:image/svg+xml,x">')
+        self.assertEqual(out, '<img src="x"><a>a</a><a>b</a><img>')
+
+    def test_markdown_output_is_kept(self):
+        fragment = ('<h2>見出し</h2>\n<p><a href="/post/a.md" title="t">a</a> &amp; '
+                    '<img alt="i" src="/attach/s_x.png" /></p>\n'
+                    '<pre><code class="language-python">x = &quot;&lt;b&gt;&quot;\n</code></pre>\n'
+                    '<table>\n<thead>\n<tr>\n<th style="text-align: left;">h</th>\n</tr>\n</thead>\n</table>')
+        self.assertEqual(sanitize_html(fragment), fragment)
+
+    def test_fragment_cannot_break_page_structure(self):
+        self.assertEqual(sanitize_html('</div></div><div><p>x'), '<div><p>x</p></div>')
+        self.assertEqual(sanitize_html('<!-- c --><p>x</p>'), '<p>x</p>')
+
+    @unittest.skipIf(markdown is None, 'markdown is not installed')
+    def test_post_render(self):
+        # PostFragmentCache._render と同じ順序（Markdown 変換 → 無害化）
+        out = sanitize_html(markdown.markdown(POST, extensions=['tables', 'fenced_code', 'sane_lists']))
+        self.assertInert(out)
+        self.assertIn('&lt;script src=x&gt;', out)
+        self.assertIn('&lt;iframe src=&quot;https://example.com/&quot;&gt;', out)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,124 @@
+"""search_index（全文検索インデックス）のテスト。
+match() / ranked() の結果が従来の線形走査（`term in content.lower()`）と一致することを確認する。
+
+    python -m unittest discover -s tests
+"""
+import os
+import random
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from search_index import TextSearchIndex
+
+FIELDS = ('title', 'body')
+
+DOCS = {
+    'mixed1.txt': {'title': 'GPT-4で自然言語処理', 'body': 'Transformerモデルの評価。attention is all you need'},
+    'mixed2.txt': {'title': '機械学習 Model 比較', 'body': 'ResNet50とViTを比較した実験メモ（学習率 1e-3）'},
+    'mixed3.txt': {'title': '学', 'body': '一文字だけのタイトルと、日本語の本文。東京で会議'},
+    'mixed4.txt': {'title': 'Deep Learning入門', 'body': '深層学習の基礎。学習データを集める'},
+    'ops1.txt': {'title': 'C++ と C#', 'body': 'a*b + c:d -e "quoted" (paren) ^caret {brace}'},
+    'ops2.txt': {'title': 'AND OR NOT NEAR', 'body': 'boolean operators: x AND y, NOT z, NEAR(a b)'},
+    'ops3.txt': {'title': 'column:value', 'body': 'title:foo body:bar - hyphen -- double'},
+    'ascii1.txt': {'title': 'search index', 'body': 'research on indexes and re-search'},
+    'ascii2.txt': {'title': 'Memory Cache', 'body': 'memory cache latency; cache-memory'},
+    'empty.txt': {'title': '', 'body': ''},
+}
+
+TERMS = [
+    # ASCII
+    'search', 'ndex', 'memory cache', 'cache-memory', 'ta', 'a', 'e',
+    # CJK（1文字・2文字・3文字以上）と混在
+    '学', '習', '学習', '機械', '自然言語', '東京で', 'gpt-4で', 'transformerモデル', 'モデルの評価', 'l入門',
+    # FTS5 の演算子・構文に使われる文字
+    '"', '""', '"quoted"', '*', 'a*b', 'c++', 'c#', 'c:d', 'title:foo', ':', '-', '-e', '--',
+    '(', '(paren)', ')', '^', '^caret', '{', '{brace}', '+', 'and', 'or', 'not', 'near', 'near(a',
+    'x and y', 'not z',
+    # 一致しないもの
+    'zzz', '存在しない語',
+]
+
+
+def linear_match(docs, term, fields=FIELDS):
+    term = term.lower()
+    return {key for key, values in docs.items()
+            if any(term in (values.get(f) or '').lower() for f in fields)}
+
+
+class TextSearchIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.work_dir = tempfile.mkdtemp(prefix='test_search_')
+        self.index = TextSearchIndex(os.path.join(self.work_dir, 'search.db'), FIELDS)
+        self.index.upsert_many((key, '1', values) for key, values in DOCS.items())
+        if not self.index.available:
+            self.skipTest('SQLite FTS5 is not available')
+
+    def tearDown(self):
+        conn = self.index._conn
+        if conn is not None:
+            conn.close()
+        shutil.rmtree(self.work_dir, ignore_errors=True)
+
+    def test_match_equals_linear_scan(self):
+        for term in TERMS:
+            with self.subTest(term=term):
+                self.assertEqual(self.index.match(term), linear_match(DOCS, term))
+
+    def test_match_single_field(self):
+        for term in TERMS:
+            with self.subTest(term=term):
+                self.assertEqual(self.index.match(term, ('title',)), linear_match(DOCS, term, ('title',)))
+
+    def test_match_empty_term(self):
+        self.assertIsNone(self.index.match(''))
+
+    def test_match_after_update_and_delete(self):
+        docs = dict(DOCS)
+        docs['mixed1.txt'] = {'title': '自然言語処理 改訂版', 'body': 'attention'}
+        del docs['ops1.txt']
+        self.index.upsert('mixed1.txt', '2', docs['mixed1.txt'])
+        self.index.delete('ops1.txt')
+        for term in TERMS:
+            with self.subTest(term=term):
+                self.assertEqual(self.index.match(term), linear_match(docs, term))
+
+    def test_ranked_equals_linear_scan(self):
+        queries = [['search'], ['学習'], ['学'], ['memory', 'cache'], ['自然言語', 'gpt'],
+                   ['c++'], ['"quoted"', 'a*b'], ['and', 'not'], ['(', ')'], ['zzz']]
+        for terms in queries:
+            with self.subTest(terms=terms):
+                expected = set.intersection(*(linear_match(DOCS, t) for t in terms))
+                total, results = self.index.ranked(terms, limit=len(DOCS))
+                self.assertEqual(total, len(expected))
+                self.assertEqual({r['key'] for r in results}, expected)
+
+    def test_ranked_limit(self):
+        expected = linear_match(DOCS, 'e')
+        total, results = self.index.ranked(['e'], limit=3)
+        self.assertEqual(total, len(expected))
+        self.assertEqual(len(results), 3)
+        self.assertTrue({r['key'] for r in results} <= expected)
+
+    def test_random_corpus(self):
+        rng = random.Random(0)
+        alphabet = 'ab学習-*" :()'
+        docs = {f'doc{i}': {'title': ''.join(rng.choice(alphabet) for _ in range(rng.randint(0, 8))),
+                            'body': ''.join(rng.choice(alphabet) for _ in range(rng.randint(0, 30)))}
+                for i in range(60)}
+        self.index.upsert_many((key, '1', values) for key, values in docs.items())
+        for key in DOCS:
+            self.index.delete(key)
+        for _ in range(200):
+            term = ''.join(rng.choice(alphabet) for _ in range(rng.randint(1, 4)))
+            if not term.strip():
+                continue
+            with self.subTest(term=term):
+                self.assertEqual(self.index.match(term), linear_match(docs, term))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,133 @@
+"""
+# 全文検索インデックスのベンチマーク (Search index benchmark)
+
+合成した投稿コーパス（1k / 10k / 50k 件）に対して、従来の線形走査
+（全ファイルを読み込み lower() して部分一致）と search_index.TextSearchIndex の
+検索時間を比較する。両者の結果が一致することも合わせて確認する。
+
+使い方:
+    python tools/bench_search_index.py
+    python tools/bench_search_index.py --sizes 1000 10000 --repeat 5
+"""
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from search_index import TextSearchIndex
+
+WORDS = ('paper research method result analysis model data learning network graph '
+         'system design evaluation benchmark index search query latency memory cache '
+         'transformer attention embedding retrieval ranking vector database storage').split()
+JA_WORDS = ('研究', '論文', '機械学習', '自然言語処理', '評価', '実験', '手法', '結果',
+            'データ', '検索', '索引', '性能', '改善', '課題', '提案', '東京', '会議')
+
+# (検索語, 対象フィールド)
+QUERIES = [
+    ('transformer', ('title', 'body')),
+    ('search', ('title', 'body')),           # research にも中間一致する
+    ('ndex', ('title', 'body')),             # 語の途中だけ
+    ('memory cache', ('title', 'body')),     # 複数語のフレーズ
+    ('自然言語', ('title', 'body')),
+    ('機械学習', ('title',)),
+    ('研究', ('title', 'body')),             # 2文字（バイグラム）
+    ('ta', ('title', 'body')),               # 2文字の英数字（語彙の中間一致）
+    ('zzz_rare_token', ('body',)),
+]
+
+
+def make_post(rng, i):
+    title = '# ' + ' '.join(rng.choice(WORDS + list(JA_WORDS)) for _ in range(4))
+    tags = ' '.join('#' + rng.choice(WORDS) for _ in range(3))
+    body = []
+    for _ in range(rng.randint(5, 20)):
+        line = ' '.join(rng.choice(WORDS) for _ in range(rng.randint(5, 15)))
+        line += ' ' + ''.join(rng.choice(JA_WORDS) for _ in range(rng.randint(2, 6))) + '。'
+        body.append(line)
+    if i % 997 == 0:
+        body.append('zzz_rare_token')
+    return '\n'.join([title, tags] + body) + '\n'
+
+
+def make_corpus(post_dir, size, seed=0):
+    rng = random.Random(seed)
+    for i in range(size):
+        with open(os.path.join(post_dir, f'[bench]{i:06d}.txt'), 'w', encoding='utf-8') as f:
+            f.write(make_post(rng, i))
+
+
+def linear_search(post_dir, term, fields):
+    """main.py の従来実装と同じ: 毎回全ファイルを読み込んで部分一致"""
+    matched = set()
+    for filename in os.listdir(post_dir):
+        with open(os.path.join(post_dir, filename), 'r', encoding='utf-8', errors='ignore') as f:
+            content = f.read()
+        title, _, body = content.partition('\n')
+        values = {'title': title, 'body': body}
+        if any(term in values[field].lower() for field in fields):
+            matched.add(filename)
+    return matched
+
+
+def build_index(post_dir, db_path):
+    index = TextSearchIndex(db_path, ('title', 'body'))
+
+    def docs():
+        for filename in os.listdir(post_dir):
+            with open(os.path.join(post_dir, filename), 'r', encoding='utf-8', errors='ignore') as f:
+                title, _, body = f.read().partition('\n')
+            yield filename, '1', {'title': title, 'body': body}
+
+    index.upsert_many(docs())
+    return index
+
+
+def timed(func, repeat):
+    best = None
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare linear scan and search index latency')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 50000])
+    parser.add_argument('--repeat', type=int, default=3, help='各検索の試行回数（最良値を採用）')
+    args = parser.parse_args()
+
+    for size in args.sizes:
+        work_dir = tempfile.mkdtemp(prefix='bench_search_')
+        try:
+            post_dir = os.path.join(work_dir, 'post')
+            os.makedirs(post_dir)
+            make_corpus(post_dir, size)
+
+            start = time.perf_counter()
+            index = build_index(post_dir, os.path.join(work_dir, 'search.db'))
+            build_time = time.perf_counter() - start
+
+            print(f"\n=== {size} posts (index build: {build_time:.2f}s) ===")
+            print(f"{'query':<20} {'fields':<12} {'hits':>6} {'linear(ms)':>11} {'index(ms)':>10} {'speedup':>8}")
+            for term, fields in QUERIES:
+                linear_time, expected = timed(lambda: linear_search(post_dir, term, fields), args.repeat)
+                index_time, actual = timed(lambda: index.match(term, fields), args.repeat)
+                if actual != expected:
+                    print(f"  MISMATCH for {term!r}: linear={len(expected)} index={len(actual)}")
+                print(f"{term:<20} {'+'.join(fields):<12} {len(expected):>6} "
+                      f"{linear_time * 1000:>11.1f} {index_time * 1000:>10.1f} "
+                      f"{linear_time / max(index_time, 1e-9):>7.1f}x")
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()